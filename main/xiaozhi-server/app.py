@@ -44,6 +44,7 @@ async def main():
             await ws_task
         except asyncio.CancelledError:
             pass
+        await ws_server.close()
         print("服务器已关闭，程序退出。")
 
 if __name__ == "__main__":
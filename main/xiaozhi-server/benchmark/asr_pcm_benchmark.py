@@ -0,0 +1,110 @@
+"""
+本地ASR音频输入方式对比：经临时WAV文件中转（写盘、读盘、删除） vs 直接传入内存中的float32数组
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/asr_pcm_benchmark.py --utterances 200 --concurrency 8
+    python benchmark/asr_pcm_benchmark.py --asr SherpaASR   # 同时计入真实识别耗时，需要已下载模型
+
+--asr 为空时只测量音频传递本身的开销，不加载识别模型。
+"""
+import os
+import sys
+import time
+import uuid
+import wave
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="ASR in-memory PCM benchmark")
+parser.add_argument("--asr", type=str, default="", help="config.yaml中ASR下的配置名，如FunASR、SherpaASR")
+parser.add_argument("--utterances", type=int, default=200, help="识别的语句数")
+parser.add_argument("--seconds", type=float, default=4.0, help="每句音频时长(秒)")
+parser.add_argument("--concurrency", type=int, default=8, help="同时识别的语句数")
+parser.add_argument("--output_dir", type=str, default="tmp/", help="临时WAV文件目录")
+args = parser.parse_args()
+# 配置加载会解析命令行参数，这里清掉本脚本自己的参数
+sys.argv = sys.argv[:1]
+
+import numpy as np
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def load_recognizer():
+    """返回recognize(samples)，--asr为空时不做识别"""
+    if not args.asr:
+        return lambda samples: None
+
+    import importlib
+    from config.settings import load_config
+
+    config = load_config()
+    asr_config = config["ASR"][args.asr]
+    # 直接在当前线程加载模型，只比较音频传递方式
+    module = importlib.import_module(f"core.providers.asr.{asr_config.get('type', args.asr)}")
+    model = module.load_model(asr_config)
+    return lambda samples: module.recognize_batch(model, [samples])[0]
+
+
+def via_file(pcm, recognize):
+    """原实现：写临时WAV，再读回识别，最后删除"""
+    file_path = os.path.join(args.output_dir, f"asr_bench_{uuid.uuid4()}.wav")
+    with wave.open(file_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(pcm.tobytes())
+    with wave.open(file_path) as f:
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).astype(np.float32) / 32768
+    recognize(samples)
+    os.remove(file_path)
+
+
+def in_memory(pcm, recognize):
+    """新实现：直接把解码后的PCM转换为float32数组传给模型"""
+    recognize(pcm.astype(np.float32) / 32768)
+
+
+def run(name, fn, pcm, recognize):
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        fn(pcm, recognize)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.utterances)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} p50: {statistics.median(latencies) * 1000:8.2f}ms  "
+        f"p99: {percentile(latencies, 99) * 1000:8.2f}ms  "
+        f"total: {elapsed:6.2f}s"
+    )
+
+
+def main():
+    os.makedirs(args.output_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(int(args.seconds * 16000)) * 3000).astype(np.int16)
+    recognize = load_recognizer()
+
+    print(f"asr={args.asr or 'none'} utterances={args.utterances} seconds={args.seconds} concurrency={args.concurrency}")
+    run("file", via_file, pcm, recognize)
+    run("memory", in_memory, pcm, recognize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+TTS音频文件转16kHz单声道PCM的对比：进程内解码+多相重采样（core/utils/audio_decode.py） vs pydub（WAV用wave+audioop，其他格式启动ffmpeg子进程）。
+测量每次调用的耗时和CPU时间（包括子进程的CPU时间），并用正弦信号检查两种方式重采样后的信噪比。
+默认生成几种常见采样率的WAV，另外加上config/assets下的提示音和--files指定的文件（如mp3）。
+当前环境没有ffmpeg或mp3解码库时，对应的一列显示为不可用；最后打印启动一个空进程的耗时，作为每次启动ffmpeg的下限。
+只比较解码和重采样，不含两者相同的Opus编码。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/audio_decode_benchmark.py --repeat 20 --seconds 5
+    python benchmark/audio_decode_benchmark.py --files music/test.mp3 tmp/edge.mp3
+"""
+import os
+import sys
+import time
+import wave
+import argparse
+import statistics
+import subprocess
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="In-process audio decode benchmark")
+parser.add_argument("--repeat", type=int, default=20, help="每个文件转换的次数")
+parser.add_argument("--seconds", type=float, default=5.0, help="生成的WAV时长(秒)")
+parser.add_argument("--files", nargs="*", default=[], help="额外测试的音频文件")
+parser.add_argument("--output_dir", type=str, default="tmp/", help="生成的WAV存放目录")
+args = parser.parse_args()
+# 配置加载会解析命令行参数，这里清掉本脚本自己的参数
+sys.argv = sys.argv[:1]
+
+import numpy as np
+from pydub import AudioSegment
+from core.utils.audio_decode import decode_to_pcm16k
+
+TONE_HZ = 1000
+
+
+def write_wav(path, sample_rate, channels):
+    t = np.arange(int(sample_rate * args.seconds)) / sample_rate
+    tone = 0.5 * np.sin(2 * np.pi * TONE_HZ * t)
+    samples = np.repeat(tone[:, None], channels, axis=1)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(np.rint(samples * 32767).astype("<i2").tobytes())
+    return path
+
+
+def in_process(path):
+    return decode_to_pcm16k(path)
+
+
+def pydub(path):
+    file_type = os.path.splitext(path)[1].lstrip(".")
+    audio = AudioSegment.from_file(path, format=file_type, parameters=["-nostdin"])
+    return audio.set_channels(1).set_frame_rate(16000).set_sample_width(2).raw_data
+
+
+def measure(convert, path):
+    """返回(每次耗时列表, 每次平均CPU时间, 输出的PCM)，无法转换时返回None"""
+    try:
+        pcm = convert(path)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {str(e).splitlines()[0][:60] if str(e) else ''}"
+    if pcm is None:
+        return None, "no decoder"
+    walls = []
+    before = os.times()
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        convert(path)
+        walls.append(time.perf_counter() - start)
+    after = os.times()
+    # 包括ffmpeg子进程的CPU时间
+    cpu = sum(after[:4]) - sum(before[:4])
+    return (walls, cpu / args.repeat, pcm), None
+
+
+def tone_snr(pcm):
+    """与理想的16kHz正弦比较的信噪比(dB)，去掉两端滤波器的过渡部分"""
+    y = np.frombuffer(pcm, dtype="<i2").astype(np.float64) / 32767
+    ref = 0.5 * np.sin(2 * np.pi * TONE_HZ * np.arange(len(y)) / 16000)
+    body = slice(1600, len(y) - 1600)
+    err = y[body] - ref[body]
+    return 10 * np.log10(np.mean(ref[body] ** 2) / max(np.mean(err ** 2), 1e-20))
+
+
+def main():
+    os.makedirs(args.output_dir, exist_ok=True)
+    generated = [
+        write_wav(os.path.join(args.output_dir, f"decode_bench_{rate}_{ch}ch.wav"), rate, ch)
+        for rate, ch in ((16000, 1), (24000, 1), (32000, 1), (44100, 2), (48000, 2))
+    ]
+    assets = [p for p in ("config/assets/wakeup_words.wav", "config/assets/tts_notify.mp3") if os.path.exists(p)]
+    files = generated + assets + args.files
+
+    print(f"repeat={args.repeat} generated WAV {args.seconds}s, {TONE_HZ}Hz tone")
+    print(f"{'file':<36}{'in-process p50':>16}{'cpu':>9}{'pydub p50':>13}{'cpu':>9}{'SNR ours':>10}{'SNR pydub':>11}")
+    try:
+        for path in files:
+            ours, ours_error = measure(in_process, path)
+            theirs, theirs_error = measure(pydub, path)
+            row = f"{os.path.basename(path):<36}"
+            for result, width in ((ours, 16), (theirs, 13)):
+                if result is None:
+                    row += f"{'unavailable':>{width}}{'':>9}"
+                    continue
+                walls, cpu, _ = result
+                row += f"{statistics.median(walls) * 1000:>{width - 2}.2f}ms{cpu * 1000:>7.2f}ms"
+            if path in generated:
+                for result in (ours, theirs):
+                    row += f"{tone_snr(result[2]):>9.1f}dB" if result else f"{'-':>11}"
+                assert ours is not None and tone_snr(ours[2]) > 80, "进程内重采样的信噪比过低"
+            if ours is not None and theirs is not None:
+                # 两种方式的输出长度只差滤波器取整的几个样本
+                assert abs(len(ours[2]) - len(theirs[2])) <= 2 * 8, (len(ours[2]), len(theirs[2]))
+            print(row)
+            for error in (ours_error, theirs_error):
+                if error and error != "no decoder":
+                    print(f"    {error}")
+    finally:
+        for path in generated:
+            os.remove(path)
+
+    walls = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run(["true"])
+        walls.append(time.perf_counter() - start)
+    print(f"process spawn floor (no decoding): p50={statistics.median(walls) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
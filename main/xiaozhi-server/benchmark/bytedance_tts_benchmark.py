@@ -0,0 +1,217 @@
+"""
+字节跳动流式TTS多会话基准：在本地启动模拟的双向流式TTS服务（fake_bytedance_tts_server.py），
+多个设备连接共用一个bytedance.TTSProvider，每个设备注册自己的播放队列后同时合成若干句文本。
+每个设备模拟一轮对话：说完话（acquire）后经过asr_ms开始按llm_ms的间隔送出各句文本，最后结束这一轮。
+对比串行（一条连接、每条连接一个会话，相当于所有设备排一个队）与多路复用、mp3每25段解码一次与pcm收到即逐帧编码、
+每句一个上游会话与一轮回复共用一个上游会话（以及提前开启会话）、合成慢于实时时逐句合成与同时合成几句时，
+首句音频的延迟、句子之间的播放间隙和总耗时。
+模拟服务会在逗号处拆句，检查每个设备只收到自己的音频、句子和音频分片的顺序正确、每条连接同时进行的会话数不超过上限，
+pcm模式下每一帧都是完整的60ms且只包含这一句的采样。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/bytedance_tts_benchmark.py --devices 20 --sentences 3 --max_sessions_per_connection 10
+"""
+import os
+import sys
+import time
+import queue
+import asyncio
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="ByteDance streaming TTS multiplexing benchmark")
+parser.add_argument("--devices", type=int, default=10, help="同时合成的设备连接数")
+parser.add_argument("--sentences", type=int, default=3, help="每个设备合成的句数")
+parser.add_argument("--max_sessions_per_connection", type=int, default=10, help="每条连接同时进行的会话数上限")
+parser.add_argument("--max_connections", type=int, default=4, help="连接数上限")
+parser.add_argument("--asr_ms", type=float, default=200, help="说完话到第一句文本的时间(毫秒)")
+parser.add_argument("--llm_ms", type=float, default=300, help="相邻两句文本的间隔(毫秒)")
+parser.add_argument("--session_start_ms", type=float, default=80, help="模拟服务开启会话的耗时(毫秒)")
+parser.add_argument("--first_audio_ms", type=float, default=150, help="模拟服务收到文本到第一个音频分片的时间(毫秒)")
+parser.add_argument("--char_ms", type=float, default=100, help="模拟服务每个字的音频时长(毫秒)")
+parser.add_argument("--speed", type=float, default=4.0, help="模拟服务的合成速度是实时的多少倍")
+parser.add_argument("--slow_speed", type=float, default=0.8, help="合成慢于实时的对比中模拟服务的合成速度")
+parser.add_argument("--max_concurrent_sentences", type=int, default=3, help="每个设备同时合成的句数")
+parser.add_argument("--chunk_ms", type=float, default=25, help="模拟服务每个音频分片的时长(毫秒)，与60ms帧不对齐")
+parser.add_argument("--port", type=int, default=18100, help="模拟服务的端口")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+import numpy as np
+from fake_bytedance_tts_server import FakeByteDanceTTSServer, sample_value
+from core.providers.tts.bytedance import TTSProvider
+from core.utils.opus_encoder import OpusStreamEncoder
+
+
+class TagTTSProvider(TTSProvider):
+    """mp3模式下模拟服务返回的是"文本|序号"的字节，不做解码，直接放入播放队列"""
+
+    def decode_payloads(self, all_payloads):
+        return list(all_payloads)
+
+
+class PCMFrameEncoder(OpusStreamEncoder):
+    """分帧方式与Opus编码相同，但直接输出PCM帧，便于检查每一帧的内容"""
+
+    def encode_frame(self, frame):
+        return frame
+
+
+class PCMTTSProvider(TTSProvider):
+    stream_encoder = PCMFrameEncoder
+
+
+class RecordingQueue(queue.Queue):
+    """记录每次放入的时间"""
+
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    def put(self, item, block=True, timeout=None):
+        self.times.append(time.monotonic())
+        super().put(item, block, timeout)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def device_texts(device):
+    return [f"设备{device}的第{k}句话，内容是测试。" for k in range(args.sentences)]
+
+
+def playback_gaps(received, times, frame_ms):
+    """按实时播放模拟，下一句的音频到达时上一句已经播完的等待时间"""
+    gaps = []
+    play_end = None
+    for (audios, text, text_index, *stream), put_time in zip(received, times):
+        sentence_start = not stream or stream[0] == "start"
+        if sentence_start and play_end is not None and text_index > 1:
+            gaps.append(max(0.0, put_time - play_end))
+        start = put_time if play_end is None else max(put_time, play_end)
+        play_end = start + len(audios) * frame_ms / 1000
+    return gaps
+
+
+def check_mp3(d, received):
+    texts = [text for _, text, _ in received]
+    assert [t for i, t in enumerate(texts) if i == 0 or texts[i - 1] != t] == device_texts(d), texts
+    for opus_datas, text, text_index in received:
+        assert text_index == device_texts(d).index(text) + 1
+        assert all(payload.decode().split("|")[0] == text for payload in opus_datas), "收到了其他会话的音频"
+    for text in device_texts(d):
+        seq = [int(p.decode().split("|")[1]) for datas, t, _ in received if t == text for p in datas]
+        assert seq == list(range(len(seq))), f"音频分片乱序: {seq}"
+
+
+def check_pcm(d, received):
+    texts = device_texts(d)
+    position = 0
+    for text_index, text in enumerate(texts, start=1):
+        items = []
+        while position < len(received) and received[position][1] == text:
+            items.append(received[position])
+            position += 1
+        assert items, f"没有收到 {text} 的音频"
+        streams = [item[3] if len(item) > 3 else None for item in items]
+        assert streams in ([None], ["start"] + ["continue"] * (len(items) - 2) + ["end"]), streams
+        assert all(item[2] == text_index for item in items)
+        frames = [frame for item in items for frame in item[0]]
+        assert all(len(frame) == 1920 for frame in frames), "存在不完整的帧"
+        samples = np.frombuffer(b"".join(frames), dtype=np.int16)
+        samples = samples[:np.max(np.nonzero(samples)) + 1]  # 去掉最后一帧补的零
+        assert np.all(samples == sample_value(text)), "收到了其他会话的音频"
+    assert position == len(received), "收到了多余的音频"
+
+
+async def run(name, max_sessions_per_connection, max_connections, audio_format="pcm", session_per_reply=False,
+              preopen_session=False, max_concurrent_sentences=1, speed=None):
+    server = await FakeByteDanceTTSServer(
+        args.port, first_audio_ms=args.first_audio_ms, char_ms=args.char_ms, chunk_ms=args.chunk_ms,
+        speed=speed or args.speed,
+        session_start_ms=args.session_start_ms, split_sentences=True,
+    ).start()
+    provider_class = PCMTTSProvider if audio_format == "pcm" else TagTTSProvider
+    tts = provider_class({
+        "url": server.url,
+        "audio_format": audio_format,
+        "audio_sample_rate": 16000 if audio_format == "pcm" else 24000,
+        "appid": "fake",
+        "access_token": "fake",
+        "max_sessions_per_connection": max_sessions_per_connection,
+        "max_connections": max_connections,
+        "session_per_reply": session_per_reply,
+        "preopen_session": preopen_session,
+        "max_concurrent_sentences": max_concurrent_sentences,
+    })
+    try:
+        queues = {f"device-{d}": RecordingQueue() for d in range(args.devices)}
+        start = time.monotonic()
+
+        async def device(d):
+            session_id = f"device-{d}"
+            tts.acquire(session_id, queues[session_id], None)
+            await asyncio.sleep(args.asr_ms / 1000)
+            for k, text in enumerate(device_texts(d)):
+                if k:
+                    await asyncio.sleep(args.llm_ms / 1000)
+                await tts.text_to_speak(text, k + 1, session_id=session_id)
+            await tts.finish_reply(session_id)
+            await tts.release(session_id)
+
+        await asyncio.gather(*(device(d) for d in range(args.devices)))
+        while tts.sessions:
+            await asyncio.sleep(0.01)
+        total = time.monotonic() - start
+
+        # 每个设备只收到自己的音频，句子和分片都按顺序
+        gaps = []
+        for d in range(args.devices):
+            play_queue = queues[f"device-{d}"]
+            received = []
+            while not play_queue.empty():
+                received.append(play_queue.get_nowait())
+            check_pcm(d, received) if audio_format == "pcm" else check_mp3(d, received)
+            gaps.extend(playback_gaps(received, play_queue.times, 60 if audio_format == "pcm" else args.chunk_ms))
+
+        first_audio = [q.times[0] - start for q in queues.values()]
+        assert server.max_active_sessions <= max_sessions_per_connection, server.max_active_sessions
+        assert server.connections <= max_connections, server.connections
+        print(
+            f"{name:<14} first audio p50={percentile(first_audio, 50) * 1000:>5.0f}ms "
+            f"max={max(first_audio) * 1000:>5.0f}ms gap p50={percentile(gaps, 50) * 1000:>4.0f}ms "
+            f"max={max(gaps) * 1000:>4.0f}ms total={total:>5.2f}s upstream sessions={server.sessions} "
+            f"connections={server.connections} max sessions per connection={server.max_active_sessions}"
+        )
+    finally:
+        await tts.close()
+        await server.stop()
+
+
+async def main():
+    print(
+        f"devices={args.devices} sentences={args.sentences} session_start={args.session_start_ms}ms "
+        f"first_audio={args.first_audio_ms}ms speed={args.speed}x"
+    )
+    limits = (args.max_sessions_per_connection, args.max_connections)
+    await run("serialized", 1, 1)
+    await run("mp3 batched", *limits, "mp3")
+    await run("pcm streamed", *limits)
+    await run("reply session", *limits, session_per_reply=True)
+    await run("reply preopen", *limits, session_per_reply=True, preopen_session=True)
+    print(f"synthesis slower than real time: speed={args.slow_speed}x")
+    await run("sequential", *limits, speed=args.slow_speed)
+    await run(f"concurrent K={args.max_concurrent_sentences}", *limits,
+              max_concurrent_sentences=args.max_concurrent_sentences, speed=args.slow_speed)
+    print("routing checks: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
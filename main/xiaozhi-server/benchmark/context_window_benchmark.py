@@ -0,0 +1,101 @@
+"""
+对话上下文窗口基准：模拟一段很长的会话，对比发送全部历史与按token预算截取（旧轮次合并为摘要）时每轮的prompt token数，
+以及组装prompt的耗时，和相邻两轮请求开头字节相同的比例（服务端提示词缓存可以复用的部分）。摘要使用一个模拟的LLM生成（固定延迟，返回截断后的文本），不需要真实的模型服务。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/context_window_benchmark.py --turns 200 --max_tokens 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="Context window benchmark")
+parser.add_argument("--turns", type=int, default=200, help="会话轮数")
+parser.add_argument("--max_tokens", type=int, default=2000, help="上下文token预算")
+parser.add_argument("--summary_latency_ms", type=float, default=300, help="模拟摘要LLM的延迟(毫秒)")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+from core.utils.dialogue import Dialogue, Message
+from core.utils.context_window import ContextWindow, dialogue_tokens
+
+WORDS = "今天天气很好我们一起去公园散步吧小朋友们在草地上玩耍阳光照在湖面上闪闪发光"
+SYSTEM_PROMPT = "你是一个叫小智的台湾女孩，说话机车，声音好听，习惯简短表达。" * 5
+MEMORY = "用户喜欢听周杰伦的歌，住在深圳，养了一只猫。" * 20
+
+
+class MockLLM:
+    async def response_no_stream(self, system_prompt, user_prompt):
+        await asyncio.sleep(args.summary_latency_ms / 1000)
+        return user_prompt[-200:]
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def sentence(rng, length):
+    return "".join(rng.choice(WORDS) for _ in range(length)) + "。"
+
+
+async def run(window):
+    rng = random.Random(0)
+    dialogue = Dialogue()
+    dialogue.window = window
+    dialogue.put(Message(role="system", content=SYSTEM_PROMPT))
+    tokens = []
+    reuse = []
+    previous = ""
+    build_time = 0.0
+    for _ in range(args.turns):
+        dialogue.put(Message(role="user", content=sentence(rng, rng.randint(8, 30))))
+        start = time.perf_counter()
+        llm_dialogue = dialogue.get_llm_dialogue_with_memory(MEMORY)
+        build_time += time.perf_counter() - start
+        tokens.append(dialogue_tokens(llm_dialogue))
+        request = json.dumps(llm_dialogue, ensure_ascii=False)
+        reuse.append(common_prefix(previous, request) / len(request))
+        previous = request
+        dialogue.put(Message(role="assistant", content=sentence(rng, rng.randint(20, 80))))
+        # 模拟用户说话的间隔，让后台摘要有机会完成
+        await asyncio.sleep(0.05)
+    return tokens, reuse, build_time
+
+
+async def main():
+    full, full_reuse, full_time = await run(None)
+    llm = MockLLM()
+    window = ContextWindow({"max_tokens": args.max_tokens}, get_llm=lambda: llm)
+    windowed, windowed_reuse, windowed_time = await run(window)
+
+    print(f"turns={args.turns} max_tokens={args.max_tokens}")
+    print(f"{'turn':>6} {'full':>8} {'windowed':>10}")
+    step = max(1, args.turns // 10)
+    for i in list(range(0, args.turns, step)) + [args.turns - 1]:
+        print(f"{i + 1:>6} {full[i]:>8} {windowed[i]:>10}")
+    print(f"max prompt tokens: full={max(full)} windowed={max(windowed)}")
+    print(
+        f"avg prefix reuse: full={sum(full_reuse[1:]) / (len(full_reuse) - 1):.1%} "
+        f"windowed={sum(windowed_reuse[1:]) / (len(windowed_reuse) - 1):.1%}"
+    )
+    print(f"total build time: full={full_time * 1000:.1f}ms windowed={windowed_time * 1000:.1f}ms")
+    print(f"window metrics: {window.get_metrics()}")
+    print(f"summary: {window.summary[:60]}...")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
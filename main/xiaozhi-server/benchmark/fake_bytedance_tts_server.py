@@ -0,0 +1,187 @@
+"""
+本地模拟的字节跳动双向流式TTS服务（/api/v3/tts/bidirection 的二进制协议），用于在没有真实服务时检查TTS相关的逻辑。
+支持一条连接上同时进行多个会话，每个会话可以发送多句文本；按句子长度生成音频，按chunk_ms分片、以speed倍实时速度返回。
+split_sentences时和真实服务一样在逗号处把一个TaskRequest拆成几句，分别返回句子开始/结束。
+pcm格式返回16位PCM（每句文本的采样值固定，可以据此检查音频有没有发错会话），其他格式返回"文本|序号"的字节。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/fake_bytedance_tts_server.py --port 18100 --first_audio_ms 150
+
+配置中的bytedanceStream使用 url: ws://127.0.0.1:18100 即可请求该服务。
+也可以在其他脚本中 from fake_bytedance_tts_server import FakeByteDanceTTSServer 启动。
+"""
+import os
+import sys
+import re
+import json
+import zlib
+import asyncio
+import argparse
+import numpy as np
+from websockets.asyncio.server import serve
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(current_dir, "..")))
+
+from core.providers.tts.bytedance import (
+    Header, FULL_SERVER_RESPONSE, AUDIO_ONLY_RESPONSE, MsgTypeFlagWithEvent, JSON,
+    EVENT_Start_Connection, EVENT_FinishConnection, EVENT_ConnectionStarted, EVENT_StartSession,
+    EVENT_FinishSession, EVENT_SessionStarted, EVENT_SessionFinished, EVENT_TaskRequest,
+    EVENT_TTSSentenceStart, EVENT_TTSSentenceEnd, EVENT_TTSResponse,
+)
+
+
+def sample_value(text):
+    """每句文本的PCM采样值，用于检查音频属于哪一句"""
+    return zlib.crc32(text.encode()) % 20000 + 1
+
+
+def pack(*parts):
+    data = bytearray()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        data.extend(len(part).to_bytes(4, "big", signed=True))
+        data.extend(part)
+    return bytes(data)
+
+
+def server_frame(event, *parts, message_type=FULL_SERVER_RESPONSE):
+    header = Header(message_type=message_type, message_type_specific_flags=MsgTypeFlagWithEvent,
+                    serial_method=JSON).as_bytes()
+    return header + event.to_bytes(4, "big", signed=True) + pack(*parts)
+
+
+def parse_request(data):
+    event = int.from_bytes(data[4:8], "big", signed=True)
+    offset = 8
+    session_id = None
+    if event not in (EVENT_Start_Connection, EVENT_FinishConnection):
+        size = int.from_bytes(data[offset:offset + 4], "big")
+        session_id = data[offset + 4:offset + 4 + size].decode()
+        offset += 4 + size
+    size = int.from_bytes(data[offset:offset + 4], "big")
+    payload = json.loads(data[offset + 4:offset + 4 + size] or b"{}")
+    return event, session_id, payload
+
+
+class FakeByteDanceTTSServer:
+    def __init__(self, port: int, first_audio_ms: float = 150, char_ms: float = 200, chunk_ms: float = 40,
+                 speed: float = 2.0, session_start_ms: float = 30, split_sentences: bool = False):
+        self.port = port
+        self.first_audio_ms = first_audio_ms  # 收到文本到返回第一个音频分片的时间
+        self.char_ms = char_ms  # 每个字的音频时长
+        self.chunk_ms = chunk_ms  # 每个音频分片的时长
+        self.speed = speed  # 合成速度是实时的多少倍
+        self.session_start_ms = session_start_ms  # 开启会话的耗时
+        self.split_sentences = split_sentences
+        self.connections = 0
+        self.sessions = 0
+        self.active_sessions = {}  # 连接编号 -> 正在进行的会话数
+        self.max_active_sessions = 0  # 单条连接上同时进行的会话数的最大值
+        self._server = None
+
+    def _pcm_chunk(self, text, samples):
+        return np.full(samples, sample_value(text), dtype=np.int16).tobytes()
+
+    async def _session(self, ws, session_id, texts, audio_params):
+        """开启会话后按顺序合成会话中的每一句文本，FinishSession之后返回SessionFinished"""
+        await asyncio.sleep(self.session_start_ms / 1000)
+        await ws.send(server_frame(EVENT_SessionStarted, session_id, "{}"))
+        audio_format = audio_params.get("format", "mp3")
+        sample_rate = audio_params.get("sample_rate", 24000)
+        while True:
+            text = await texts.get()
+            if text is None:
+                break
+            await asyncio.sleep(self.first_audio_ms / 1000)
+            sentences = re.findall(r"[^，,]+[，,]?", text) if self.split_sentences else [text]
+            i = 0
+            for sentence in sentences:
+                meta = json.dumps({"res_params": {"text": sentence}}, ensure_ascii=False)
+                await ws.send(server_frame(EVENT_TTSSentenceStart, session_id, meta))
+                chunks = max(1, int(len(sentence) * self.char_ms / self.chunk_ms))
+                samples = int(sample_rate * self.chunk_ms / 1000)
+                for _ in range(chunks):
+                    # 音频内容按整个TaskRequest的文本生成，便于检查拆句后的音频是否对应到了这一句
+                    if audio_format == "pcm":
+                        payload = self._pcm_chunk(text, samples)
+                    else:
+                        payload = f"{text}|{i}".encode()
+                    i += 1
+                    await ws.send(server_frame(EVENT_TTSResponse, session_id, payload, message_type=AUDIO_ONLY_RESPONSE))
+                    await asyncio.sleep(self.chunk_ms / self.speed / 1000)
+                await ws.send(server_frame(EVENT_TTSSentenceEnd, session_id, meta))
+        await ws.send(server_frame(EVENT_SessionFinished, session_id, "{}"))
+
+    async def handler(self, ws):
+        self.connections += 1
+        index = self.connections
+        self.active_sessions[index] = 0
+        sessions = {}  # 会话ID -> 文本队列
+        tasks = set()
+
+        def on_session_done(task, session_id):
+            tasks.discard(task)
+            sessions.pop(session_id, None)
+            self.active_sessions[index] -= 1
+
+        try:
+            async for message in ws:
+                event, session_id, payload = parse_request(message)
+                if event == EVENT_Start_Connection:
+                    await ws.send(server_frame(EVENT_ConnectionStarted, f"fake-connection-{index}"))
+                elif event == EVENT_StartSession:
+                    self.sessions += 1
+                    self.active_sessions[index] += 1
+                    self.max_active_sessions = max(self.max_active_sessions, self.active_sessions[index])
+                    texts = asyncio.Queue()
+                    sessions[session_id] = texts
+                    audio_params = payload.get("req_params", {}).get("audio_params", {})
+                    task = asyncio.create_task(self._session(ws, session_id, texts, audio_params))
+                    tasks.add(task)
+                    task.add_done_callback(lambda t, s=session_id: on_session_done(t, s))
+                elif event == EVENT_TaskRequest and session_id in sessions:
+                    sessions[session_id].put_nowait(payload["req_params"]["text"])
+                elif event == EVENT_FinishSession and session_id in sessions:
+                    sessions[session_id].put_nowait(None)
+                elif event == EVENT_FinishConnection:
+                    break
+        except Exception:
+            # 客户端断开
+            pass
+        finally:
+            for task in list(tasks):
+                task.cancel()
+
+    async def start(self):
+        self._server = await serve(self.handler, "127.0.0.1", self.port, max_size=None)
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+
+async def main(args):
+    server = await FakeByteDanceTTSServer(args.port, args.first_audio_ms, args.char_ms, args.chunk_ms, args.speed).start()
+    print(f"fake ByteDance TTS server: {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake ByteDance bidirectional TTS server")
+    parser.add_argument("--port", type=int, default=18100, help="监听端口")
+    parser.add_argument("--first_audio_ms", type=float, default=150, help="收到文本到第一个音频分片的时间(毫秒)")
+    parser.add_argument("--char_ms", type=float, default=200, help="每个字的音频时长(毫秒)")
+    parser.add_argument("--chunk_ms", type=float, default=40, help="每个音频分片的时长(毫秒)")
+    parser.add_argument("--speed", type=float, default=2.0, help="合成速度是实时的多少倍")
+    asyncio.run(main(parser.parse_args()))
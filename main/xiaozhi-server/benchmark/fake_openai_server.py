@@ -0,0 +1,121 @@
+"""
+本地模拟的OpenAI兼容接口（/v1/chat/completions，流式SSE），用于在没有真实模型服务时检查LLM相关的逻辑。
+可以随时切换服务状态：正常、变慢、返回500错误、连接后一直不返回。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/fake_openai_server.py --port 18090 --ttft_ms 200
+    # 切换状态
+    curl -X POST localhost:18090/control -d '{"mode": "error"}'
+
+配置中的LLM使用 type: openai, base_url: http://127.0.0.1:18090/v1 即可请求该服务。
+也可以在其他脚本中 from fake_openai_server import FakeOpenAIServer 启动。
+"""
+import json
+import time
+import asyncio
+import argparse
+from aiohttp import web
+
+MODES = ("ok", "slow", "error", "hang")
+
+
+class FakeOpenAIServer:
+    def __init__(self, port: int, ttft_ms: float = 200, token_ms: float = 20, slow_ms: float = 5000,
+                 reply: str = "好的，今天天气很好。"):
+        self.port = port
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.slow_ms = slow_ms
+        self.reply = reply
+        self.mode = "ok"
+        self.requests = 0
+        self.active = 0
+        self._runner = None
+        self._stopped = None
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        self.requests += 1
+        if self.mode == "error":
+            return web.json_response({"error": {"message": "fake server error", "type": "server_error"}}, status=500)
+        self.active += 1
+        try:
+            if self.mode == "hang":
+                # 一直不返回，直到服务停止
+                await self._stopped.wait()
+                return web.json_response({"error": {"message": "fake server stopped"}}, status=503)
+            delay = self.slow_ms if self.mode == "slow" else self.ttft_ms
+            await asyncio.sleep(delay / 1000)
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            created = int(time.time())
+            try:
+                for char in self.reply:
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}],
+                    }
+                    await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                    await asyncio.sleep(self.token_ms / 1000)
+                await response.write(b"data: [DONE]\n\n")
+                await response.write_eof()
+            except ConnectionResetError:
+                # 客户端提前断开（打断、取消）
+                pass
+            return response
+        finally:
+            self.active -= 1
+
+    async def control(self, request):
+        body = await request.json()
+        if body.get("mode") in MODES:
+            self.mode = body["mode"]
+        for key in ("ttft_ms", "token_ms", "slow_ms"):
+            if key in body:
+                setattr(self, key, float(body[key]))
+        return web.json_response({"mode": self.mode, "ttft_ms": self.ttft_ms, "requests": self.requests})
+
+    async def start(self):
+        self._stopped = asyncio.Event()
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/control", self.control)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+        # port为0时使用系统分配的端口
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        if self._stopped:
+            self._stopped.set()
+        if self._runner:
+            await self._runner.cleanup()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+async def main(args):
+    server = await FakeOpenAIServer(args.port, args.ttft_ms, args.token_ms, args.slow_ms).start()
+    server.mode = args.mode
+    print(f"fake OpenAI server: {server.base_url} mode={server.mode}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=18090, help="监听端口")
+    parser.add_argument("--mode", choices=MODES, default="ok", help="初始状态")
+    parser.add_argument("--ttft_ms", type=float, default=200, help="正常状态的首token延迟(毫秒)")
+    parser.add_argument("--token_ms", type=float, default=20, help="每个token的间隔(毫秒)")
+    parser.add_argument("--slow_ms", type=float, default=5000, help="变慢状态的首token延迟(毫秒)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,155 @@
+"""
+对冲LLM基准：两个模拟的LLM服务，首token延迟为长尾分布（大部分请求较快，少量请求很慢），
+对比只请求主服务与使用HedgedLLM时首token延迟的p50/p95/p99，以及额外发出的请求比例。
+同时检查被取消的请求都已经关闭，服务出错时切换到下一个服务。不需要真实的模型服务。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/hedged_llm_benchmark.py --requests 300 --median_ms 300 --slow_ratio 0.05 --slow_ms 3000
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="Hedged LLM benchmark")
+parser.add_argument("--requests", type=int, default=300, help="请求数")
+parser.add_argument("--concurrency", type=int, default=20, help="同时进行的请求数")
+parser.add_argument("--median_ms", type=float, default=300, help="首token延迟的中位数(毫秒)")
+parser.add_argument("--slow_ratio", type=float, default=0.05, help="慢请求的比例")
+parser.add_argument("--slow_ms", type=float, default=3000, help="慢请求的首token延迟(毫秒)")
+parser.add_argument("--hedge_delay_ms", type=float, default=1000, help="样本不足时的对冲延迟(毫秒)")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+from core.providers.llm.base import LLMError
+from core.providers.llm.hedged.hedged import LLMProvider as HedgedLLM
+
+TOKENS = ["好的", "，", "今天", "天气", "很好", "。"]
+
+
+class MockLLM:
+    """首token延迟为对数正态分布，slow_ratio的请求额外变慢；记录未关闭的流"""
+
+    def __init__(self, seed, fail_ratio=0.0):
+        self.rng = random.Random(seed)
+        self.fail_ratio = fail_ratio
+        self.open_streams = 0
+        self.requests = 0
+
+    def ttft(self):
+        ttft = self.rng.lognormvariate(0, 0.3) * args.median_ms / 1000
+        if self.rng.random() < args.slow_ratio:
+            ttft += args.slow_ms / 1000
+        return ttft
+
+    async def response(self, session_id, dialogue):
+        self.requests += 1
+        self.open_streams += 1
+        try:
+            await asyncio.sleep(self.ttft())
+            if self.rng.random() < self.fail_ratio:
+                yield LLMError("【模拟服务响应异常】")
+                return
+            for token in TOKENS:
+                yield token
+                await asyncio.sleep(0.01)
+        finally:
+            self.open_streams -= 1
+
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        async for token in self.response(session_id, dialogue):
+            yield token, None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def measure(llm, requests):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ttfts = []
+
+    async def one():
+        async with semaphore:
+            start = time.monotonic()
+            first = None
+            text = ""
+            async for token in llm.response("benchmark", []):
+                if first is None:
+                    first = time.monotonic() - start
+                text += token
+            assert text == "".join(TOKENS), text
+            ttfts.append(first)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return ttfts
+
+
+def report(name, ttfts):
+    print(
+        f"{name:>12}: p50={percentile(ttfts, 50) * 1000:>6.0f}ms p95={percentile(ttfts, 95) * 1000:>6.0f}ms "
+        f"p99={percentile(ttfts, 99) * 1000:>6.0f}ms max={max(ttfts) * 1000:>6.0f}ms"
+    )
+
+
+async def check_failover():
+    """主服务总是出错时切换到下一个服务；两个服务都出错时返回错误信息"""
+    hedged = HedgedLLM({}, providers={"primary": MockLLM(2, fail_ratio=1.0), "secondary": MockLLM(3)})
+    items = [item async for item in hedged.response_with_functions("benchmark", [])]
+    assert "".join(content for content, _ in items) == "".join(TOKENS), items
+    hedged = HedgedLLM({}, providers={"primary": MockLLM(4, fail_ratio=1.0), "secondary": MockLLM(5, fail_ratio=1.0)})
+    items = [item async for item in hedged.response("benchmark", [])]
+    assert items == ["【模拟服务响应异常】"], items
+    # 正常回复以【...】开头时不是错误，不切换服务
+    prefixed = MockLLM(6)
+    prefixed_response = prefixed.response
+
+    async def reply_with_prefix(session_id, dialogue):
+        yield "【提示】"
+        async for token in prefixed_response(session_id, dialogue):
+            yield token
+
+    prefixed.response = reply_with_prefix
+    hedged = HedgedLLM({}, providers={"primary": prefixed, "secondary": MockLLM(7, fail_ratio=1.0)})
+    items = [item async for item in hedged.response("benchmark", [])]
+    assert "".join(items) == "【提示】" + "".join(TOKENS), items
+    assert hedged.stats["primary"]["errors"] == 0, hedged.stats
+    print("failover checks: ok")
+
+
+async def main():
+    await check_failover()
+
+    primary_only = await measure(MockLLM(0), args.requests)
+
+    primary, secondary = MockLLM(0), MockLLM(1)
+    hedged = HedgedLLM(
+        {"hedge_delay_ms": args.hedge_delay_ms, "log_interval": 0},
+        providers={"primary": primary, "secondary": secondary},
+    )
+    # 预热：积累首token延迟样本，对冲延迟从配置值切换到自适应的分位数
+    await measure(hedged, hedged.min_samples * 2)
+    hedged_ttfts = await measure(hedged, args.requests)
+    # 等待被取消的请求完成清理
+    await asyncio.sleep(0.1)
+    assert primary.open_streams == 0 and secondary.open_streams == 0, "被取消的请求没有关闭"
+
+    print(f"requests={args.requests} median={args.median_ms}ms slow_ratio={args.slow_ratio} slow={args.slow_ms}ms")
+    report("primary only", primary_only)
+    report("hedged", hedged_ttfts)
+    metrics = hedged.get_metrics()
+    print(f"hedged requests: {metrics['hedged_requests'] / metrics['requests']:.1%}, hedge delay: {metrics['hedge_delay']}")
+    print(f"providers: {metrics['providers']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+LLM路由基准：在本地启动两个模拟的OpenAI兼容服务（fake_openai_server.py），通过openai类型的LLM请求，
+依次模拟主服务正常、返回500错误、连接后不返回、恢复正常，观察路由的行为：
+出错时在同一次请求中切换到备用服务，连续失败后熔断，之后的请求直接使用备用服务不再等待；
+熔断时间到达后在后台探测，主服务恢复后新会话重新使用主服务。输出每个阶段的请求耗时和路由状态，
+这些行为的检查见 tests/test_llm_router.py。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/llm_router_benchmark.py --requests 10
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="LLM router check")
+parser.add_argument("--requests", type=int, default=10, help="每个阶段的请求数")
+parser.add_argument("--ttft_ms", type=float, default=100, help="模拟服务正常时的首token延迟(毫秒)")
+parser.add_argument("--first_token_timeout_ms", type=float, default=1000, help="路由的首token超时(毫秒)")
+parser.add_argument("--open_seconds", type=float, default=3, help="熔断时间(秒)，需要长于一个阶段的请求耗时")
+parser.add_argument("--port", type=int, default=18091, help="第一个模拟服务的端口，第二个使用下一个端口")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+from fake_openai_server import FakeOpenAIServer
+from core.providers.llm.openai.openai import LLMProvider as OpenAILLM
+from core.providers.llm.router.router import LLMProvider as RouterLLM
+
+DIALOGUE = [{"role": "user", "content": "今天天气怎么样"}]
+
+
+def openai_llm(server):
+    return OpenAILLM({"model_name": "fake", "api_key": "sk-fake", "base_url": server.base_url, "stream_usage": False})
+
+
+async def request(router, session_id):
+    start = time.monotonic()
+    text = ""
+    async for content, tool_calls in router.response_with_functions(session_id, DIALOGUE):
+        text += content or ""
+    return time.monotonic() - start, text
+
+
+async def phase(name, router, sessions):
+    elapsed = []
+    for i in range(args.requests):
+        seconds, _ = await request(router, sessions[i % len(sessions)])
+        elapsed.append(seconds)
+    states = {n: h["state"] for n, h in router.get_metrics()["providers"].items()}
+    print(
+        f"{name:<22} first={elapsed[0] * 1000:>6.0f}ms max={max(elapsed) * 1000:>6.0f}ms "
+        f"avg={sum(elapsed) / len(elapsed) * 1000:>6.0f}ms states={states}"
+    )
+    return elapsed
+
+
+async def main():
+    primary = await FakeOpenAIServer(args.port, ttft_ms=args.ttft_ms, token_ms=5).start()
+    secondary = await FakeOpenAIServer(args.port + 1, ttft_ms=args.ttft_ms * 1.5, token_ms=5).start()
+    router = RouterLLM(
+        {
+            "first_token_timeout_ms": args.first_token_timeout_ms,
+            "open_seconds": args.open_seconds,
+            "probe_timeout_ms": args.first_token_timeout_ms,
+        },
+        providers={"primary": openai_llm(primary), "secondary": openai_llm(secondary)},
+    )
+    sessions = [f"session-{i}" for i in range(3)]
+    try:
+        await phase("both ok", router, sessions)
+
+        primary.mode = "error"
+        await phase("primary 500", router, sessions)
+
+        primary.mode = "hang"
+        await asyncio.sleep(args.open_seconds + 0.1)
+        await phase("primary hang", router, ["new-session-1"])
+
+        primary.mode = "ok"
+        # 没有新请求时后台探测也会进行，探测成功后新会话回到主服务
+        await asyncio.sleep(args.open_seconds * 2 + args.ttft_ms * 3 / 1000 + 0.1)
+        await phase("primary recovered", router, ["new-session-2"])
+        print(f"metrics: {router.get_metrics()}")
+        print(f"server requests: primary={primary.requests} secondary={secondary.requests}")
+    finally:
+        await router.close()
+        await primary.stop()
+        await secondary.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
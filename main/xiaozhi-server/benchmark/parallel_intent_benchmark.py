@@ -0,0 +1,191 @@
+"""
+意图识别并行基准：intent_llm模式下，对比先识别意图再开始对话，与意图识别和对话同时开始时，
+从用户说完到第一句话送TTS的时间；并统计识别到函数意图时被取消的对话浪费的token数。
+意图识别和对话都使用模拟的LLM（固定延迟），直接调用ConnectionHandler.chat和startToChat，不需要真实的模型服务。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/parallel_intent_benchmark.py --turns 20 --intent_ms 400 --ttft_ms 300 --function_ratio 0.3
+
+并行时每个继续聊天的轮次首句提前 min(意图识别耗时, 对话首句耗时)；函数意图的轮次不会有任何对话语音输出。
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="Parallel intent benchmark")
+parser.add_argument("--turns", type=int, default=20, help="对话轮数")
+parser.add_argument("--intent_ms", type=float, default=400, help="模拟意图识别的延迟(毫秒)")
+parser.add_argument("--ttft_ms", type=float, default=300, help="模拟对话LLM的首token延迟(毫秒)")
+parser.add_argument("--token_ms", type=float, default=30, help="模拟对话LLM每个token的间隔(毫秒)")
+parser.add_argument("--function_ratio", type=float, default=0.3, help="识别为函数意图的轮次比例")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+from core.connection import ConnectionHandler
+from core.utils.dialogue import Dialogue, Message
+from core.utils.prompt_cache import PromptPrefix
+from core.performance_monitor import PerformanceMonitor
+from core.utils.parallel_intent import parallel_intent_stats
+from core.handle import receiveAudioHandle
+from plugins_func.register import Action, ActionResponse
+
+REPLY = ["好的", "，", "今天", "天气", "很好", "。", "适合", "出去", "走走", "。"]
+CONTINUE = json.dumps({"function_call": {"name": "continue_chat"}})
+FUNCTION = json.dumps({"function_call": {"name": "get_weather", "arguments": {"location": "深圳"}}})
+
+
+class MockChatLLM:
+    async def response(self, session_id, dialogue):
+        await asyncio.sleep(args.ttft_ms / 1000)
+        for token in REPLY:
+            yield token
+            await asyncio.sleep(args.token_ms / 1000)
+
+
+class MockIntent:
+    def __init__(self):
+        self.result = CONTINUE
+
+    async def detect_intent(self, conn, dialogue_history, text):
+        await asyncio.sleep(args.intent_ms / 1000)
+        return self.result
+
+
+class MockMemory:
+    async def query_memory(self, query):
+        return ""
+
+    async def get_memory(self, speaker_id):
+        return ""
+
+
+class MockTTS:
+    def __init__(self):
+        self.first_text_time = None
+        self.texts = []
+        self.released = 0
+
+    async def release(self, session_id):
+        self.released += 1
+
+    async def text_to_speak(self, text, text_index, session_id=None):
+        if self.first_text_time is None:
+            self.first_text_time = time.time()
+        self.texts.append(text)
+
+
+class MockWebsocket:
+    async def send(self, message):
+        pass
+
+
+class MockFuncHandler:
+    def handle_llm_function_call(self, conn, function_call_data):
+        return ActionResponse(action=Action.RESPONSE, result=None, response="深圳今天晴")
+
+
+def create_conn(parallel):
+    """只初始化chat和startToChat用到的属性"""
+    conn = ConnectionHandler.__new__(ConnectionHandler)
+    conn.config = {"segmenter": {}}
+    conn.logger = receiveAudioHandle.logger
+    conn.session_id = "benchmark"
+    conn.use_function_call_mode = False
+    conn.use_parallel_intent = parallel
+    conn.cmd_exit = []
+    conn.proactive = None
+    conn.private_config = None
+    conn.client_abort = False
+    conn.llm_finish_task = True
+    conn.llm_task = None
+    conn.tts_first_text_index = -1
+    conn.tts_last_text_index = -1
+    conn.asr_server_receive = False
+    conn.dialogue = Dialogue()
+    conn.dialogue.put(Message(role="system", content="你是小智"))
+    conn.prompt_prefix = PromptPrefix()
+    conn.performance_monitor = PerformanceMonitor()
+    conn.memory = MockMemory()
+    conn.llm = MockChatLLM()
+    conn.intent = MockIntent()
+    conn.tts = MockTTS()
+    conn.websocket = MockWebsocket()
+    conn.func_handler = MockFuncHandler()
+    conn.executor = ThreadPoolExecutor(max_workers=2)
+    conn.spoken = []
+    conn.speak_and_play = lambda text, text_index=0, session_id=None: conn.spoken.append(text)
+    # 不处理唤醒词
+    conn.config["enable_wakeup_words_response_cache"] = False
+    return conn
+
+
+async def run_turn(conn, is_function):
+    conn.intent.result = FUNCTION if is_function else CONTINUE
+    conn.tts = MockTTS()
+    conn.spoken = []
+    conn.tts_first_text_index = -1
+    start = time.time()
+    await receiveAudioHandle.startToChat(conn, "今天天气怎么样")
+    if conn.llm_task is not None:
+        try:
+            await conn.llm_task
+        except asyncio.CancelledError:
+            pass
+    if is_function:
+        # 等待线程池中的函数调用完成
+        for _ in range(100):
+            if conn.spoken:
+                break
+            await asyncio.sleep(0.01)
+    first_audio = (conn.tts.first_text_time - start) if conn.tts.first_text_time else None
+    return first_audio, conn.tts.texts, conn.spoken, conn.tts.released
+
+
+async def run(parallel):
+    rng = random.Random(0)
+    conn = create_conn(parallel)
+    chat_times = []
+    function_turns = 0
+    for _ in range(args.turns):
+        is_function = rng.random() < args.function_ratio
+        first_audio, texts, spoken, released = await run_turn(conn, is_function)
+        if is_function:
+            function_turns += 1
+            assert not texts, f"函数意图的轮次不应该有对话语音输出: {texts}"
+            assert spoken == ["深圳今天晴"], spoken
+            # 被取消的对话不能释放TTS会话，否则函数的回复不会播放
+            assert released == 0, "函数意图的轮次释放了TTS会话"
+        else:
+            assert texts and first_audio is not None
+            assert released == 1, released
+            chat_times.append(first_audio)
+    users = [m.content for m in conn.dialogue.dialogue if m.role == "user"]
+    assert len(users) == args.turns, "每轮只应该放入一条用户消息"
+    assert conn.performance_monitor.metrics.error_count == 0, "取消对话不应该计为请求失败"
+    conn.executor.shutdown()
+    return chat_times, function_turns
+
+
+async def main():
+    sequential, function_turns = await run(False)
+    parallel, _ = await run(True)
+    avg = lambda values: sum(values) / len(values) * 1000 if values else 0
+    print(f"turns={args.turns} chat_turns={len(parallel)} function_turns={function_turns}")
+    print(f"intent={args.intent_ms}ms ttft={args.ttft_ms}ms")
+    print(f"avg time to first audio: sequential={avg(sequential):.0f}ms parallel={avg(parallel):.0f}ms")
+    print(f"parallel intent metrics: {parallel_intent_stats.get_metrics()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+VAD输入缓冲区微基准：对比原来的bytes拼接/切片与PCMRingBuffer在每个数据包上的内存分配和CPU耗时
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/pcm_buffer_benchmark.py --packets 20000
+
+未安装libopus时只比较缓冲区管理本身（解码后的PCM用固定数据代替）；
+安装了libopus时额外比较“解码成bytes再拼接”与“直接解码进缓冲区”的完整路径。
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="PCM buffer microbenchmark")
+parser.add_argument("--packets", type=int, default=20000, help="模拟的数据包数量（每包60ms/960个样本）")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+import numpy as np
+from core.utils.pcm_buffer import PCMRingBuffer
+
+FRAME_SIZE = 960
+CHUNK = 512
+
+
+def bytes_path(frames):
+    """原实现：bytes拼接，按1024字节切片，再转换为float32"""
+    buffer = bytes()
+    samples = 0
+    for frame in frames:
+        buffer += frame
+        while len(buffer) >= CHUNK * 2:
+            chunk = buffer[:CHUNK * 2]
+            buffer = buffer[CHUNK * 2:]
+            audio = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+            samples += len(audio)
+    return samples
+
+
+def ring_path(ring, frames):
+    """新实现：写入固定容量的float32缓冲区，按视图读取"""
+    samples = 0
+    for frame in frames:
+        ring.write(frame)
+        while (chunk := ring.read(CHUNK)) is not None:
+            samples += len(chunk)
+    return samples
+
+
+def decode_bytes_path(decoder, packets):
+    buffer = bytes()
+    samples = 0
+    for packet in packets:
+        buffer += decoder.decode(packet, FRAME_SIZE)
+        while len(buffer) >= CHUNK * 2:
+            chunk = buffer[:CHUNK * 2]
+            buffer = buffer[CHUNK * 2:]
+            audio = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+            samples += len(audio)
+    return samples
+
+
+def decode_ring_path(ring, decoder, packets):
+    samples = 0
+    for packet in packets:
+        ring.decode_into(decoder, packet, FRAME_SIZE)
+        while (chunk := ring.read(CHUNK)) is not None:
+            samples += len(chunk)
+    return samples
+
+
+def new_ring():
+    return PCMRingBuffer(history=3 * FRAME_SIZE)
+
+
+def measure(name, fn, make_args):
+    # make_args在计时和统计之外创建参数，缓冲区的一次性预分配不计入每包开销
+    fn_args = make_args()
+    start = time.process_time()
+    samples = fn(*fn_args)
+    cpu = time.process_time() - start
+
+    # 单独再跑一遍统计运行期间的内存分配峰值（tracemalloc本身会拖慢执行）
+    fn_args = make_args()
+    tracemalloc.start()
+    fn(*fn_args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<14} cpu/packet: {cpu / args.packets * 1e6:8.2f}us  peak alloc: {peak / 1024:8.1f}KB")
+    return cpu, samples
+
+
+def main():
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(FRAME_SIZE) * 3000).astype(np.int16)
+    int16_frames = [pcm.tobytes()] * args.packets
+    float_frames = [pcm.astype(np.float32) / 32768.0] * args.packets
+
+    print(f"packets={args.packets}")
+    old_cpu, old_samples = measure("bytes", bytes_path, lambda: (int16_frames,))
+    new_cpu, new_samples = measure("ring", ring_path, lambda: (new_ring(), float_frames))
+    assert old_samples == new_samples, (old_samples, new_samples)
+    print(f"{'':<14} speedup: {old_cpu / new_cpu:.1f}x")
+
+    try:
+        import opuslib_next
+
+        encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
+        packet = encoder.encode(pcm.tobytes(), FRAME_SIZE)
+        packets = [packet] * args.packets
+        old_cpu, old_samples = measure("decode+bytes", decode_bytes_path, lambda: (opuslib_next.Decoder(16000, 1), packets))
+        new_cpu, new_samples = measure(
+            "decode+ring", decode_ring_path, lambda: (new_ring(), opuslib_next.Decoder(16000, 1), packets)
+        )
+        assert old_samples == new_samples, (old_samples, new_samples)
+        print(f"{'':<14} speedup: {old_cpu / new_cpu:.1f}x")
+    except Exception as e:
+        print(f"跳过解码对比（libopus不可用）: {e}")
+
+
+if __name__ == "__main__":
+    main()
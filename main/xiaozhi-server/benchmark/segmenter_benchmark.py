@@ -0,0 +1,122 @@
+"""
+LLM→TTS分句基准：对比原来每个token都把整段回复重新拼接、对每个标点各rfind一次的做法，
+与StreamingSegmenter的增量分句，在不同长度回复上的总耗时和每token耗时。
+同时检查分句结果：去掉标点后与完整回复一致；各项策略的单元测试见 tests/test_segmenter.py。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/segmenter_benchmark.py --lengths 500 2000 8000 32000
+
+原做法的每token耗时随回复长度线性增长（整段回复是二次方），增量分句基本保持不变。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="Streaming segmenter benchmark")
+parser.add_argument("--lengths", type=int, nargs="+", default=[500, 2000, 8000, 32000], help="回复长度(字符数)")
+parser.add_argument("--rounds", type=int, default=3, help="每个长度重复的次数，取最快的一次")
+args = parser.parse_args()
+sys.argv = sys.argv[:1]
+
+from core.utils.segmenter import StreamingSegmenter
+from core.utils.util import get_string_no_punctuation_or_emoji, remove_punctuation_and_length
+
+WORDS = "今天天气很好我们一起去公园散步吧小朋友们在草地上玩耍阳光照在湖面上闪闪发光"
+PUNCTUATIONS = "，。！？；"
+
+
+def make_tokens(length, seed=0):
+    """构造一段长回复，按1~3个字切成token，模拟LLM的流式输出"""
+    rng = random.Random(seed)
+    chars = []
+    while len(chars) < length:
+        chars.extend(rng.choice(WORDS) for _ in range(rng.randint(6, 20)))
+        chars.append(rng.choice(PUNCTUATIONS))
+    text = "".join(chars[:length])
+    tokens = []
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 3)
+        tokens.append(text[i:i + n])
+        i += n
+    return tokens
+
+
+def legacy_segments(tokens):
+    """原实现：每个token都重新拼接整段回复，再对每个标点各rfind一次"""
+    response_message = []
+    processed_chars = 0
+    segments = []
+    punctuations = ("。", "，", "？", "！", "；", "：", ".", ",", "?", "!", ";", ":")
+    for content in tokens:
+        response_message.append(content)
+        full_text = "".join(response_message)
+        current_text = full_text[processed_chars:]
+        last_punct_pos = -1
+        for punct in punctuations:
+            pos = current_text.rfind(punct)
+            if pos > last_punct_pos:
+                last_punct_pos = pos
+        if last_punct_pos != -1:
+            segment_text_raw = current_text[:last_punct_pos + 1]
+            segment_text = get_string_no_punctuation_or_emoji(segment_text_raw)
+            if segment_text:
+                segments.append(segment_text)
+            processed_chars += len(segment_text_raw)
+    remaining_text = "".join(response_message)[processed_chars:]
+    segment_text = get_string_no_punctuation_or_emoji(remaining_text)
+    if segment_text:
+        segments.append(segment_text)
+    return segments
+
+
+def streaming_segments(tokens, **kwargs):
+    segmenter = StreamingSegmenter(**kwargs)
+    segments = []
+    for content in tokens:
+        segments.extend(segmenter.feed(content))
+    segments.extend(segmenter.flush())
+    return segments
+
+
+def same_text(segments, tokens):
+    return remove_punctuation_and_length("".join(segments))[1] == remove_punctuation_and_length("".join(tokens))[1]
+
+
+def bench(name, fn, tokens):
+    best = None
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        segments = fn(tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return segments, best
+
+
+def main():
+    print(f"{'length':>8} {'tokens':>8} {'legacy':>12} {'streaming':>12} {'legacy/token':>14} {'stream/token':>14} {'speedup':>8}")
+    for length in args.lengths:
+        tokens = make_tokens(length)
+        legacy, legacy_time = bench("legacy", legacy_segments, tokens)
+        streaming, streaming_time = bench("streaming", streaming_segments, tokens)
+        assert streaming == legacy, "默认策略下分句结果应与原实现一致"
+        assert same_text(streaming, tokens), "分句后的文本与完整回复不一致"
+        for kwargs in ({"min_length": 8}, {"max_length": 12}, {"first_segment_length": 10}):
+            assert same_text(streaming_segments(tokens, **kwargs), tokens), f"分句后的文本与完整回复不一致: {kwargs}"
+        print(
+            f"{length:>8} {len(tokens):>8} {legacy_time * 1000:>10.2f}ms {streaming_time * 1000:>10.2f}ms "
+            f"{legacy_time / len(tokens) * 1e6:>12.2f}us {streaming_time / len(tokens) * 1e6:>12.2f}us "
+            f"{legacy_time / streaming_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
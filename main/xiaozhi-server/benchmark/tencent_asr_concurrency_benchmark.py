@@ -0,0 +1,152 @@
+"""
+腾讯云ASR并发对比：在本地启动一个模拟腾讯云一句话识别接口的HTTP服务（固定延迟返回结果），
+同时发起多路识别，对比原来在协程里用requests同步请求与现在的aiohttp连接池。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/tencent_asr_concurrency_benchmark.py --sessions 20 --latency_ms 200
+
+同步请求会阻塞事件循环，多路识别只能一个接一个完成，总耗时约为 sessions * latency；
+异步请求下各路识别并发进行，总耗时接近单次延迟。
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="Tencent ASR concurrency benchmark")
+parser.add_argument("--sessions", type=int, default=20, help="同时识别的会话数")
+parser.add_argument("--latency_ms", type=float, default=200, help="模拟接口的响应延迟(毫秒)")
+parser.add_argument("--seconds", type=float, default=3.0, help="每句音频时长(秒)")
+parser.add_argument("--port", type=int, default=18080, help="模拟接口监听端口")
+args = parser.parse_args()
+# 配置加载会解析命令行参数，这里清掉本脚本自己的参数
+sys.argv = sys.argv[:1]
+
+import numpy as np
+import requests
+from aiohttp import web
+
+from core.providers.asr.tencent import ASRProvider
+from core.utils.utterance import Utterance
+
+
+class MockServer:
+    """模拟腾讯云一句话识别接口，记录同时处理中的请求数"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.connections = set()
+
+    async def handle(self, request):
+        body = await request.json()
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(args.latency_ms / 1000)
+        self.active -= 1
+        return web.json_response({"Response": {"Result": f"len={body['DataLen']}", "RequestId": "mock"}})
+
+    def reset(self):
+        self.max_active = 0
+
+    def start(self):
+        """在独立线程的事件循环中运行，被测代码阻塞自己的事件循环时模拟服务仍能正常响应"""
+        ready = threading.Event()
+
+        async def serve():
+            app = web.Application(client_max_size=64 * 1024 * 1024)
+            app.router.add_post("/", self.handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", args.port).start()
+            ready.set()
+            await asyncio.Event().wait()
+
+        threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+        ready.wait()
+
+
+def make_utterance():
+    """用随机PCM构造一句已解码的音频，不依赖Opus编码"""
+    rng = np.random.default_rng(0)
+    utterance = Utterance()
+    for _ in range(int(args.seconds / 0.06)):
+        utterance.append(b"", (rng.standard_normal(960) * 0.1).astype(np.float32))
+    return utterance
+
+
+async def blocking_speech_to_text(provider, utterance):
+    """原实现：在协程里用requests同步请求，请求期间整个事件循环被阻塞"""
+    import base64
+
+    request_body = provider._build_request_body(base64.b64encode(utterance.pcm_int16.tobytes()).decode("utf-8"))
+    timestamp, authorization = provider._get_auth_headers(request_body)
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Authorization": authorization,
+        "X-TC-Action": "SentenceRecognition",
+        "X-TC-Version": provider.API_VERSION,
+        "X-TC-Timestamp": timestamp,
+        "X-TC-Region": provider.region,
+    }
+    response = requests.post(provider.api_url, headers=headers, data=request_body)
+    return response.json()["Response"]["Result"], None
+
+
+async def run(name, server, recognize, utterance):
+    server.reset()
+    known_connections = len(server.connections)
+    latencies = []
+
+    async def one():
+        start = time.perf_counter()
+        text, _ = await recognize(utterance, "bench")
+        latencies.append(time.perf_counter() - start)
+        return text
+
+    start = time.perf_counter()
+    texts = await asyncio.gather(*[one() for _ in range(args.sessions)])
+    elapsed = time.perf_counter() - start
+    assert all(texts), "识别结果为空"
+    print(
+        f"{name:<10} total: {elapsed * 1000:8.1f}ms  "
+        f"p50: {statistics.median(latencies) * 1000:8.1f}ms  "
+        f"max concurrent: {server.max_active:3d}  new connections: {len(server.connections) - known_connections}"
+    )
+
+
+async def main():
+    server = MockServer()
+    server.start()
+
+    provider = ASRProvider(
+        {
+            "secret_id": "mock",
+            "secret_key": "mock",
+            "output_dir": "tmp/",
+            "api_url": f"http://127.0.0.1:{args.port}/",
+        }
+    )
+    utterance = make_utterance()
+    print(f"sessions={args.sessions} latency={args.latency_ms}ms seconds={args.seconds}")
+
+    await run("blocking", server, lambda u, s: blocking_speech_to_text(provider, u), utterance)
+    await run("async", server, provider.speech_to_text, utterance)
+    # 第二轮复用连接池中的长连接
+    await run("async(2)", server, provider.speech_to_text, utterance)
+
+    await provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+VAD后端性能测试：对比TorchScript(SileroVAD)与ONNX Runtime(SileroVADOnnx)的
+启动耗时、进程内存占用和单块推理CPU时间。每个后端在独立子进程中测量，互不影响。
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/vad_backend_benchmark.py --chunks 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="VAD backend benchmark")
+parser.add_argument("--chunks", type=int, default=2000, help="每个后端推理的音频块数")
+parser.add_argument("--backend", type=str, default=None, help="只测量指定后端（内部使用）")
+args = parser.parse_args()
+# 配置加载会解析命令行参数，这里清掉本脚本自己的参数
+sys.argv = sys.argv[:1]
+
+BACKENDS = ["SileroVAD", "SileroVADOnnx"]
+CONFIG = {
+    "model_dir": "models/snakers4_silero-vad",
+    "threshold": 0.5,
+    "min_silence_duration_ms": 700,
+    "intra_op_threads": 1,
+}
+
+
+def measure(backend):
+    """在当前进程中测量单个后端"""
+    start = time.perf_counter()
+    from core.utils import vad
+
+    if backend == "SileroVAD":
+        import torch
+
+        torch.set_num_threads(1)
+    instance = vad.create_instance(backend, CONFIG)
+    startup = time.perf_counter() - start
+
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    chunk = (rng.standard_normal(512) * 0.1).astype(np.float32)
+    session = instance.create_session()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(args.chunks):
+        instance.forward_batch([chunk], [session])
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "backend": backend,
+        "startup_s": startup,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cpu_per_chunk_ms": cpu / args.chunks * 1000,
+        "wall_per_chunk_ms": wall / args.chunks * 1000,
+    }
+
+
+def main():
+    if args.backend:
+        print(json.dumps(measure(args.backend)))
+        return
+
+    print(f"chunks={args.chunks}")
+    for backend in BACKENDS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--backend", backend, "--chunks", str(args.chunks)],
+            capture_output=True,
+            text=True,
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if output.returncode != 0 or not lines:
+            print(f"{backend:<14} 测试失败: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(lines[-1])
+        print(
+            f"{backend:<14} startup: {result['startup_s']:6.2f}s  "
+            f"rss: {result['max_rss_mb']:8.1f}MB  "
+            f"cpu/chunk: {result['cpu_per_chunk_ms']:6.3f}ms  "
+            f"wall/chunk: {result['wall_per_chunk_ms']:6.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
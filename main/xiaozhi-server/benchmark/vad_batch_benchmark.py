@@ -0,0 +1,106 @@
+"""
+VAD批量推理性能测试：对比逐块推理与跨连接批量推理的吞吐量和判定延迟
+
+用法（在 main/xiaozhi-server 目录下执行）:
+    python benchmark/vad_batch_benchmark.py --streams 200 --ticks 50
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+os.chdir(project_root)
+
+parser = argparse.ArgumentParser(description="VAD batch benchmark")
+parser.add_argument("--streams", type=int, default=200, help="同时在线的音频流数量")
+parser.add_argument("--ticks", type=int, default=50, help="每个音频流提交的音频块数")
+parser.add_argument("--max_wait_ms", type=float, default=8, help="凑批最长等待时间(毫秒)")
+parser.add_argument("--max_batch_size", type=int, default=256, help="一批最多包含的音频块数")
+args = parser.parse_args()
+# 配置加载会解析命令行参数，这里清掉本脚本自己的参数
+sys.argv = sys.argv[:1]
+
+import numpy as np
+import torch
+from core.utils.vad import SileroVAD
+from core.utils.vad_batch import VADBatchEngine
+
+SAMPLES_PER_CHUNK = 512
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def make_chunks(streams):
+    rng = np.random.default_rng(0)
+    return [(rng.standard_normal(SAMPLES_PER_CHUNK) * 0.1).astype(np.float32) for _ in range(streams)]
+
+
+async def bench_per_chunk(vad, chunks, ticks):
+    """当前实现：每个连接的每个音频块单独调用一次模型"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick_start = time.perf_counter()
+        for chunk in chunks:
+            with torch.no_grad():
+                vad.model(torch.from_numpy(chunk).unsqueeze(0), 16000).item()
+            latencies.append(time.perf_counter() - tick_start)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    return len(chunks) * ticks / elapsed, latencies
+
+
+async def bench_batched(vad, chunks, ticks):
+    """批量实现：所有连接同时提交，由引擎合并推理"""
+    engine = VADBatchEngine(vad.forward_batch, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    streams = [vad.create_session() for _ in chunks]
+    latencies = []
+
+    async def one(stream, chunk, tick_start):
+        await engine.submit(stream, chunk)
+        latencies.append(time.perf_counter() - tick_start)
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick_start = time.perf_counter()
+        await asyncio.gather(*(one(s, c, tick_start) for s, c in zip(streams, chunks)))
+    elapsed = time.perf_counter() - start
+    metrics = engine.get_metrics()
+    engine.close()
+    return len(chunks) * ticks / elapsed, latencies, metrics
+
+
+def report(name, throughput, latencies):
+    print(
+        f"{name:<12} chunks/sec: {throughput:10.1f}  "
+        f"p50: {statistics.median(latencies) * 1000:8.2f}ms  "
+        f"p99: {percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+
+
+async def main():
+    torch.set_num_threads(1)
+    vad = SileroVAD({"model_dir": "models/snakers4_silero-vad", "threshold": 0.5, "min_silence_duration_ms": 700})
+    chunks = make_chunks(args.streams)
+
+    print(f"streams={args.streams} ticks={args.ticks}")
+    throughput, latencies = await bench_per_chunk(vad, chunks, args.ticks)
+    report("per-chunk", throughput, latencies)
+
+    throughput, latencies, metrics = await bench_batched(vad, chunks, args.ticks)
+    report("batched", throughput, latencies)
+    print(f"batch metrics: {metrics}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
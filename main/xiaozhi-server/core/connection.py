@@ -6,7 +6,6 @@ import time
 import queue
 import asyncio
 import traceback
-import re
 
 import threading
 import websockets
@@ -14,8 +13,14 @@ from typing import Dict, Any
 from plugins_func.loadplugins import auto_import_modules
 from config.logger import setup_logging
 from core.utils.dialogue import Message, Dialogue
+from core.utils.utterance import Utterance
+from core.utils.speculation import LLMPrefetch, speculation_stats
+from core.utils.parallel_intent import parallel_intent_stats
+from core.utils.segmenter import StreamingSegmenter, SENTENCE_PUNCTUATIONS
+from core.utils.context_window import ContextWindow, dialogue_tokens
+from core.utils.prompt_cache import PromptPrefix, prompt_cache_stats
 from core.handle.textHandle import handleTextMessage
-from core.utils.util import get_string_no_punctuation_or_emoji, extract_json_from_string, get_ip_info
+from core.utils.util import extract_json_from_string, get_ip_info
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from core.handle.sendAudioHandle import sendAudioMessage,send_stt_message
 from core.handle.receiveAudioHandle import handleAudioMessage
@@ -61,6 +66,8 @@ class ConnectionHandler:
         self.client_ip_info = {}
         self.session_id = None
         self.prompt = None
+        # 系统提示词+函数定义组成的固定前缀，变化时打印哈希
+        self.prompt_prefix = PromptPrefix()
         self.welcome_msg = None
 
         # 客户端状态相关
@@ -71,6 +78,7 @@ class ConnectionHandler:
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
         self.audio_play_queue = queue.Queue()
+        self.audio_flow = None  # 当前这一句音频的发送进度，用于流控
 
         # 依赖的组件
         self.vad = _vad
@@ -79,22 +87,45 @@ class ConnectionHandler:
         self.tts = _tts  # TTSPool实例
         self.memory = _memory
         self.intent = _intent
+        # LLM路由、对冲请求等服务的状态随性能指标一起输出
+        self.performance_monitor.register_metrics("llm", self._get_llm_metrics)
+        # 服务端提示词缓存的命中率，全局和本连接
+        self.performance_monitor.register_metrics("prompt_cache", self._get_prompt_cache_metrics)
+        # VAD能量预判跳过模型的比例、批量推理的批大小等
+        self.performance_monitor.register_metrics("vad", self._get_vad_metrics)
+        # 本地ASR工作池和批量调度器的队列深度、批大小等
+        self.performance_monitor.register_metrics("asr", self._get_asr_metrics)
 
 
         # vad相关变量
-        self.client_audio_buffer = bytes()
+        # 本连接独立的VAD会话（Opus解码器、模型循环状态和音频缓冲），模型本身在连接间共享
+        self.vad_session = self.vad.create_session() if self.vad else None
         self.client_have_voice = False
         self.client_have_voice_last_time = 0.0
         self.client_no_voice_last_time = 0.0
         self.client_voice_stop = False
 
         # asr相关变量
-        self.asr_audio = []
+        self.asr_audio = Utterance()  # 当前这句话的音频，解码一次后供ASR、声纹识别共用
         self.asr_server_receive = True
+        # 流式识别会话，说话期间持续送入音频
+        self.asr_stream = None
+        self.asr_partial_text = ""
+        # 提前识别：停顿超过较短阈值时提前开始识别和LLM请求
+        speculative_config = self.config.get("speculative", {})
+        self.speculation_enabled = speculative_config.get("enabled", False)
+        self.speculation_silence_ms = speculative_config.get("silence_ms", 250)
+        self.speculation_llm_prefetch = speculative_config.get("llm_prefetch", True)
+        self.speculation = None
+        if self.speculation_enabled:
+            # 提前识别的命中率和作废的LLM请求浪费的token
+            self.performance_monitor.register_metrics("speculation", speculation_stats.get_metrics)
 
         # llm相关变量
         self.llm_finish_task = False
-        self.dialogue = Dialogue()
+        # 当前这一轮对话的任务，打断时取消，正在进行的流式请求随之关闭
+        self.llm_task = None
+        self.dialogue = self._create_dialogue()
 
         # tts相关变量
         self.tts_first_text_index = -1
@@ -116,6 +147,14 @@ class ConnectionHandler:
         self.use_function_call_mode = False
         if self.config["selected_module"]["Intent"] == 'function_call':
             self.use_function_call_mode = True
+        # intent_llm模式下意图识别与对话同时开始
+        self.use_parallel_intent = (
+            self.config["selected_module"]["Intent"] == 'intent_llm'
+            and self.config["Intent"].get("intent_llm", {}).get("parallel_chat", False)
+        )
+        if self.use_parallel_intent:
+            # 首句提前的时间和被取消的对话浪费的token
+            self.performance_monitor.register_metrics("parallel_intent", parallel_intent_stats.get_metrics)
         
         self.mcp_manager = MCPManager(self)
 
@@ -364,12 +403,25 @@ class ConnectionHandler:
         self.client_ip_info = get_ip_info(self.client_ip)
         if self.client_ip_info is not None and "city" in self.client_ip_info:
             self.logger.bind(tag=TAG).info(f"Client ip info: {self.client_ip_info}")
-            self.prompt = self.prompt + f"\nuser location:{self.client_ip_info}"
-            self.dialogue.update_system_message(self.prompt)
+            # 位置信息放在请求末尾的易变上下文中，不改动系统提示词
+            self.dialogue.set_context("location", f"user location:{self.client_ip_info}")
 
         """加载MCP工具"""
         asyncio.run_coroutine_threadsafe(self.mcp_manager.initialize_servers(), self.loop)
 
+    def _create_dialogue(self):
+        dialogue = Dialogue()
+        # 切换角色时保留位置、设备等会话上下文
+        if getattr(self, "dialogue", None) is not None:
+            dialogue.context = dict(self.dialogue.context)
+        window_config = self.config.get("context_window", {})
+        if window_config.get("enabled", False):
+            # 旧轮次的摘要由记忆模块使用的LLM生成，每次摘要时再取，私有配置替换LLM后使用新的实例
+            dialogue.window = ContextWindow(
+                window_config, get_llm=lambda: getattr(self.memory, "llm", None) or self.llm
+            )
+        return dialogue
+
     def change_system_prompt(self, prompt):
         self.prompt = prompt
         # 找到原来的role==system，替换原来的系统提示
@@ -396,7 +448,11 @@ class ConnectionHandler:
             return False
         return not self.is_device_verified
 
-    def chat(self, query, emotion=None, speaker_id=None):
+    async def chat(self, query, emotion=None, speaker_id=None, intent_gate=None):
+        """
+        intent_gate: 与意图识别同时进行时传入，第一句送TTS之前等待意图结果，
+        用户消息也在确定继续聊天之后才放入对话历史
+        """
         if self.isNeedAuth():
             self.llm_finish_task = True
             self._check_and_broadcast_auth_code()
@@ -407,73 +463,75 @@ class ConnectionHandler:
             current_time = time.time()
             self.proactive.update_last_interaction(current_time)
 
-        self.dialogue.put(Message(role="user", content=query))
+        if intent_gate is None:
+            self.dialogue.put(Message(role="user", content=query))
 
         response_message = []
-        processed_chars = 0  # 跟踪已处理的字符位置
         try:
             start_time = time.time()
             # 使用带记忆的对话
-            memory_str = self.memory.query_memory(query)
+            memory_str = await self.memory.query_memory(query)
             # 获取当前说话人的记忆
-            speaker_memory = self.memory.get_memory(speaker_id)
+            speaker_memory = await self.memory.get_memory(speaker_id)
             memory_str+=(speaker_memory)
 
             self.logger.bind(tag=TAG).debug(f"记忆内容: {memory_str}")
-            llm_responses = self.llm.response(
-                self.session_id,
-                self.dialogue.get_llm_dialogue_with_memory(memory_str)
-            )
+            if intent_gate is None:
+                llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str)
+            else:
+                llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str, pending_query=query)
+            self.prompt_prefix.update(self.session_id, self.dialogue.get_stable_system_prompt())
+            prompt_tokens = dialogue_tokens(llm_dialogue)
+            self.performance_monitor.record_prompt_tokens(prompt_tokens)
+            if intent_gate is not None:
+                intent_gate.prompt_tokens = prompt_tokens
+            llm_responses = self.llm.response(self.session_id, llm_dialogue)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return "抱歉，我现在无法正常回答，请稍后再试。"
 
         self.llm_finish_task = False
         text_index = 0
-        for content in llm_responses:
-            response_message.append(content)
-            if self.client_abort:
-                break
-
-            end_time = time.time()
-            self.logger.bind(tag=TAG).debug(f"大模型返回时间: {end_time - start_time} 秒, 生成token={content}")
+        # 这里只在句子结束处断开，不拆分首句
+        segmenter = StreamingSegmenter.from_config(
+            self.config.get("segmenter", {}), punctuations=SENTENCE_PUNCTUATIONS, first_segment_length=0
+        )
+        try:
+            async for content in llm_responses:
+                response_message.append(content)
+                if self.client_abort:
+                    break
 
-            # 合并当前全部文本并处理未分割部分
-            full_text = "".join(response_message)
-            current_text = full_text[processed_chars:]  # 从未处理的位置开始
-
-            # 查找最后一个有效标点
-            punctuations = ("。", "？", "！", "；", "：", ".", "?", "!", ";", ":")
-            last_punct_pos = -1
-            for punct in punctuations:
-                pos = current_text.rfind(punct)
-                if pos > last_punct_pos:
-                    last_punct_pos = pos
-
-            # 找到分割点则处理
-            if last_punct_pos != -1:
-                segment_text_raw = current_text[:last_punct_pos + 1]
-                segment_text = get_string_no_punctuation_or_emoji(segment_text_raw)
-                if segment_text:
+                end_time = time.time()
+                self.logger.bind(tag=TAG).debug(f"大模型返回时间: {end_time - start_time} 秒, 生成token={content}")
+
+                if intent_gate is not None:
+                    intent_gate.add_output(content)
+                segments = segmenter.feed(content)
+                if segments and intent_gate is not None:
+                    if not await self._pass_intent_gate(intent_gate, query):
+                        return None
+                    intent_gate = None
+                for segment_text in segments:
                     text_index += 1
                     if self.recode_first_last_text(segment_text, text_index):
                         # 使用 ByteDance TTS provider 生成语音
-                        self.speak_and_play(segment_text, text_index)
+                        await self.speak(segment_text, text_index, session_id=self.session_id)
                     else:
                         text_index -=1
-
-                    processed_chars += len(segment_text_raw)  # 更新已处理字符位置
+        finally:
+            # 打断时关闭上游的流式请求
+            await llm_responses.aclose()
 
         # 处理最后剩余的文本
-        full_text = "".join(response_message)
-        remaining_text = full_text[processed_chars:]
-        if remaining_text:
-            segment_text = get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.recode_first_last_text(segment_text, text_index+1):
-                    text_index += 1
-                    # 使用 ByteDance TTS provider 生成语音
-                    self.speak_and_play(segment_text, text_index)
+        if intent_gate is not None and not await self._pass_intent_gate(intent_gate, query):
+            return None
+        for segment_text in segmenter.flush():
+            if self.recode_first_last_text(segment_text, text_index+1):
+                text_index += 1
+                # 使用 ByteDance TTS provider 生成语音
+                await self.speak(segment_text, text_index, session_id=self.session_id)
+        await self.finish_speak()
 
         self.llm_finish_task = True
         response_text = "".join(response_message)
@@ -488,6 +546,14 @@ class ConnectionHandler:
         self.logger.bind(tag=TAG).debug(json.dumps(self.dialogue.get_llm_dialogue(), indent=4, ensure_ascii=False))
         return response_text
 
+    async def _pass_intent_gate(self, intent_gate, query):
+        """等待并行的意图识别结果，继续聊天时把用户消息放入对话历史"""
+        if not await intent_gate.wait():
+            self.llm_finish_task = True
+            return False
+        self.dialogue.put(Message(role="user", content=query))
+        return True
+
     async def _update_interests_and_check_proactive(self):
         """更新用户兴趣并检查是否需要主动对话"""
         try:
@@ -496,7 +562,21 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"更新兴趣和检查主动对话失败: {e}")
 
-    def chat_with_function_calling(self, query, tool_call=False, emotion=None, speaker_id=None):
+    async def prefetch_llm_response(self, query, speaker_id=None):
+        """用户还没说完时提前发起LLM请求，请求内容与chat_with_function_calling完全一致，响应在后台缓存"""
+        memory_str = await self.memory.query_memory(query)
+        memory_str += await self.memory.get_memory(speaker_id)
+
+        functions = None
+        if hasattr(self, 'func_handler'):
+            functions = self.func_handler.get_functions()
+
+        # 用户消息还没有放入对话历史，作为最后一条用户消息
+        dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str, pending_query=query)
+        self.prompt_prefix.update(self.session_id, self.dialogue.get_stable_system_prompt(), functions)
+        return LLMPrefetch(self.llm.response_with_functions(self.session_id, dialogue, functions=functions)).start()
+
+    async def chat_with_function_calling(self, query, tool_call=False, emotion=None, speaker_id=None, llm_prefetch=None):
         self.logger.bind(tag=TAG).debug(f"Chat with function calling start: {query}")
         
         # 开始性能监控
@@ -518,33 +598,39 @@ class ConnectionHandler:
                     "is_admin": self.private_config.is_in_admin_mode() if self.private_config else False
                 }))
 
-        # 并行获取记忆
-        memory_future = asyncio.run_coroutine_threadsafe(self.memory.query_memory(query), self.loop)
-        speaker_future = asyncio.run_coroutine_threadsafe(self.memory.get_memory(speaker_id), self.loop)
-        
-        memory_str = memory_future.result()
-        speaker_memory = speaker_future.result()
-        memory_str += speaker_memory
+        if llm_prefetch is None:
+            # 并行获取记忆
+            memory_str, speaker_memory = await asyncio.gather(
+                self.memory.query_memory(query),
+                self.memory.get_memory(speaker_id),
+            )
+            memory_str += speaker_memory
 
-        # 获取函数定义
-        functions = None
-        if hasattr(self, 'func_handler'):
-            functions = self.func_handler.get_functions()
+            # 获取函数定义
+            functions = None
+            if hasattr(self, 'func_handler'):
+                functions = self.func_handler.get_functions()
 
         try:
             # 开始LLM处理计时
             self.performance_monitor.start_llm()
             start_time = time.time()
-            llm_responses = self.llm.response_with_functions(
-                self.session_id,
-                self.dialogue.get_llm_dialogue_with_memory(memory_str),
-                functions=functions
-            )
+            if llm_prefetch is not None:
+                # 用户停顿时已经提前发起了同样的请求，直接沿用收到的响应
+                llm_responses = llm_prefetch.replay()
+            else:
+                llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str)
+                self.prompt_prefix.update(self.session_id, self.dialogue.get_stable_system_prompt(), functions)
+                self.performance_monitor.record_prompt_tokens(dialogue_tokens(llm_dialogue))
+                llm_responses = self.llm.response_with_functions(
+                    self.session_id,
+                    llm_dialogue,
+                    functions=functions
+                )
             self.performance_monitor.end_llm()
 
             self.llm_finish_task = False
             text_index = 0
-            processed_chars = 0
             response_message = []
             tool_call_flag = False
             function_name = None
@@ -552,100 +638,64 @@ class ConnectionHandler:
             function_arguments = ""
             content_arguments = ""
 
-            # 使用正则表达式优化标点查找
-            punctuations_pattern = re.compile(r'[,，；。？！；：、.;n!~～\?]')
+            # 还没有说出第一句话时启用首句加速，尽早把开头几个字送去TTS
+            if self.tts_first_text_index == -1:
+                segmenter = StreamingSegmenter.from_config(self.config.get("segmenter", {}))
+            else:
+                segmenter = StreamingSegmenter.from_config(self.config.get("segmenter", {}), first_segment_length=0)
 
             """# 启动TTS预加载任务
             if self.tts_preload_task is None:
                 self.tts_preload_task = asyncio.run_coroutine_threadsafe(self._tts_preload_worker(), self.loop)"""
             
-            for response in llm_responses:
-                content, tools_call = response
+            try:
+                async for response in llm_responses:
+                    content, tools_call = response
 
-                
-                if content is not None and len(content) > 0:
-                    if not tool_call_flag:
-                        response_message.append(content)
+                    if content is not None and len(content) > 0:
+                        if not tool_call_flag:
+                            response_message.append(content)
                         
-                        if self.client_abort:
-                            break
+                            if self.client_abort:
+                                break
 
-                        # 处理文本分段和TTS
-                        full_text = "".join(response_message)
-                        current_text = full_text[processed_chars:]
-                        
-                        # 查找最后一个有效标点
-                        punctuations = ("。","，", "？", "！", "；", "：", ".", ",","?", "!", ";", ":")
-                        last_punct_pos = -1
-                        for punct in punctuations:
-                            pos = current_text.rfind(punct)
-                            if pos > last_punct_pos:
-                                last_punct_pos = pos
-
-                        if last_punct_pos != -1:
-                            segment_text_raw = current_text[:last_punct_pos + 1]
-                            segment_text = get_string_no_punctuation_or_emoji(segment_text_raw)
-                            
-                            
-                            if segment_text:
+                            # 处理文本分段和TTS
+                            for segment_text in segmenter.feed(content):
                                 text_index += 1
-                                # 如果还没有说出第一句话，则说出前4个字或第一个标点符号之前的文本,这是为了加速响应
-                                if self.tts_first_text_index == -1:
-
-                                    first_pause_pos = 10
-
-                                    wordstopause = ['我','你','他','的','是','她','它','有']
-                                    pause_positions = []
-                                    for word in wordstopause:
-                                        pos = segment_text.find(word)
-                                        if pos != -1:
-                                            pause_positions.append(pos)
-                                    if pause_positions:
-                                        first_pause_pos = max(16,min(max(pause_positions), first_pause_pos))
-                                    
-                                    if last_punct_pos < first_pause_pos:
-                                        first_pause_pos = last_punct_pos
-                                
-                                    first_text = segment_text[:first_pause_pos]
-                                    if self.recode_first_last_text(first_text, text_index):
-                                        self.speak_and_play(first_text, text_index, session_id=self.session_id)
-                                    segment_text = segment_text[len(first_text):]
-                                    
-                                elif self.recode_first_last_text(segment_text, text_index):
-                                    self.speak_and_play(segment_text, text_index, session_id=self.session_id)
+                                if self.recode_first_last_text(segment_text, text_index):
+                                    await self.speak(segment_text, text_index, session_id=self.session_id)
                                 else:
                                     text_index -=1
-
-                                processed_chars += len(segment_text_raw)
                                 
-                if tools_call is not None:
-                    tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
-
-                if content is not None and len(content) > 0 and tool_call_flag:
-                    content_arguments += content
+                    if tools_call is not None:
+                        tool_call_flag = True
+                        if tools_call[0].id is not None:
+                            function_id = tools_call[0].id
+                        if tools_call[0].function.name is not None:
+                            function_name = tools_call[0].function.name
+                        if tools_call[0].function.arguments is not None:
+                            function_arguments += tools_call[0].function.arguments
+
+                    if content is not None and len(content) > 0 and tool_call_flag:
+                        content_arguments += content
+            finally:
+                # 打断时关闭上游的流式请求
+                await llm_responses.aclose()
 
             # 处理剩余文本
             full_text = "".join(response_message)
-            remaining_text = full_text[processed_chars:]
-            if remaining_text:
-                segment_text = get_string_no_punctuation_or_emoji(remaining_text)
-                if segment_text:
-                    text_index += 1
-                    if self.recode_first_last_text(segment_text, text_index):
-                        self.speak_and_play(segment_text, text_index, session_id=self.session_id)
-                    else:
-                        text_index -=1
+            for segment_text in segmenter.flush():
+                text_index += 1
+                if self.recode_first_last_text(segment_text, text_index):
+                    await self.speak(segment_text, text_index, session_id=self.session_id)
+                else:
+                    text_index -=1
 
             # 处理函数调用
             if tool_call_flag:
                 self.current_speaker_id = speaker_id
-                self._handle_tool_call(function_name, function_id, function_arguments, content_arguments, text_index)
+                await self._handle_tool_call(function_name, function_id, function_arguments, content_arguments, text_index)
+            await self.finish_speak()
 
             # 存储对话内容
             if len(response_message) > 0:
@@ -677,7 +727,7 @@ class ConnectionHandler:
             self.performance_monitor.end_request(success=False)
             return None
 
-    def _handle_tool_call(self, function_name, function_id, function_arguments, content_arguments, text_index):
+    async def _handle_tool_call(self, function_name, function_id, function_arguments, content_arguments, text_index):
         """处理工具调用"""
         bHasError = False
         if function_id is None:
@@ -706,13 +756,16 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).info(f"Processing tool call for {function_name} with arguments: {function_arguments}")
             
             if self.mcp_manager.is_mcp_tool(function_name):
-                result = self._handle_mcp_tool_call(function_call_data)
+                result = await self._handle_mcp_tool_call(function_call_data)
             else:
-                result = self.func_handler.handle_llm_function_call(self, function_call_data)
+                # 插件函数是同步实现，放到线程池中执行
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.func_handler.handle_llm_function_call, self, function_call_data
+                )
                 
-            self._handle_function_result(result, function_call_data, text_index + 1)
+            await self._handle_function_result(result, function_call_data, text_index + 1)
 
-    def _handle_mcp_tool_call(self, function_call_data):
+    async def _handle_mcp_tool_call(self, function_call_data):
         function_arguments = function_call_data["arguments"]
         function_name = function_call_data["name"]
         try:
@@ -724,10 +777,10 @@ class ConnectionHandler:
                     self.logger.bind(tag=TAG).error(f"无法解析 function_arguments: {function_arguments}")
                     return ActionResponse(action=Action.REQLLM, result="参数解析失败", response="")
                     
-            tool_result = asyncio.run_coroutine_threadsafe(self.mcp_manager.execute_tool(
+            tool_result = await self.mcp_manager.execute_tool(
                 function_name,
                 args_dict
-            ), self.loop).result()
+            )
             # meta=None content=[TextContent(type='text', text='北京当前天气:\n温度: 21°C\n天气: 晴\n湿度: 6%\n风向: 西北 风\n风力等级: 5级', annotations=None)] isError=False
             content_text = ""
             if tool_result is not None and tool_result.content is not None:
@@ -748,11 +801,11 @@ class ConnectionHandler:
         return ActionResponse(action=Action.REQLLM, result="工具调用出错", response="")
             
 
-    def _handle_function_result(self, result, function_call_data, text_index):
+    async def _handle_function_result(self, result, function_call_data, text_index):
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
             if self.recode_first_last_text(text, text_index):
-                future = self.executor.submit(self.speak_and_play, text, text_index, session_id=self.session_id)
+                await self.speak(text, text_index, session_id=self.session_id)
                 self.dialogue.put(Message(role="assistant", content=text))
             else:
                 return False
@@ -773,18 +826,18 @@ class ConnectionHandler:
                                                        "index": 0}]))
 
                 self.dialogue.put(Message(role="tool", tool_call_id=function_id, content=text))
-                self.chat_with_function_calling(text, tool_call=True)
+                await self.chat_with_function_calling(text, tool_call=True)
         elif result.action == Action.NOTFOUND:
             text = result.result
             if self.recode_first_last_text(text, text_index):
-                future = self.executor.submit(self.speak_and_play, text, text_index, session_id=self.session_id)
+                await self.speak(text, text_index, session_id=self.session_id)
                 self.dialogue.put(Message(role="assistant", content=text))
             else:
                 return False
         else:
             text = result.result
             if self.recode_first_last_text(text, text_index):
-                future = self.executor.submit(self.speak_and_play, text, text_index, session_id=self.session_id)
+                await self.speak(text, text_index, session_id=self.session_id)
                 self.dialogue.put(Message(role="assistant", content=text))
             else:
                 return False
@@ -842,13 +895,17 @@ class ConnectionHandler:
             text = None
             try:
                 try:
-                    opus_datas, text, text_index = self.audio_play_queue.get(timeout=1)
+                    item = self.audio_play_queue.get(timeout=1)
                 except queue.Empty:
                     if self.stop_event.is_set():
                         break
                     continue
-                future = asyncio.run_coroutine_threadsafe(sendAudioMessage(self, opus_datas, text, text_index),
-                                                          self.loop)
+                # 流式TTS逐帧放入时带第四项，标记是一句话的开始、中间还是结束
+                opus_datas, text, text_index = item[:3]
+                stream = item[3] if len(item) > 3 else None
+                future = asyncio.run_coroutine_threadsafe(
+                    sendAudioMessage(self, opus_datas, text, text_index, stream), self.loop
+                )
                 future.result()
                 
                 # 更新最后交互时间
@@ -860,6 +917,13 @@ class ConnectionHandler:
             asyncio.sleep(0.01)
 
     def speak_and_play(self, text, text_index=0, session_id=None):
+        """供线程池中的任务调用，在事件循环中执行TTS并等待完成"""
+        session_id = session_id or self.session_id
+        asyncio.run_coroutine_threadsafe(self.speak(text, text_index, session_id=session_id), self.loop).result()
+
+    async def speak(self, text, text_index=0, session_id=None):
+        # 共用的TTS实例按session_id把音频放回这个连接的播放队列
+        session_id = session_id or self.session_id
         if text is None or len(text) <= 0:
             self.logger.bind(tag=TAG).info(f"无需tts转换，query为空，{text}")
             text = '.'
@@ -868,13 +932,64 @@ class ConnectionHandler:
         # 使用 ByteDance TTS provider 生成语音
         try:
             self.logger.bind(tag=TAG).info(f"TTS 开始转换: {text} {datetime.now()}")
-            # 在主线程中运行
-            asyncio.run_coroutine_threadsafe(self.tts.text_to_speak(text, text_index, session_id=session_id), self.loop).result()
+            # 对话任务被打断取消时让已经开始的这一句TTS正常结束，避免TTS会话停在中间状态
+            await asyncio.shield(self.tts.text_to_speak(text, text_index, session_id=session_id))
             return None
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"tts转换异常: {e}")
             return None            
 
+    async def finish_speak(self):
+        """这一轮回复的文本都已经送TTS，流式TTS可以结束这一轮的上游会话"""
+        finish_reply = getattr(self.tts, "finish_reply", None)
+        if finish_reply:
+            try:
+                await finish_reply(self.session_id)
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"结束TTS会话异常: {e}")
+
+    def _get_llm_metrics(self):
+        get_metrics = getattr(self.llm, "get_metrics", None)
+        return get_metrics() if get_metrics else None
+
+    def _get_prompt_cache_metrics(self):
+        metrics = prompt_cache_stats.get_metrics()
+        if not metrics["requests"]:
+            # 服务端没有返回usage（未开启stream_usage）时不输出
+            return None
+        metrics["session"] = prompt_cache_stats.get_session(self.session_id)
+        return metrics
+
+    def _get_vad_metrics(self):
+        return (self.vad.get_metrics() or None) if self.vad else None
+
+    def _get_asr_metrics(self):
+        get_metrics = getattr(self.asr, "get_metrics", None)
+        return (get_metrics() or None) if get_metrics else None
+
+    def start_llm_task(self, coro):
+        """在事件循环中执行一轮对话，新的一轮开始时取消上一轮"""
+        self.cancel_llm_task()
+        self.llm_task = asyncio.create_task(coro)
+        self.llm_task.add_done_callback(self._on_llm_task_done)
+        return self.llm_task
+
+    def cancel_llm_task(self):
+        """取消正在进行的对话，LLM的流式请求随之关闭，不再继续消耗token"""
+        if self.llm_task and not self.llm_task.done():
+            self.llm_task.cancel()
+        self.llm_task = None
+
+    def _on_llm_task_done(self, task):
+        if task.cancelled():
+            # 只有新的一轮、打断或识别到函数意图时才会取消对话，不算作请求失败
+            self.llm_finish_task = True
+            self.performance_monitor.cancel_request()
+            self.logger.bind(tag=TAG).info("对话任务已取消")
+        elif task.exception():
+            self.llm_finish_task = True
+            self.logger.bind(tag=TAG).error(f"对话任务出错: {task.exception()}")
+
     def clearSpeakStatus(self):
         self.logger.bind(tag=TAG).debug(f"清除服务端讲话状态")
         self.asr_server_receive = True
@@ -895,11 +1010,17 @@ class ConnectionHandler:
 
     async def close(self, ws=None):
         """资源清理方法"""
+        cache_stats = prompt_cache_stats.get_session(self.session_id)
+        if cache_stats:
+            self.logger.bind(tag=TAG).info(f"提示词前缀: {self.prompt_prefix.hash}, 缓存命中: {cache_stats}")
+        prompt_cache_stats.remove_session(self.session_id)
+
         # 清理MCP资源
         await self.mcp_manager.cleanup_all()
 
         # 释放TTS连接
         if self.tts and self.session_id:
+            await self.release_session()
             self.logger.bind(tag=TAG).info(f"Released TTS provider for session {self.session_id}")
 
         # 触发停止事件并清理资源
@@ -913,6 +1034,18 @@ class ConnectionHandler:
         
         # 清空任务队列
         self._clear_queues()
+
+        # 释放VAD会话
+        if self.vad_session:
+            self.vad_session.close()
+            self.vad_session = None
+        if self.asr_stream:
+            self.asr_stream.close()
+            self.asr_stream = None
+        if self.speculation:
+            self.speculation.cancel("discarded")
+            self.speculation = None
+        self.cancel_llm_task()
         
         if ws:
             await ws.close()
@@ -935,17 +1068,25 @@ class ConnectionHandler:
             # q.queue.put(None)
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytes()
+        if self.vad_session:
+            self.vad_session.reset()
+        if self.asr_stream:
+            self.asr_stream.close()
+            self.asr_stream = None
+        self.asr_partial_text = ""
+        if self.speculation:
+            self.speculation.cancel("discarded")
+            self.speculation = None
         self.client_have_voice = False
         self.client_have_voice_last_time = 0
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
             # Use the existing chat method
-            self.chat(text)
+            await self.chat(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -956,7 +1097,7 @@ class ConnectionHandler:
         """发送文本响应"""
         try:
             # 直接使用 ByteDance TTS provider 生成语音
-            tts_file = await self.tts.text_to_speak(text)
+            tts_file = await self.tts.text_to_speak(text, 0, session_id=self.session_id)
             if not tts_file:
                 self.logger.bind(tag=TAG).error(f"TTS生成失败: {text}")
                 return
@@ -1150,7 +1291,7 @@ class ConnectionHandler:
                 #self.private_config.save_private_config()
             
             # 5. 清空当前对话历史
-            self.dialogue = Dialogue()
+            self.dialogue = self._create_dialogue()
             self.dialogue.put(Message(role="system", content=target_role["prompt"]))
             
             # 6. 重置主动对话状态
@@ -12,6 +12,21 @@ logger = setup_logging()
 
 
 async def handle_user_intent(conn, text):
+    if await handle_local_intent(conn, text):
+        return True
+    if conn.use_function_call_mode:
+        # 使用支持function calling的聊天方法,不再进行意图分析
+        return False
+    # 使用LLM进行意图分析
+    intent_result = await analyze_intent_with_llm(conn, text)
+    if not intent_result:
+        return False
+    # 处理各种意图
+    return await process_intent_result(conn, intent_result, text)
+
+
+async def handle_local_intent(conn, text):
+    """不需要LLM的意图：退出命令、唤醒词"""
     # 检查是否有明确的退出命令
     if await check_direct_exit(conn, text):
         return True
@@ -22,15 +37,20 @@ async def handle_user_intent(conn, text):
     if await handle_role_switch(conn, text):
         return True
     """
-    if conn.use_function_call_mode:
-        # 使用支持function calling的聊天方法,不再进行意图分析
-        return False
-    # 使用LLM进行意图分析
-    intent_result = await analyze_intent_with_llm(conn, text)
+    return False
+
+
+def is_continue_chat(intent_result):
+    """意图识别结果是否为继续聊天，与process_intent_result返回False的情况一致"""
     if not intent_result:
-        return False
-    # 处理各种意图
-    return await process_intent_result(conn, intent_result, text)
+        return True
+    try:
+        intent_data = json.loads(intent_result)
+    except json.JSONDecodeError:
+        return True
+    if not isinstance(intent_data, dict) or "function_call" not in intent_data:
+        return True
+    return intent_data["function_call"].get("name") == "continue_chat"
 
 
 async def check_direct_exit(conn, text):
@@ -141,7 +161,7 @@ async def process_intent_result(conn, intent_result, original_text):
                         )
                         conn.recode_first_last_text(text, text_index)
                         future = conn.executor.submit(
-                            conn.speak_and_play, text, text_index
+                            conn.speak_and_play, text, text_index, conn.session_id
                         )
                         conn.llm_finish_task = True
                         conn.dialogue.put(Message(role="assistant", content=text))
@@ -2,10 +2,18 @@ from config.logger import setup_logging
 import time
 from core.utils.util import remove_punctuation_and_length
 from core.handle.sendAudioHandle import send_stt_message
-from core.handle.intentHandler import handle_user_intent
+from core.handle.intentHandler import (
+    handle_user_intent,
+    handle_local_intent,
+    analyze_intent_with_llm,
+    process_intent_result,
+    is_continue_chat,
+)
 import asyncio
 
 from core.utils.dialogue import Message, Dialogue
+from core.utils.speculation import SpeculativeTurn, speculation_stats
+from core.utils.parallel_intent import IntentGate
 
 TAG = __name__
 logger = setup_logging()
@@ -18,23 +26,36 @@ async def handleAudioMessage(conn, audio):
         return
 
     # 根据客户端监听模式决定是否有声音
+    pcm = None
     if conn.client_listen_mode == "auto":
         # 自动模式下，使用VAD检测是否有声音
-        have_voice = conn.vad.is_vad(conn, audio)
+        have_voice = await conn.vad.is_vad_async(conn, audio)
+        if conn.vad_session:
+            # 复用VAD解码出的PCM，后续ASR、声纹识别不再重复解码
+            pcm = conn.vad_session.last_frame()
     else:
         # 非自动模式下，直接使用客户端报告的有无声音信息
         have_voice = conn.client_have_voice
 
+    if audio:
+        conn.asr_audio.append(audio, pcm)
+
+    # 说话期间把音频持续送入流式识别
+    if have_voice or conn.client_have_voice:
+        await feed_asr_stream(conn)
+
+    # 短暂停顿时提前开始识别，继续说话则作废
+    if conn.speculation_enabled and conn.client_listen_mode == "auto":
+        update_speculation(conn, have_voice)
+
     # 优化无声音处理逻辑
     if not have_voice and not conn.client_have_voice:
         await no_voice_close_connect(conn)
         # 只保留最新的3帧音频内容，进一步减少内存使用
-        conn.asr_audio.append(audio)
-        conn.asr_audio = conn.asr_audio[-3:]
+        conn.asr_audio.keep_last(3)
         return
 
     conn.client_no_voice_last_time = 0.0
-    conn.asr_audio.append(audio)
 
     # 优化语音停止处理逻辑
     if conn.client_voice_stop:
@@ -52,8 +73,15 @@ async def handleAudioMessage(conn, audio):
 
             conn.prepare_session()
             
-            # 添加语音识别任务
-            asr_task = asyncio.create_task(conn.asr.speech_to_text(conn.asr_audio, conn.session_id))
+            # 添加语音识别任务，流式识别时只需取最终结果；停顿时已经提前识别过的直接取结果
+            speculation = conn.speculation
+            conn.speculation = None
+            if conn.asr_stream:
+                asr_task = asyncio.create_task(finish_asr_stream(conn))
+            elif speculation:
+                asr_task = asyncio.create_task(finish_speculative_asr(conn, speculation))
+            else:
+                asr_task = asyncio.create_task(conn.asr.speech_to_text(conn.asr_audio, conn.session_id))
             tasks.append(asr_task)
 
             # 添加说话人识别任务
@@ -70,6 +98,11 @@ async def handleAudioMessage(conn, audio):
             text, file_path = await asr_task
             logger.bind(tag=TAG).info(f"识别文本: {text} 用时: {time.time() - start_time}秒")
             
+            # 沿用的文本就是提前识别的结果，无法比对
+            if speculation and not speculation.reused and not speculation.matches(text):
+                speculation.cancel("mismatched")
+                speculation = None
+
             text_len, _ = remove_punctuation_and_length(text)
             if text_len > 0:
                 
@@ -89,12 +122,14 @@ async def handleAudioMessage(conn, audio):
                 logger.bind(tag=TAG).info(f"生成回复{text}")
                 
                 # 添加对话任务
-                chat_task = asyncio.create_task(startToChat(conn, text, None, speaker_id))
+                chat_task = asyncio.create_task(startToChat(conn, text, None, speaker_id, speculation))
                 tasks.append(chat_task)
                 
                 # 等待所有任务完成
                 await asyncio.gather(*tasks)
             else:
+                if speculation:
+                    speculation.cancel("discarded")
                 conn.asr_server_receive = True
 
         conn.asr_audio.clear()
@@ -102,30 +137,168 @@ async def handleAudioMessage(conn, audio):
 
 
 
-async def startToChat(conn, text, emotion=None, speaker_id=None):
+async def feed_asr_stream(conn):
+    """说话期间把刚收到的音频送入流式识别，第一次送入时带上说话开始前的预录音频"""
+    if not conn.asr_audio or not conn.asr.supports_streaming():
+        return
+    try:
+        if conn.asr_stream is None:
+            conn.asr_stream = conn.asr.create_stream(conn.session_id)
+            samples = conn.asr_audio.pcm_float32
+        else:
+            samples = conn.asr_audio.last_frame()
+        partial_text = await conn.asr_stream.accept_waveform(samples)
+        if partial_text != conn.asr_partial_text:
+            conn.asr_partial_text = partial_text
+            logger.bind(tag=TAG).debug(f"中间识别结果: {partial_text}")
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"流式识别送入音频失败: {e}")
+        # 丢弃流式识别会话，结束时回退到整句识别
+        if conn.asr_stream:
+            conn.asr_stream.close()
+        conn.asr_stream = None
+
+
+async def finish_asr_stream(conn):
+    """结束流式识别，返回与speech_to_text一致的(文本, 文件路径)"""
+    try:
+        text = await conn.asr_stream.finish()
+        return text, None
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"流式识别失败，回退到整句识别: {e}")
+        return await conn.asr.speech_to_text(conn.asr_audio, conn.session_id)
+
+
+def update_speculation(conn, have_voice):
+    """说话后的停顿超过speculative.silence_ms时发起提前识别，停顿期间重新出现人声则作废"""
+    if have_voice:
+        if conn.speculation:
+            conn.speculation.cancel("resumed")
+            conn.speculation = None
+        return
+    if conn.speculation or not conn.client_have_voice or conn.client_voice_stop or len(conn.asr_audio) < 8:
+        return
+    silence_ms = time.time() * 1000 - conn.client_have_voice_last_time
+    if silence_ms < conn.speculation_silence_ms:
+        return
+    speculation = SpeculativeTurn(len(conn.asr_audio))
+    speculation.task = asyncio.create_task(run_speculation(conn, speculation))
+    conn.speculation = speculation
+    speculation_stats.record_start()
+
+
+async def run_speculation(conn, speculation):
+    """提前识别当前已收到的音频，有文本时提前发起LLM请求"""
+    try:
+        if conn.asr_stream:
+            # 流式识别已经有中间结果，直接使用
+            text = conn.asr_partial_text
+        else:
+            text, _ = await conn.asr.speech_to_text(conn.asr_audio.snapshot(), conn.session_id)
+        speculation.text = text
+        logger.bind(tag=TAG).debug(f"提前识别文本: {text}, 停顿: {time.time() * 1000 - conn.client_have_voice_last_time:.0f}ms")
+
+        text_len, _ = remove_punctuation_and_length(text or "")
+        # 意图识别模式下对话前还要先做意图分析，只在function_call模式下提前发起对话请求
+        if text_len == 0 or not conn.use_function_call_mode or not conn.speculation_llm_prefetch:
+            return
+        speculation.prefetch = await conn.prefetch_llm_response(text, 'speaker_0')
+        speculation_stats.record_prefetch()
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"提前识别失败: {e}")
+
+
+async def finish_speculative_asr(conn, speculation):
+    """停顿之后没有再出现人声，沿用提前识别的结果作为整句的结果；提前识别失败时回退到整句识别"""
+    text = await speculation.wait_text()
+    if text is None:
+        return await conn.asr.speech_to_text(conn.asr_audio, conn.session_id)
+    speculation.reused = True
+    return text, None
+
+
+async def startToChat(conn, text, emotion=None, speaker_id=None, speculation=None):
+    if conn.use_parallel_intent:
+        await start_chat_with_parallel_intent(conn, text, emotion, speaker_id, speculation)
+        return
+
     # 首先进行意图分析
     intent_handled = await handle_user_intent(conn, text)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
+        if speculation:
+            speculation.cancel("discarded")
         conn.asr_server_receive = True
         return
 
+    llm_prefetch = None
+    if speculation:
+        speculation.hit()
+        # 提前发起的请求失败时重新请求
+        if speculation.prefetch and not speculation.prefetch.failed:
+            llm_prefetch = speculation.prefetch
+
     # 意图未被处理，继续常规聊天流程
     await send_stt_message(conn, text)
     if conn.use_function_call_mode:
-        # 使用executor提交任务
-        conn.executor.submit(conn.chat_with_function_calling,text, False, emotion, speaker_id)
+        conn.start_llm_task(conn.chat_with_function_calling(text, False, emotion, speaker_id, llm_prefetch))
     else:
-        def chat_and_release():
+        async def chat_and_release():
             try:
-                conn.chat(text, emotion, speaker_id)
+                await conn.chat(text, emotion, speaker_id)
             finally:
-                # 使用run_coroutine_threadsafe来调用异步函数
-                asyncio.run_coroutine_threadsafe(conn.release_session(), asyncio.get_event_loop())
-        
-        # 使用executor提交任务
-        conn.executor.submit(chat_and_release)
+                await conn.release_session()
+
+        conn.start_llm_task(chat_and_release())
+
+async def start_chat_with_parallel_intent(conn, text, emotion=None, speaker_id=None, speculation=None):
+    """
+    意图识别与对话同时开始：对话的LLM请求不再等待一整轮意图识别，
+    继续聊天时对话照常进行，识别到函数意图时在输出任何语音之前取消对话，再执行函数
+    """
+    if await handle_local_intent(conn, text):
+        if speculation:
+            speculation.cancel("discarded")
+        conn.asr_server_receive = True
+        return
+
+    intent_gate = IntentGate()
+
+    async def chat_and_release():
+        try:
+            await conn.chat(text, emotion, speaker_id, intent_gate=intent_gate)
+        finally:
+            # 识别到函数意图时对话没有输出语音，TTS会话留给函数的回复
+            if intent_gate.continue_chat is not False:
+                await conn.release_session()
+
+    chat_task = conn.start_llm_task(chat_and_release())
+    try:
+        intent_result = await analyze_intent_with_llm(conn, text)
+    except asyncio.CancelledError:
+        if conn.llm_task is chat_task:
+            conn.cancel_llm_task()
+        raise
+
+    if is_continue_chat(intent_result):
+        if speculation:
+            speculation.hit()
+        # 识别文本先于第一句语音发给客户端
+        await send_stt_message(conn, text)
+        intent_gate.resolve(True)
+        return
+
+    intent_gate.resolve(False)
+    if conn.llm_task is chat_task:
+        conn.cancel_llm_task()
+    # 等对话任务退出后再执行函数，函数的回复不会和被取消的对话同时使用TTS会话
+    await asyncio.gather(chat_task, return_exceptions=True)
+    if speculation:
+        speculation.cancel("discarded")
+    await process_intent_result(conn, intent_result, text)
+    conn.asr_server_receive = True
+
 
 async def no_voice_close_connect(conn):
     if conn.client_no_voice_last_time == 0.0:
@@ -11,46 +11,61 @@ TAG = __name__
 logger = setup_logging()
 
 
-async def sendAudioMessage(conn, audios, text, text_index=0):
+async def sendAudioMessage(conn, audios, text, text_index=0, stream=None):
+    """
+    stream: 流式TTS把一句话的音频分多次放入播放队列时，标记这是该句的"start"、"continue"还是"end"，
+    只在start时发送句子开始、end时发送句子结束并判断是否结束本轮；为None时audios是完整的一句
+    """
+    sentence_start = stream in (None, "start")
+    sentence_end = stream in (None, "end")
     # 发送句子开始消息
-    if text_index == conn.tts_first_text_index:
+    if sentence_start and text_index == conn.tts_first_text_index:
         logger.bind(tag=TAG).info(f"发送第一段语音: {text}")
     try:
-        await send_tts_message(conn, "sentence_start", text)
+        if sentence_start:
+            await send_tts_message(conn, "sentence_start", text)
 
         # 播放音频
-        await sendAudio(conn, audios)
+        await sendAudio(conn, audios, continued=not sentence_start)
 
-        await send_tts_message(conn, "sentence_end", text)
+        if sentence_end:
+            await send_tts_message(conn, "sentence_end", text)
     except Exception as e:
         logger.bind(tag=TAG).error(f"发送音频消息失败: {e}")    
     finally:
+        if sentence_end:
+            await _finish_sentence(conn, text_index)
+
+
+async def _finish_sentence(conn, text_index):
+    # 发送结束消息（如果是最后一个文本）
+    if conn.llm_finish_task and text_index == conn.tts_last_text_index:
+        await send_tts_message(conn, "stop", None)
+        logger.bind(tag=TAG).warning(f"{conn.session_id}到了最后一句， 执行结束... text_index:{text_index}「tts_last_text_index:{conn.tts_last_text_index}」llm_finish_task:{conn.llm_finish_task}")
+        if conn.close_after_chat:
+            await conn.close()
+    else:
+        if text_index == conn.tts_last_text_index or conn.llm_finish_task:
+            logger.bind(tag=TAG).error(f"{conn.session_id}到了最后一句， 但是没有执行结束... text_index:{text_index}「tts_last_text_index:{conn.tts_last_text_index}」llm_finish_task:{conn.llm_finish_task}")
 
-    
-        # 发送结束消息（如果是最后一个文本）
-        if conn.llm_finish_task and text_index == conn.tts_last_text_index:
-            await send_tts_message(conn, "stop", None)
-            logger.bind(tag=TAG).warning(f"{conn.session_id}到了最后一句， 执行结束... text_index:{text_index}「tts_last_text_index:{conn.tts_last_text_index}」llm_finish_task:{conn.llm_finish_task}")
-            if conn.close_after_chat:
-                await conn.close()
-        else:
-            if text_index == conn.tts_last_text_index or conn.llm_finish_task:
-                logger.bind(tag=TAG).error(f"{conn.session_id}到了最后一句， 但是没有执行结束... text_index:{text_index}「tts_last_text_index:{conn.tts_last_text_index}」llm_finish_task:{conn.llm_finish_task}")
 
 # 播放音频
-async def sendAudio(conn, audios):
+async def sendAudio(conn, audios, continued=False):
+    """continued: 接着同一句之前发送的音频继续发送，沿用之前的发送进度做流控"""
     # 优化流控参数
     frame_duration = 60  # 帧时长（毫秒）
-    start_time = time.perf_counter()
-    play_position = 0
+    if not continued or conn.audio_flow is None:
+        conn.audio_flow = {"start_time": time.perf_counter(), "sent": 0, "play_position": 0}
+    flow = conn.audio_flow
     
     # 增加预缓冲大小，提高流畅度
-    pre_buffer = min(8, len(audios))  # 增加到8帧
+    pre_buffer = max(0, min(8 - flow["sent"], len(audios)))  # 增加到8帧
     
     # 批量发送预缓冲数据，使用gather并行发送
     if pre_buffer > 0:
         pre_buffer_tasks = [conn.websocket.send(audios[i]) for i in range(pre_buffer)]
         await asyncio.gather(*pre_buffer_tasks)
+        flow["sent"] += pre_buffer
     
     # 使用动态帧间隔，根据网络状况调整
     base_delay = frame_duration / 1000  # 基础延迟（秒）
@@ -68,7 +83,7 @@ async def sendAudio(conn, audios):
         current_batch = audios[i:batch_end]
         
         # 计算动态延迟
-        expected_time = start_time + (play_position / 1000)
+        expected_time = flow["start_time"] + (flow["play_position"] / 1000)
         current_time = time.perf_counter()
         delay = expected_time - current_time
         
@@ -82,9 +97,10 @@ async def sendAudio(conn, audios):
         # 批量发送音频数据
         batch_tasks = [conn.websocket.send(packet) for packet in current_batch]
         await asyncio.gather(*batch_tasks)
+        flow["sent"] += len(current_batch)
         
         # 更新播放位置
-        play_position += frame_duration * len(current_batch)
+        flow["play_position"] += frame_duration * len(current_batch)
 
 
 async def send_tts_message(conn, state, text=None):
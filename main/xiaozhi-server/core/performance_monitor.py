@@ -17,14 +17,22 @@ class PerformanceMetrics:
     cache_hits: int = 0
     tts_time: float = 0.0
     llm_time: float = 0.0
+    last_prompt_tokens: int = 0
 
 class PerformanceMonitor:
     def __init__(self, window_size: int = 100):
         self.metrics = PerformanceMetrics()
         self.response_times = deque(maxlen=window_size)
+        self.prompt_tokens = deque(maxlen=window_size)
         self.start_time: Optional[float] = None
         self.tts_start_time: Optional[float] = None
         self.llm_start_time: Optional[float] = None
+        # 其他模块的指标，名称 -> 返回指标字典的函数
+        self.sources = {}
+
+    def register_metrics(self, name: str, get_metrics):
+        """注册其他模块的指标，随性能指标一起输出，get_metrics返回None时不输出"""
+        self.sources[name] = get_metrics
         
     def start_request(self):
         """开始记录请求"""
@@ -70,13 +78,22 @@ class PerformanceMonitor:
                 
             self.start_time = None
             
+    def cancel_request(self):
+        """请求被主动取消，不计入响应时间和错误数"""
+        self.start_time = None
+
+    def record_prompt_tokens(self, tokens: int):
+        """记录本轮发送给LLM的prompt token数"""
+        self.metrics.last_prompt_tokens = tokens
+        self.prompt_tokens.append(tokens)
+
     def record_cache_hit(self):
         """记录缓存命中"""
         self.metrics.cache_hits += 1
         
     def get_metrics(self) -> Dict:
         """获取性能指标"""
-        return {
+        metrics = {
             "total_requests": self.metrics.total_requests,
             "avg_response_time": self.metrics.avg_response_time,
             "max_response_time": self.metrics.max_response_time,
@@ -84,8 +101,18 @@ class PerformanceMonitor:
             "error_count": self.metrics.error_count,
             "cache_hit_rate": self.metrics.cache_hits / self.metrics.total_requests if self.metrics.total_requests > 0 else 0,
             "tts_time": self.metrics.tts_time,
-            "llm_time": self.metrics.llm_time
+            "llm_time": self.metrics.llm_time,
+            "last_prompt_tokens": self.metrics.last_prompt_tokens,
+            "avg_prompt_tokens": sum(self.prompt_tokens) / len(self.prompt_tokens) if self.prompt_tokens else 0,
         }
+        for name, get_metrics in self.sources.items():
+            try:
+                value = get_metrics()
+                if value is not None:
+                    metrics[name] = value
+            except Exception as e:
+                logger.error(f"获取{name}指标失败: {e}")
+        return metrics
         
     def log_metrics(self):
         """记录性能指标"""
@@ -98,6 +125,7 @@ class PerformanceMonitor:
         """重置性能指标"""
         self.metrics = PerformanceMetrics()
         self.response_times.clear()
+        self.prompt_tokens.clear()
         self.start_time = None
         self.tts_start_time = None
         self.llm_start_time = None 
\ No newline at end of file
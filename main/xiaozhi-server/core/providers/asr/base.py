@@ -1,12 +1,40 @@
+import os
+import uuid
+import wave
+import functools
+import importlib
 from abc import ABC, abstractmethod
 from typing import Optional, Tuple, List
 
+import numpy as np
+
 from config.logger import setup_logging
+from core.utils.utterance import Utterance
+from core.utils.asr_pool import ASRWorkerPool
+from core.utils.asr_batch import ASRBatchScheduler
 
 TAG = __name__
 logger = setup_logging()
 
 
+class ASRStream(ABC):
+    """流式识别会话：用户说话过程中持续送入PCM，随时获得中间结果，说话结束后立即取得最终结果"""
+
+    @abstractmethod
+    async def accept_waveform(self, samples: np.ndarray) -> str:
+        """送入一段16kHz单声道float32 PCM，返回当前的中间识别结果"""
+        pass
+
+    @abstractmethod
+    async def finish(self) -> str:
+        """声明输入结束，返回最终识别结果"""
+        pass
+
+    def close(self):
+        """释放识别会话占用的资源"""
+        pass
+
+
 class ASRProviderBase(ABC):
     @abstractmethod
     def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
@@ -15,5 +43,98 @@ class ASRProviderBase(ABC):
 
     @abstractmethod
     async def speech_to_text(self, opus_data: List[bytes], session_id: str) -> Tuple[Optional[str], Optional[str]]:
-        """将语音数据转换为文本"""
+        """将语音数据转换为文本，opus_data可以是Opus数据包列表或Utterance"""
         pass
+
+    @staticmethod
+    def decode_opus(opus_data) -> np.ndarray:
+        """取得整句的16kHz单声道int16 PCM：传入Utterance时直接复用已解码的PCM，传入Opus数据包列表时解码"""
+        return Utterance.ensure(opus_data).pcm_int16
+
+    def save_pcm_to_file(self, pcm: np.ndarray, session_id: str) -> str:
+        """将int16 PCM保存为WAV文件，保存在self.output_dir下"""
+        file_name = f"asr_{session_id}_{uuid.uuid4()}.wav"
+        file_path = os.path.join(self.output_dir, file_name)
+        with wave.open(file_path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)  # 2 bytes = 16-bit
+            wf.setframerate(16000)
+            wf.writeframes(pcm.tobytes())
+        return file_path
+
+    def supports_streaming(self) -> bool:
+        """是否支持流式识别"""
+        return False
+
+    def create_stream(self, session_id: str) -> Optional[ASRStream]:
+        """创建一个流式识别会话，不支持流式识别时返回None"""
+        return None
+
+    def init_local_recognizer(self, config: dict, module_name: str):
+        """
+        本地模型的识别调度：
+        workers>0时模型加载到工作池的每个线程/进程中，识别不占用事件循环；workers为0时在当前进程加载模型并直接识别。
+        开启batch_enabled时再在前面加一层跨连接批量调度。
+        module_name对应的模块需提供 load_model(config) 和 recognize_batch(model, samples_list)。
+        """
+        module = importlib.import_module(module_name)
+        workers = int(config.get("workers", 1))
+        self.model = None
+        self.worker_pool = None
+        if workers > 0:
+            self.worker_pool = ASRWorkerPool(
+                module_name,
+                config,
+                workers=workers,
+                mode=config.get("worker_mode", "thread"),
+                max_queue=int(config.get("max_queue", 0)),
+            )
+            self._recognize_batch = self.worker_pool.run_batch
+        else:
+            self.model = module.load_model(config)
+            self._recognize_batch = functools.partial(module.recognize_batch, self.model)
+
+        self.batch_scheduler = None
+        if config.get("batch_enabled", False):
+            self.batch_scheduler = ASRBatchScheduler(
+                self._recognize_batch,
+                max_batch_size=config.get("batch_max_size", 8),
+                max_wait_ms=config.get("batch_max_wait_ms", 30),
+                max_concurrency=self.worker_pool.workers if self.worker_pool else 1,
+            )
+
+    async def recognize(self, samples: np.ndarray) -> str:
+        """识别一句16kHz float32音频，需先调用init_local_recognizer"""
+        if self.batch_scheduler:
+            return await self.batch_scheduler.submit(samples)
+        if self.worker_pool:
+            return (await self.worker_pool.run_batch([samples]))[0]
+        return self._recognize_batch([samples])[0]
+
+    def get_health(self) -> dict:
+        """识别服务健康状态，saturated为True时说明识别请求已经排队积压，准入控制可据此拒绝新连接"""
+        worker_pool = getattr(self, "worker_pool", None)
+        batch_scheduler = getattr(self, "batch_scheduler", None)
+        health = worker_pool.get_health() if worker_pool else {"ready": True, "queue_depth": 0, "saturated": False}
+        if batch_scheduler:
+            health["queue_depth"] += batch_scheduler.get_metrics()["queue_depth"]
+            if worker_pool:
+                # 批量调度器中等待凑批的语句也算积压
+                health["saturated"] = health["queue_depth"] >= worker_pool.max_queue
+        return health
+
+    async def close(self):
+        """服务退出时释放识别服务占用的资源（批量调度器、工作池、HTTP连接池等）"""
+        if getattr(self, "batch_scheduler", None):
+            self.batch_scheduler.close()
+        if getattr(self, "worker_pool", None):
+            self.worker_pool.close()
+
+    def get_metrics(self) -> dict:
+        """获取识别运行统计信息"""
+        metrics = {}
+        if getattr(self, "worker_pool", None):
+            metrics["pool"] = self.worker_pool.get_metrics()
+        if getattr(self, "batch_scheduler", None):
+            metrics["batch"] = self.batch_scheduler.get_metrics()
+        return metrics
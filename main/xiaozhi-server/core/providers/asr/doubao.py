@@ -2,14 +2,17 @@ import time
 import io
 import wave
 import os
+import asyncio
 from typing import Optional, Tuple, List
 import uuid
 import websockets
+from websockets.protocol import State
 import json
 import gzip
 
-import opuslib_next
-from core.providers.asr.base import ASRProviderBase
+import numpy as np
+
+from core.providers.asr.base import ASRProviderBase, ASRStream
 
 from config.logger import setup_logging
 
@@ -83,6 +86,104 @@ def parse_response(res):
     return result
 
 
+class DoubaoStream(ASRStream):
+    """
+    边说边传的流式识别会话：
+    VAD检测到说话时创建，后台任务取一条预先建立好的连接（没有则现建），发送请求参数后
+    把说话期间的PCM按包实时上传，说话结束时只需发送最后一个负序号包并等待最终结果。
+    accept_waveform只把音频放入队列，不等待网络，不会拖慢音频接收。
+    """
+
+    def __init__(self, provider, session_id):
+        self.provider = provider
+        self.session_id = session_id
+        self.text = ""
+        self.sequence = 0
+        self.websocket = None
+        self._queue = asyncio.Queue()
+        self._reader = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def accept_waveform(self, samples: np.ndarray) -> str:
+        if self._task.done():
+            # 后台任务已经失败，把异常交给调用方，由其回退到整句识别
+            self._task.result()
+        pcm = (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+        self._queue.put_nowait(pcm.tobytes())
+        return self.text
+
+    async def finish(self) -> str:
+        self._queue.put_nowait(None)
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._task), timeout=self.provider.timeout)
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._task.done():
+            self._task.cancel()
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+        if self.websocket is not None:
+            asyncio.get_running_loop().create_task(self.websocket.close())
+            self.websocket = None
+
+    async def _send_audio(self, chunk: bytes, last: bool):
+        self.sequence += 1
+        request = self.provider._generate_header(
+            message_type=CLIENT_AUDIO_ONLY_REQUEST,
+            message_type_specific_flags=NEG_SEQUENCE if last else NO_SEQUENCE,
+        )
+        payload_bytes = gzip.compress(chunk)
+        request.extend((len(payload_bytes)).to_bytes(4, 'big'))  # payload size(4 bytes)
+        request.extend(payload_bytes)  # payload
+        await self.websocket.send(request)
+
+    async def _run(self) -> str:
+        start_time = time.time()
+        self.websocket = await self.provider.acquire_connection()
+        await self.websocket.send(self.provider._build_full_request("raw"))
+        # 服务端的确认和中间结果由单独的任务接收，上传不用等待每个包的响应
+        self._reader = asyncio.get_running_loop().create_task(self._read_results())
+        logger.bind(tag=TAG).debug(f"流式识别会话就绪, 耗时: {time.time() - start_time:.3f}s")
+
+        buffer = bytearray()
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                break
+            buffer.extend(chunk)
+            if len(buffer) >= self.provider.chunk_bytes:
+                await self._send_audio(bytes(buffer), False)
+                buffer.clear()
+            if self._reader.done():
+                self._reader.result()
+
+        # 说话结束：剩余音频随最后一个负序号包一起发送
+        end_time = time.time()
+        await self._send_audio(bytes(buffer), True)
+        text = await self._reader
+        logger.bind(tag=TAG).debug(
+            f"流式识别完成, 上传{self.sequence}包, 说话结束后等待: {time.time() - end_time:.3f}s | 结果: {text}"
+        )
+        return text
+
+    async def _read_results(self) -> str:
+        while True:
+            result = parse_response(await self.websocket.recv())
+            if 'code' in result:
+                raise RuntimeError(f"ASR error: {result}")
+            payload_msg = result.get('payload_msg')
+            if not payload_msg:
+                continue
+            if payload_msg['code'] != self.provider.success_code:
+                raise RuntimeError(f"ASR error: {payload_msg}")
+            if payload_msg.get('result'):
+                self.text = payload_msg['result'][0]["text"]
+            if payload_msg.get('sequence', 0) < 0:
+                return self.text
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         self.appid = config.get("appid")
@@ -95,31 +196,80 @@ class ASRProvider(ASRProviderBase):
         self.success_code = 1000
         self.seg_duration = 15000
 
+        # 流式模式：说话期间实时上传音频，说话结束后只需等待最终结果
+        self.streaming = config.get("streaming", True)
+        # 每个上传包的音频时长(毫秒)
+        self.chunk_bytes = int(16000 * 2 * config.get("stream_chunk_ms", 200) / 1000)
+        self.timeout = config.get("timeout", 10)
+        # 预先建立好的连接数及每条连接的最长闲置时间(秒)，超时的连接会被替换；
+        # 超过warm_pool_keepalive秒没有新会话时不再补充连接
+        self.warm_pool_size = config.get("warm_pool_size", 2)
+        self.warm_pool_ttl = config.get("warm_pool_ttl", 15)
+        self.warm_pool_keepalive = config.get("warm_pool_keepalive", 300)
+        self._idle_connections = []
+        self._warming = 0
+        self._last_acquire = 0.0
+
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
-        """将Opus音频数据解码并保存为WAV文件"""
-        file_name = f"asr_{session_id}_{uuid.uuid4()}.wav"
-        file_path = os.path.join(self.output_dir, file_name)
-
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
+    def supports_streaming(self) -> bool:
+        return self.streaming
 
-        with wave.open(file_path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes = 16-bit
-            wf.setframerate(16000)
-            wf.writeframes(b"".join(pcm_data))
+    def create_stream(self, session_id: str) -> Optional[ASRStream]:
+        if not self.streaming:
+            return None
+        return DoubaoStream(self, session_id)
+
+    async def _connect(self):
+        auth_header = {'Authorization': 'Bearer; {}'.format(self.access_token)}
+        return await websockets.connect(self.ws_url, additional_headers=auth_header)
+
+    async def acquire_connection(self):
+        """取一条预先建立好的连接，没有可用连接时现建一条，同时在后台补充连接池"""
+        self._last_acquire = time.time()
+        websocket = None
+        while self._idle_connections:
+            connection, created_at = self._idle_connections.pop()
+            if connection.state is State.OPEN and time.time() - created_at < self.warm_pool_ttl:
+                websocket = connection
+                break
+            asyncio.create_task(connection.close())
+        self._refill_pool()
+        if websocket is None:
+            websocket = await self._connect()
+        return websocket
+
+    def _refill_pool(self):
+        missing = self.warm_pool_size - len(self._idle_connections) - self._warming
+        for _ in range(max(0, missing)):
+            self._warming += 1
+            asyncio.create_task(self._warm_connection())
+
+    async def _warm_connection(self):
+        try:
+            websocket = await self._connect()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"预建识别连接失败: {e}")
+            return
+        finally:
+            self._warming -= 1
+        entry = (websocket, time.time())
+        self._idle_connections.append(entry)
+        asyncio.get_running_loop().call_later(self.warm_pool_ttl, self._expire_connection, entry)
+
+    def _expire_connection(self, entry):
+        """闲置超时的连接关闭掉；最近仍有会话时补一条新的，保证说话时总有热连接可用"""
+        if entry not in self._idle_connections:
+            return
+        self._idle_connections.remove(entry)
+        asyncio.create_task(entry[0].close())
+        if time.time() - self._last_acquire < self.warm_pool_keepalive:
+            self._refill_pool()
 
-        return file_path
+    def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
+        """将Opus音频数据解码并保存为WAV文件"""
+        return self.save_pcm_to_file(self.decode_opus(opus_data), session_id)
 
     @staticmethod
     def _generate_header(message_type=CLIENT_FULL_REQUEST, message_type_specific_flags=NO_SEQUENCE) -> bytearray:
@@ -132,7 +282,17 @@ class ASRProvider(ASRProviderBase):
         header.append(0x00)  # reserved
         return header
 
-    def _construct_request(self, reqid) -> dict:
+    def _build_full_request(self, audio_format="wav") -> bytearray:
+        """构造携带请求参数的完整客户端请求包"""
+        request_params = self._construct_request(str(uuid.uuid4()), audio_format)
+        payload_bytes = str.encode(json.dumps(request_params))
+        payload_bytes = gzip.compress(payload_bytes)
+        full_client_request = self._generate_header()
+        full_client_request.extend((len(payload_bytes)).to_bytes(4, 'big'))  # payload size(4 bytes)
+        full_client_request.extend(payload_bytes)  # payload
+        return full_client_request
+
+    def _construct_request(self, reqid, audio_format="wav") -> dict:
         """Construct the request payload."""
         return {
             "app": {
@@ -149,7 +309,7 @@ class ASRProvider(ASRProviderBase):
                 "sequence": 1
             },
             "audio": {
-                "format": "wav",
+                "format": audio_format,
                 "rate": 16000,
                 "language": "zh-CN",
                 "bits": 16,
@@ -161,20 +321,10 @@ class ASRProvider(ASRProviderBase):
     async def _send_request(self, audio_data: List[bytes], segment_size: int) -> Optional[str]:
         """Send request to Volcano ASR service."""
         try:
-            auth_header = {'Authorization': 'Bearer; {}'.format(self.access_token)}
-            async with websockets.connect(self.ws_url, additional_headers=auth_header) as websocket:
-                # Prepare request data
-                request_params = self._construct_request(str(uuid.uuid4()))
-                print(request_params)
-                payload_bytes = str.encode(json.dumps(request_params))
-                payload_bytes = gzip.compress(payload_bytes)
-                full_client_request = self._generate_header()
-                full_client_request.extend((len(payload_bytes)).to_bytes(4, 'big'))  # payload size(4 bytes)
-                full_client_request.extend(payload_bytes)  # payload
-
+            async with await self.acquire_connection() as websocket:
                 # Send header and metadata
                 # full_client_request
-                await websocket.send(full_client_request)
+                await websocket.send(self._build_full_request())
                 res = await websocket.recv()
                 result = parse_response(res)
                 if 'payload_msg' in result and result['payload_msg']['code'] != self.success_code:
@@ -213,21 +363,6 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"ASR request failed: {e}", exc_info=True)
             return None
 
-    @staticmethod
-    def decode_opus(opus_data: List[bytes], session_id: str) -> List[bytes]:
-
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-
-        return pcm_data
-
     @staticmethod
     def read_wav_info(data: io.BytesIO = None) -> (int, int, int, int, int):
         with io.BytesIO(data) as _f:
@@ -256,8 +391,7 @@ class ASRProvider(ASRProviderBase):
         """将语音数据转换为文本"""
         try:
             # 合并所有opus数据包
-            pcm_data = self.decode_opus(opus_data, session_id)
-            combined_pcm_data = b''.join(pcm_data)
+            combined_pcm_data = self.decode_opus(opus_data).tobytes()
 
             wav_buffer = io.BytesIO()
 
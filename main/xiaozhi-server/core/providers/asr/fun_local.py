@@ -1,13 +1,12 @@
 import time
-import wave
 import os
 import sys
 import io
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
-import uuid
-import opuslib_next
 from core.providers.asr.base import ASRProviderBase
+from core.utils.utterance import Utterance
+
 
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
@@ -33,72 +32,65 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
+def load_model(config: dict):
+    """加载FunASR模型，每个识别工作单元调用一次"""
+    with CaptureOutput():
+        return AutoModel(
+            model=config.get("model_dir"),
+            vad_kwargs={"max_single_segment_time": 30000},
+            disable_update=True,
+            hub="hf"
+            # device="cuda:0",  # 启用GPU加速
+        )
+
+
+def recognize_batch(model, samples_list):
+    """识别一批16kHz float32音频，返回与输入顺序一致的文本列表"""
+    results = model.generate(
+        input=samples_list,
+        fs=16000,
+        cache={},
+        language="auto",
+        use_itn=True,
+        batch_size=len(samples_list),
+    )
+    return [rich_transcription_postprocess(result["text"]) for result in results]
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         self.model_dir = config.get("model_dir")
         self.output_dir = config.get("output_dir")  # 修正配置键名
         self.delete_audio_file = delete_audio_file
+        # 调试用：把每句识别的音频保存为WAV文件，默认直接在内存中识别
+        self.save_audio = config.get("save_audio", False)
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
-        with CaptureOutput():
-            self.model = AutoModel(
-                model=self.model_dir,
-                vad_kwargs={"max_single_segment_time": 30000},
-                disable_update=True,
-                hub="hf"
-                # device="cuda:0",  # 启用GPU加速
-            )
+        self.init_local_recognizer(config, __name__)
 
     def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
         """将Opus音频数据解码并保存为WAV文件"""
-        file_name = f"asr_{session_id}_{uuid.uuid4()}.wav"
-        file_path = os.path.join(self.output_dir, file_name)
-
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-
-        with wave.open(file_path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes = 16-bit
-            wf.setframerate(16000)
-            wf.writeframes(b"".join(pcm_data))
-
-        return file_path
+        return self.save_pcm_to_file(self.decode_opus(opus_data), session_id)
 
     async def speech_to_text(self, opus_data: List[bytes], session_id: str) -> Tuple[Optional[str], Optional[str]]:
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 确保 opus_data 是列表类型
-            if isinstance(opus_data, bytes):
-                opus_data = [opus_data]
-            elif not isinstance(opus_data, list):
+            # 确保 opus_data 是数据包列表或Utterance
+            if not isinstance(opus_data, (bytes, list, Utterance)):
                 logger.bind(tag=TAG).error(f"不支持的音频数据类型: {type(opus_data)}")
                 return "", None
 
-            # 保存音频文件
             start_time = time.time()
-            file_path = self.save_audio_to_file(opus_data, session_id)
-            logger.bind(tag=TAG).debug(f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}")
+            utterance = Utterance.ensure(opus_data)
+            if self.save_audio:
+                file_path = self.save_pcm_to_file(utterance.pcm_int16, session_id)
+                logger.bind(tag=TAG).debug(f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}")
 
-            # 语音识别
+            # 语音识别，直接传入float32数组
             start_time = time.time()
-            result = self.model.generate(
-                input=file_path,
-                cache={},
-                language="auto",
-                use_itn=True,
-                batch_size_s=60,
-            )
-            text = rich_transcription_postprocess(result[0]["text"])
+            text = await self.recognize(utterance.pcm_float32)
             logger.bind(tag=TAG).debug(f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}")
 
             return text, file_path
@@ -5,9 +5,8 @@ import sys
 import io
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
-import uuid
-import opuslib_next
 from core.providers.asr.base import ASRProviderBase
+from core.utils.utterance import Utterance
 
 import numpy as np
 import sherpa_onnx
@@ -35,76 +34,78 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
+def prepare_model_files(model_dir: str):
+    """检查模型文件，缺失时从modelscope下载，返回(模型路径, 词表路径)"""
+    model_files = {
+        "model.int8.onnx": os.path.join(model_dir, "model.int8.onnx"),
+        "tokens.txt": os.path.join(model_dir, "tokens.txt")
+    }
+
+    try:
+        for file_name, file_path in model_files.items():
+            if not os.path.isfile(file_path):
+                logger.bind(tag=TAG).info(f"正在下载模型文件: {file_name}")
+                model_file_download(
+                    model_id="pengzhendong/sherpa-onnx-sense-voice-zh-en-ja-ko-yue",
+                    file_path=file_name,
+                    local_dir=model_dir
+                )
+
+                if not os.path.isfile(file_path):
+                    raise FileNotFoundError(f"模型文件下载失败: {file_path}")
+
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"模型文件处理失败: {str(e)}")
+        raise
+
+    return model_files["model.int8.onnx"], model_files["tokens.txt"]
+
+
+def load_model(config: dict):
+    """加载SenseVoice离线识别模型，每个识别工作单元调用一次"""
+    model_path, tokens_path = prepare_model_files(config.get("model_dir"))
+    with CaptureOutput():
+        return sherpa_onnx.OfflineRecognizer.from_sense_voice(
+            model=model_path,
+            tokens=tokens_path,
+            num_threads=config.get("num_threads", 2),
+            sample_rate=16000,
+            feature_dim=80,
+            decoding_method="greedy_search",
+            debug=False,
+            use_itn=True,
+        )
+
+
+def recognize_batch(model, samples_list):
+    """识别一批16kHz float32音频，返回与输入顺序一致的文本列表"""
+    streams = []
+    for samples in samples_list:
+        stream = model.create_stream()
+        stream.accept_waveform(16000, samples)
+        streams.append(stream)
+    model.decode_streams(streams)
+    return [stream.result.text for stream in streams]
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         self.model_dir = config.get("model_dir")
         self.output_dir = config.get("output_dir")
         self.delete_audio_file = delete_audio_file
+        # 调试用：把每句识别的音频保存为WAV文件，默认直接在内存中识别
+        self.save_audio = config.get("save_audio", False)
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
-        
-        # 初始化模型文件路径
-        model_files = {
-            "model.int8.onnx": os.path.join(self.model_dir, "model.int8.onnx"),
-            "tokens.txt": os.path.join(self.model_dir, "tokens.txt")
-        }
-
-        # 下载并检查模型文件
-        try:
-            for file_name, file_path in model_files.items():
-                if not os.path.isfile(file_path):
-                    logger.bind(tag=TAG).info(f"正在下载模型文件: {file_name}")
-                    model_file_download(
-                        model_id="pengzhendong/sherpa-onnx-sense-voice-zh-en-ja-ko-yue",
-                        file_path=file_name,
-                        local_dir=self.model_dir
-                    )
-                    
-                    if not os.path.isfile(file_path):
-                        raise FileNotFoundError(f"模型文件下载失败: {file_path}")
-                        
-            self.model_path = model_files["model.int8.onnx"]
-            self.tokens_path = model_files["tokens.txt"]
-            
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"模型文件处理失败: {str(e)}")
-            raise
-
-        with CaptureOutput():
-            self.model = sherpa_onnx.OfflineRecognizer.from_sense_voice(
-                model=self.model_path,
-                tokens=self.tokens_path,
-                num_threads=2,
-                sample_rate=16000,
-                feature_dim=80,
-                decoding_method="greedy_search",
-                debug=False,
-                use_itn=True,
-            )
+
+        # 检查模型文件，缺失时自动下载
+        self.model_path, self.tokens_path = prepare_model_files(self.model_dir)
+        self.init_local_recognizer(config, __name__)
 
     def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
         """将Opus音频数据解码并保存为WAV文件"""
-        file_name = f"asr_{session_id}_{uuid.uuid4()}.wav"
-        file_path = os.path.join(self.output_dir, file_name)
-
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-
-        with wave.open(file_path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes = 16-bit
-            wf.setframerate(16000)
-            wf.writeframes(b"".join(pcm_data))
-
-        return file_path
+        return self.save_pcm_to_file(self.decode_opus(opus_data), session_id)
 
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
@@ -134,18 +135,15 @@ class ASRProvider(ASRProviderBase):
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 保存音频文件
             start_time = time.time()
-            file_path = self.save_audio_to_file(opus_data, session_id)
-            logger.bind(tag=TAG).debug(f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}")
+            utterance = Utterance.ensure(opus_data)
+            if self.save_audio:
+                file_path = self.save_pcm_to_file(utterance.pcm_int16, session_id)
+                logger.bind(tag=TAG).debug(f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}")
 
-            # 语音识别
+            # 语音识别，直接传入float32数组
             start_time = time.time()
-            s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            text = await self.recognize(utterance.pcm_float32)
             logger.bind(tag=TAG).debug(f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}")
 
             return text, file_path
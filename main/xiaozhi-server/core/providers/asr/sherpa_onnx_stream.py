@@ -0,0 +1,116 @@
+import time
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+from typing import Optional, Tuple, List
+from core.providers.asr.base import ASRProviderBase, ASRStream
+from core.utils.utterance import Utterance
+
+import numpy as np
+import sherpa_onnx
+
+TAG = __name__
+logger = setup_logging()
+
+
+class SherpaOnlineStream(ASRStream):
+    """基于sherpa-onnx在线识别器的流式识别会话"""
+
+    def __init__(self, recognizer, executor, tail_padding):
+        self.recognizer = recognizer
+        self.executor = executor
+        self.tail_padding = tail_padding
+        self.stream = recognizer.create_stream()
+        self.text = ""
+
+    def _decode(self):
+        while self.recognizer.is_ready(self.stream):
+            self.recognizer.decode_stream(self.stream)
+        self.text = self.recognizer.get_result(self.stream)
+        return self.text
+
+    def _accept(self, samples):
+        self.stream.accept_waveform(16000, samples)
+        return self._decode()
+
+    def _finish(self):
+        # 补一小段静音，让模型输出最后几个字
+        self.stream.accept_waveform(16000, self.tail_padding)
+        self.stream.input_finished()
+        return self._decode()
+
+    async def accept_waveform(self, samples: np.ndarray) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._accept, samples)
+
+    async def finish(self) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._finish)
+
+    def close(self):
+        self.stream = None
+
+
+class ASRProvider(ASRProviderBase):
+    def __init__(self, config: dict, delete_audio_file: bool):
+        self.model_dir = config.get("model_dir")
+        self.output_dir = config.get("output_dir")
+        self.delete_audio_file = delete_audio_file
+
+        # 确保输出目录存在
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        model_files = {
+            "encoder": config.get("encoder", "encoder-epoch-99-avg-1.int8.onnx"),
+            "decoder": config.get("decoder", "decoder-epoch-99-avg-1.onnx"),
+            "joiner": config.get("joiner", "joiner-epoch-99-avg-1.int8.onnx"),
+            "tokens": config.get("tokens", "tokens.txt"),
+        }
+        model_paths = {}
+        for name, file_name in model_files.items():
+            file_path = os.path.join(self.model_dir, file_name)
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(f"流式识别模型文件不存在: {file_path}")
+            model_paths[name] = file_path
+
+        self.recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
+            tokens=model_paths["tokens"],
+            encoder=model_paths["encoder"],
+            decoder=model_paths["decoder"],
+            joiner=model_paths["joiner"],
+            num_threads=config.get("num_threads", 1),
+            sample_rate=16000,
+            feature_dim=80,
+            decoding_method="greedy_search",
+        )
+        self.tail_padding = np.zeros(int(0.3 * 16000), dtype=np.float32)
+        # 流式解码在专用线程池中执行，同一个识别会话的调用由调用方保证先后顺序
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.get("max_workers", 2), thread_name_prefix="asr-stream"
+        )
+
+    def supports_streaming(self) -> bool:
+        return True
+
+    def create_stream(self, session_id: str) -> Optional[ASRStream]:
+        return SherpaOnlineStream(self.recognizer, self.executor, self.tail_padding)
+
+    def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
+        """将Opus音频数据解码并保存为WAV文件"""
+        return self.save_pcm_to_file(self.decode_opus(opus_data), session_id)
+
+    async def speech_to_text(self, opus_data: List[bytes], session_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """整句识别：没有走流式识别时（如手动拾音模式），把整句音频一次送入在线识别器"""
+        try:
+            start_time = time.time()
+            stream = self.create_stream(session_id)
+            await stream.accept_waveform(Utterance.ensure(opus_data).pcm_float32)
+            text = await stream.finish()
+            stream.close()
+            logger.bind(tag=TAG).debug(f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}")
+            return text, None
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
+            return "", None
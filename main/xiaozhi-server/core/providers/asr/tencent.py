@@ -5,12 +5,9 @@ import json
 import time
 from datetime import datetime, timezone
 import os
-import uuid
 from typing import Optional, Tuple, List
-import wave
-import opuslib_next
 
-import requests
+import aiohttp
 from core.providers.asr.base import ASRProviderBase
 from config.logger import setup_logging
 
@@ -26,50 +23,45 @@ class ASRProvider(ASRProviderBase):
         self.secret_id = config.get("secret_id")
         self.secret_key = config.get("secret_key")
         self.output_dir = config.get("output_dir")
-        
+        self.api_url = config.get("api_url", self.API_URL)
+        self.region = config.get("region", "ap-shanghai")
+
+        # 连接池：保持长连接复用TLS会话，每句话不再重新握手
+        self.pool_size = config.get("pool_size", 32)
+        self.keepalive_timeout = config.get("keepalive_timeout", 60)
+        self.timeout = aiohttp.ClientTimeout(
+            total=config.get("timeout", 10),
+            sock_connect=config.get("connect_timeout", 3),
+        )
+        self._session = None
+
+        # 签名缓存：签名密钥按日期缓存，凭证范围等按秒缓存
+        self._signing_key_cache = (None, None)
+        self._sign_context_cache = (None, None)
+
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话，在事件循环中首次使用时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        """关闭共享的HTTP会话和连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     def save_audio_to_file(self, opus_data: List[bytes], session_id: str) -> str:
         """将Opus音频数据解码并保存为WAV文件"""
-
-        file_name = f"tencent_asr_{session_id}_{uuid.uuid4()}.wav"
-        file_path = os.path.join(self.output_dir, file_name)
-        
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-        
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-        
-        with wave.open(file_path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes = 16-bit
-            wf.setframerate(16000)
-            wf.writeframes(b"".join(pcm_data))
-        
-        return file_path
-
-    @staticmethod
-    def decode_opus(opus_data: List[bytes]) -> bytes:
-        """将Opus音频数据解码为PCM数据"""
-        import opuslib_next
-        
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-        
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-        
-        return b"".join(pcm_data)
+        return self.save_pcm_to_file(self.decode_opus(opus_data), session_id)
 
     async def speech_to_text(self, opus_data: List[bytes], session_id: str) -> Tuple[Optional[str], Optional[str]]:
         """将语音数据转换为文本"""
@@ -84,7 +76,7 @@ class ASRProvider(ASRProviderBase):
                 return None, None
 
             # 将Opus音频数据解码为PCM
-            pcm_data = self.decode_opus(opus_data)
+            pcm_data = self.decode_opus(opus_data).tobytes()
             
             # 将音频数据转换为Base64编码
             base64_audio = base64.b64encode(pcm_data).decode('utf-8')
@@ -97,7 +89,7 @@ class ASRProvider(ASRProviderBase):
 
             # 发送请求
             start_time = time.time()
-            result = self._send_request(request_body, timestamp, authorization)
+            result = await self._send_request(request_body, timestamp, authorization)
             
             if result:
                 logger.bind(tag=TAG).debug(f"腾讯云语音识别耗时: {time.time() - start_time:.3f}s | 结果: {result}")
@@ -121,19 +113,35 @@ class ASRProvider(ASRProviderBase):
         }
         return json.dumps(request_map)
 
+    def _get_signing_key(self, date: str, service: str) -> bytes:
+        """签名密钥只与日期相关，同一天内复用"""
+        cached_date, signing_key = self._signing_key_cache
+        if cached_date != date:
+            secret_date = self._hmac_sha256(f"TC3{self.secret_key}", date)
+            secret_service = self._hmac_sha256(secret_date, service)
+            signing_key = self._hmac_sha256(secret_service, "tc3_request")
+            self._signing_key_cache = (date, signing_key)
+        return signing_key
+
+    def _get_sign_context(self, service: str) -> Tuple[str, str, bytes]:
+        """时间戳精确到秒，同一秒内的请求复用时间戳、凭证范围和签名密钥"""
+        now = int(time.time())
+        cached_second, context = self._sign_context_cache
+        if cached_second != now:
+            date = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+            credential_scope = f"{date}/{service}/tc3_request"
+            context = (str(now), credential_scope, self._get_signing_key(date, service))
+            self._sign_context_cache = (now, context)
+        return context
+
     def _get_auth_headers(self, request_body: str) -> Tuple[str, str]:
         """获取认证头"""
         try:
-            # 获取当前UTC时间戳
-            now = datetime.now(timezone.utc)
-            timestamp = str(int(now.timestamp()))
-            date = now.strftime("%Y-%m-%d")
-
             # 服务名称必须是 "asr"
             service = "asr"
 
-            # 拼接凭证范围
-            credential_scope = f"{date}/{service}/tc3_request"
+            # 当前UTC时间戳、凭证范围和签名密钥（签名依赖请求体哈希，只能缓存与请求体无关的部分）
+            timestamp, credential_scope, secret_signing = self._get_sign_context(service)
 
             # 使用TC3-HMAC-SHA256签名方法
             algorithm = "TC3-HMAC-SHA256"
@@ -176,11 +184,6 @@ class ASRProvider(ASRProviderBase):
                             f"{credential_scope}\n" + \
                             f"{hashed_canonical_request}"
 
-            # 计算签名密钥
-            secret_date = self._hmac_sha256(f"TC3{self.secret_key}", date)
-            secret_service = self._hmac_sha256(secret_date, service)
-            secret_signing = self._hmac_sha256(secret_service, "tc3_request")
-
             # 计算签名
             signature = self._bytes_to_hex(self._hmac_sha256(secret_signing, string_to_sign))
 
@@ -196,7 +199,7 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"生成认证头失败: {e}", exc_info=True)
             raise RuntimeError(f"生成认证头失败: {e}")
 
-    def _send_request(self, request_body: str, timestamp: str, authorization: str) -> Optional[str]:
+    async def _send_request(self, request_body: str, timestamp: str, authorization: str) -> Optional[str]:
         """发送请求到腾讯云API"""
         headers = {
             "Content-Type": "application/json; charset=utf-8",
@@ -205,16 +208,15 @@ class ASRProvider(ASRProviderBase):
             "X-TC-Action": "SentenceRecognition",
             "X-TC-Version": self.API_VERSION,
             "X-TC-Timestamp": timestamp,
-            "X-TC-Region": "ap-shanghai"
+            "X-TC-Region": self.region
         }
 
         try:
-            response = requests.post(self.API_URL, headers=headers, data=request_body)
-            
-            if not response.ok:
-                raise IOError(f"请求失败: {response.status_code} {response.reason}")
-            
-            response_json = response.json()
+            async with self._get_session().post(self.api_url, headers=headers, data=request_body) as response:
+                if response.status != 200:
+                    raise IOError(f"请求失败: {response.status} {response.reason}")
+
+                response_json = await response.json(content_type=None)
             
             # 检查是否有错误
             if "Response" in response_json and "Error" in response_json["Response"]:
@@ -4,6 +4,7 @@ import time
 import os
 import pickle
 from .base import EmotionProviderBase, logger
+from core.utils.utterance import Utterance
 from typing import Dict, Any
 
 TAG = __name__
@@ -76,31 +77,17 @@ class EmotionProvider(EmotionProviderBase):
                 self.logger.bind(tag=TAG).warning("音频数据为空")
                 return None
 
-            # 将音频数据转换为bytearray
-            if isinstance(audio_data, list):
-                # 如果是列表，将所有音频数据连接起来
-                audio_data = bytearray().join(audio_data)
-            elif isinstance(audio_data, bytes):
-                audio_data = bytearray(audio_data)
-                
-            if not isinstance(audio_data, bytearray):
+            if isinstance(audio_data, (list, Utterance)):
+                # Opus数据包列表或Utterance：直接取整句已解码的float32 PCM
+                audio_array = Utterance.ensure(audio_data).pcm_float32
+            elif isinstance(audio_data, (bytes, bytearray)):
+                # 原始int16 PCM，确保数据长度是偶数
+                audio_data = audio_data[:len(audio_data) // 2 * 2]
+                audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+            else:
                 self.logger.bind(tag=TAG).error(f"不支持的音频数据类型: {type(audio_data)}")
                 return None
 
-            # 确保数据长度是偶数（对于int16）
-            if len(audio_data) % 2 != 0:
-                audio_data = audio_data[:-1]
-
-            # 尝试将音频数据转换为numpy数组
-            try:
-                # 尝试转换为int16
-                audio_array = np.frombuffer(audio_data, dtype=np.int16)
-                # 将int16转换为float32并归一化
-                audio_array = audio_array.astype(np.float32) / 32768.0
-            except ValueError as e:
-                self.logger.bind(tag=TAG).error(f"音频数据转换错误: {e}")
-                return None
-
             # 检查数组长度
             if len(audio_array) == 0:
                 self.logger.bind(tag=TAG).warning("转换后的音频数组为空")
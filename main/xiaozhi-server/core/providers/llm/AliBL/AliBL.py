@@ -1,7 +1,7 @@
 from config.logger import setup_logging
 from http import HTTPStatus
 from dashscope import Application
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, LLMError, iterate_in_thread
 
 TAG = __name__
 logger = setup_logging()
@@ -14,7 +14,16 @@ class LLMProvider(LLMProviderBase):
         self.is_No_prompt = config.get("is_no_prompt")
         self.memory_id = config.get("ali_memory_id")
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
+        # SDK只有同步接口，在线程中消费
+        parts = iterate_in_thread(self._response_sync(session_id, dialogue))
+        try:
+            async for part in parts:
+                yield part
+        finally:
+            await parts.aclose()
+
+    def _response_sync(self, session_id, dialogue):
         try:
             # 处理dialogue
             if self.is_No_prompt:
@@ -42,11 +51,11 @@ class LLMProvider(LLMProviderBase):
                     f"message={responses.message}, "
                     f"请参考文档：https://help.aliyun.com/zh/model-studio/developer-reference/error-code"
                 )
-                yield "【阿里百练API服务响应异常】"
+                yield LLMError("【阿里百练API服务响应异常】")
             else:
                 logger.bind(tag=TAG).debug(f"【阿里百练API服务】构造参数: {call_params}")
                 yield responses.output.text
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"【阿里百练API服务】响应异常: {e}")
-            yield "【LLM服务响应异常】"
+            yield LLMError("【LLM服务响应异常】")
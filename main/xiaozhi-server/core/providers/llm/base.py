@@ -1,14 +1,103 @@
+import time
+import asyncio
+import threading
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+
+async def iterate_in_thread(generator):
+    """
+    在线程中消费同步生成器，转换为异步生成器，用于只提供同步SDK的服务。
+    调用方停止迭代（break、任务被取消）时关闭生成器，断开仍在进行的流式请求。
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    # 生成器不能在执行中被关闭，关闭要等正在进行的next()返回
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return next(generator, done)
+
+    def close():
+        with lock:
+            generator.close()
+
+    try:
+        while True:
+            item = await loop.run_in_executor(None, step)
+            if item is done:
+                break
+            yield item
+    finally:
+        loop.run_in_executor(None, close)
+
+
+def has_output(item) -> bool:
+    """流式响应中第一段有实际内容的输出（文本或工具调用），以此计算首token延迟"""
+    if isinstance(item, tuple):
+        content, tool_calls = item
+        return bool(content) or tool_calls is not None
+    return bool(item)
+
+
+class LLMError(str):
+    """
+    服务出错时返回的提示文本。仍然是普通的字符串，可以照常播报给用户；
+    路由、对冲请求通过类型而不是文本内容判断服务失败，正常回复中的【...】不会被当作错误。
+    """
+
+
+def is_error_output(item) -> bool:
+    """服务返回的是LLMError，不作为有效的首token"""
+    content = item[0] if isinstance(item, tuple) else item
+    return isinstance(content, LLMError)
+
+
+class StreamAttempt:
+    """发往一个服务的请求：在后台等待首token，收到之前的输出先缓存"""
+
+    def __init__(self, name, stream):
+        self.name = name
+        self.stream = stream
+        self.buffered = []
+        self.start_time = time.monotonic()
+        self.ttft = None
+        self.error = None
+        self.task = asyncio.create_task(self._first())
+
+    async def _first(self) -> bool:
+        async for item in self.stream:
+            if is_error_output(item):
+                self.error = item
+                return False
+            self.buffered.append(item)
+            if has_output(item):
+                self.ttft = time.monotonic() - self.start_time
+                return True
+        return False
+
+    def succeeded(self) -> bool:
+        return self.task.done() and not self.task.cancelled() and self.task.exception() is None and self.task.result()
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        await self.stream.aclose()
+
+
 class LLMProviderBase(ABC):
     @abstractmethod
     async def response(self, session_id, dialogue):
-        """LLM response generator"""
-        pass
+        """
+        LLM流式响应，异步生成器，逐段返回文本。
+        调用方停止迭代（break、aclose()、任务被取消）时需要关闭上游的流式请求。
+        """
+        yield
 
     async def response_no_stream(self, system_prompt, user_prompt):
         try:
@@ -19,20 +108,22 @@ class LLMProviderBase(ABC):
             ]
             result = ""
             async for part in self.response("", dialogue):
+                if isinstance(part, LLMError):
+                    return part
                 result += part
             return result
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
-            return "【LLM服务响应异常】"
-    
-    def response_with_functions(self, session_id, dialogue, functions=None):
+            return LLMError("【LLM服务响应异常】")
+
+    async def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
         This should be overridden by providers that support function calls
-        
-        Returns: generator that yields either text tokens or a special function call token
+
+        Returns: async generator that yields (content, tool_calls)
         """
         # For providers that don't support functions, just return regular response
-        for token in self.response(session_id, dialogue):
-            yield {"type": "content", "content": token}
\ No newline at end of file
+        async for token in self.response(session_id, dialogue):
+            yield token, None
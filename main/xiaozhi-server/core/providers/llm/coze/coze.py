@@ -2,7 +2,7 @@ from config.logger import setup_logging
 import requests
 import json
 import re
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, iterate_in_thread
 import os
 # official coze sdk for Python [cozepy](https://github.com/coze-dev/coze-py)
 from cozepy import COZE_CN_BASE_URL
@@ -19,7 +19,16 @@ class LLMProvider(LLMProviderBase):
         self.user_id = config.get("user_id")
         self.session_conversation_map = {}  # 存储session_id和conversation_id的映射
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
+        # SDK只有同步接口，在线程中消费
+        parts = iterate_in_thread(self._response_sync(session_id, dialogue))
+        try:
+            async for part in parts:
+                yield part
+        finally:
+            await parts.aclose()
+
+    def _response_sync(self, session_id, dialogue):
         coze_api_token = self.personal_access_token
         coze_api_base = COZE_CN_BASE_URL
 
@@ -1,7 +1,7 @@
 import json
 from config.logger import setup_logging
-import requests
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_http_client
+from core.providers.llm.base import LLMProviderBase, LLMError
 
 TAG = __name__
 logger = setup_logging()
@@ -14,7 +14,7 @@ class LLMProvider(LLMProviderBase):
         self.base_url = config.get("base_url", "https://api.dify.ai/v1").rstrip("/")
         self.session_conversation_map = {}  # 存储session_id和conversation_id的映射
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
         try:
             # 取最后一条用户消息
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
@@ -42,15 +42,16 @@ class LLMProvider(LLMProviderBase):
                     "user": session_id,
                 }
 
-            with requests.post(
+            # 调用方中途停止时退出async with，关闭上游的流式响应
+            async with get_http_client(self.base_url).stream(
+                "POST",
                 f"{self.base_url}/{self.mode}",
                 headers={"Authorization": f"Bearer {self.api_key}"},
                 json=request_json,
-                stream=True,
             ) as r:
                 if self.mode == "chat-messages":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
+                    async for line in r.aiter_lines():
+                        if line.startswith("data: "):
                             event = json.loads(line[6:])
                             # 如果没有找到conversation_id，则获取此次conversation_id
                             if not conversation_id:
@@ -61,21 +62,21 @@ class LLMProvider(LLMProviderBase):
                             if event.get("answer"):
                                 yield event["answer"]
                 elif self.mode == "workflows/run":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
+                    async for line in r.aiter_lines():
+                        if line.startswith("data: "):
                             event = json.loads(line[6:])
                             if event.get("event") == "workflow_finished":
                                 if event["data"]["status"] == "succeeded":
                                     yield event["data"]["outputs"]["answer"]
                                 else:
-                                    yield "【服务响应异常】"
+                                    yield LLMError("【服务响应异常】")
                 elif self.mode == "completion-messages":
-                    for line in r.iter_lines():
-                        if line.startswith(b"data: "):
+                    async for line in r.aiter_lines():
+                        if line.startswith("data: "):
                             event = json.loads(line[6:])
                             if event.get("answer"):
                                 yield event["answer"]
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
-            yield "【服务响应异常】"
+            yield LLMError("【服务响应异常】")
@@ -1,7 +1,7 @@
 import json
 from config.logger import setup_logging
-import requests
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_http_client
+from core.providers.llm.base import LLMProviderBase, LLMError
 
 TAG = __name__
 logger = setup_logging()
@@ -14,13 +14,14 @@ class LLMProvider(LLMProviderBase):
         self.detail = config.get("detail", False)
         self.variables = config.get("variables", {})
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
         try:
             # 取最后一条用户消息
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
 
             # 发起流式请求
-            with requests.post(
+            async with get_http_client(self.base_url).stream(
+                    "POST",
                     f"{self.base_url}/chat/completions",
                     headers={"Authorization": f"Bearer {self.api_key}"},
                     json={
@@ -35,13 +36,12 @@ class LLMProvider(LLMProviderBase):
                             }
                         ]
                     },
-                    stream=True
             ) as r:
-                for line in r.iter_lines():
+                async for line in r.aiter_lines():
                     if line:
                         try:
-                            if line.startswith(b'data: '):
-                                if line[6:].decode('utf-8') == '[DONE]':
+                            if line.startswith('data: '):
+                                if line[6:] == '[DONE]':
                                     break
 
                                 data = json.loads(line[6:])
@@ -62,4 +62,4 @@ class LLMProvider(LLMProviderBase):
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
-            yield "【服务响应异常】"
\ No newline at end of file
+            yield LLMError("【服务响应异常】")
\ No newline at end of file
@@ -1,8 +1,8 @@
 import google.generativeai as genai
 from core.utils.util import check_model_key
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, LLMError
 from config.logger import setup_logging
-import requests
+from core.utils.http_pool import get_http_client
 import json
 TAG = __name__
 logger = setup_logging()
@@ -22,17 +22,10 @@ class LLMProvider(LLMProviderBase):
         try:
             # 初始化Gemini客户端
             # 配置代理（如果提供了代理配置）
-            self.proxies=None
-            if self.http_proxy is not "" or self.https_proxy is not "":
-
-                self.proxies = {
-                    "http": self.http_proxy,
-                    "https": self.https_proxy,
-                }
-                logger.bind(tag=TAG).info(f"Gemini set proxys:{self.proxies}")
-                # 使用猴子补丁修改 google-generativeai 库的请求会话
-
-                # 使用 session 对象配置 genai
+            # Gemini接口是https，优先使用https代理
+            self.proxy = self.https_proxy or self.http_proxy or None
+            if self.proxy:
+                logger.bind(tag=TAG).info(f"Gemini set proxy:{self.proxy}")
 
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(self.model_name)
@@ -49,10 +42,10 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"Gemini初始化失败: {e}")
             self.model = None
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
         """生成Gemini对话响应"""
         if not self.model:
-            yield "【Gemini服务未正确初始化】"
+            yield LLMError("【Gemini服务未正确初始化】")
             return
 
         try:
@@ -86,8 +79,9 @@ class LLMProvider(LLMProviderBase):
             }
 
             # 发送POST请求,经测试手动 request 无法使用 stream 模式
-            if self.proxies:
-                response = requests.post(url, headers=headers, json=request_body, stream=False, proxies=self.proxies)
+            if self.proxy:
+                client = get_http_client(url, proxy=self.proxy)
+                response = await client.post(url, headers=headers, json=request_body)
                 try:
                     data = response.json()  # 直接解析JSON
                     if 'candidates' in data and data['candidates']:
@@ -103,13 +97,13 @@ class LLMProvider(LLMProviderBase):
                 chat = self.model.start_chat(history=chat_history)
 
                 # 发送消息并获取流式响应
-                response = chat.send_message(
+                response = await chat.send_message_async(
                     current_msg,
                     stream=True,
                     generation_config=self.generation_config
                 )
                 # 处理流式响应
-                for chunk in response:
+                async for chunk in response:
                     if hasattr(chunk, 'text') and chunk.text:
                         yield chunk.text
 
@@ -119,18 +113,8 @@ class LLMProvider(LLMProviderBase):
 
             # 针对不同错误返回友好提示
             if "Rate limit" in error_msg:
-                yield "【Gemini服务请求太频繁,请稍后再试】"
+                yield LLMError("【Gemini服务请求太频繁,请稍后再试】")
             elif "Invalid API key" in error_msg:
-                yield "【Gemini API key无效】"
+                yield LLMError("【Gemini API key无效】")
             else:
-                yield f"【Gemini服务响应异常: {error_msg}】"
-
-
-
-
-        except requests.exceptions.RequestException as e:
-            yield f"请求失败：{e}"
-        except json.JSONDecodeError as e:
-            yield f"JSON解码错误：{e}"
-        except Exception as e:
-            yield f"发生错误：{e}"
+                yield LLMError(f"【Gemini服务响应异常: {error_msg}】")
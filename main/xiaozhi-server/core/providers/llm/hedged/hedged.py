@@ -0,0 +1,151 @@
+import time
+import asyncio
+import threading
+from config.logger import setup_logging
+from config.settings import load_config
+from core.utils.llm import create_instance
+from core.utils.latency import LatencyHistogram
+from core.providers.llm.base import LLMProviderBase, StreamAttempt
+
+TAG = __name__
+logger = setup_logging()
+
+
+class LLMProvider(LLMProviderBase):
+    """
+    对冲请求：先发给第一个服务，超过对冲延迟还没有收到首token，再同时发给下一个服务，
+    采用最先返回首token的响应，取消其余的请求。服务出错或返回空响应时立即发给下一个服务。
+    每个服务的首token延迟记录在直方图中，对冲延迟取该服务首token延迟的hedge_percentile分位数。
+    """
+
+    def __init__(self, config, providers=None):
+        """providers: 已经创建好的服务实例（名称 -> 实例），不传时按配置中的providers从LLM配置创建"""
+        self.config = config
+        self.hedge_delay = config.get("hedge_delay_ms", 1000) / 1000
+        self.adaptive = config.get("adaptive", True)
+        self.hedge_percentile = config.get("hedge_percentile", 95)
+        self.min_hedge_delay = config.get("min_hedge_delay_ms", 200) / 1000
+        self.max_hedge_delay = config.get("max_hedge_delay_ms", 3000) / 1000
+        self.min_samples = config.get("min_samples", 20)
+        self.log_interval = config.get("log_interval", 50)
+
+        self.names = list(providers or config.get("providers", []))
+        self.providers = dict(providers or {})
+        llm_config = load_config()["LLM"] if providers is None else {}
+        for name in self.names:
+            if name in self.providers:
+                continue
+            if name not in llm_config:
+                raise ValueError(f"对冲LLM的服务{name}未在LLM中配置")
+            provider_type = llm_config[name].get("type", name)
+            if provider_type == "hedged":
+                raise ValueError(f"对冲LLM的服务{name}不能是对冲类型")
+            self.providers[name] = create_instance(provider_type, llm_config[name])
+        if len(self.names) < 2:
+            raise ValueError("对冲LLM至少需要配置两个服务")
+
+        self.histograms = {name: LatencyHistogram() for name in self.names}
+        self.stats = {name: {"requests": 0, "wins": 0, "errors": 0} for name in self.names}
+        self.requests = 0
+        self.hedged_requests = 0
+        self._lock = threading.Lock()
+
+    def get_hedge_delay(self, name) -> float:
+        """向name发出请求后等待多久再发给下一个服务"""
+        histogram = self.histograms[name]
+        if not self.adaptive or histogram.samples < self.min_samples:
+            return self.hedge_delay
+        delay = histogram.percentile(self.hedge_percentile)
+        return min(max(delay, self.min_hedge_delay), self.max_hedge_delay)
+
+    async def _hedge(self, open_stream):
+        attempts = []
+        pending = list(self.names)
+        winner = None
+        hedged = False
+        try:
+            while winner is None:
+                if pending and not any(not a.task.done() for a in attempts):
+                    # 没有进行中的请求（刚开始或都已失败），立即发给下一个服务
+                    name = pending.pop(0)
+                    attempts.append(StreamAttempt(name, open_stream(self.providers[name])))
+                running = [a.task for a in attempts if not a.task.done()]
+                if not running:
+                    break
+                timeout = self.get_hedge_delay(attempts[-1].name) if pending else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in attempts:
+                    if attempt.task in done and not attempt.succeeded():
+                        self._record_error(attempt)
+                # 同时返回时优先采用排在前面的服务
+                winner = next((a for a in attempts if a.succeeded()), None)
+                if winner is None and not done and pending:
+                    name = pending.pop(0)
+                    hedged = True
+                    logger.bind(tag=TAG).debug(f"{attempts[-1].name} 超过{timeout:.3f}s没有返回首token，同时请求 {name}")
+                    attempts.append(StreamAttempt(name, open_stream(self.providers[name])))
+
+            self._record_result(attempts, winner, hedged)
+            if winner is None:
+                logger.bind(tag=TAG).error(f"对冲LLM的所有服务都没有返回有效响应: {self.names}")
+                # 与单个服务出错时一样，把最后一个服务的错误信息返回给调用方
+                error = next((a.error for a in reversed(attempts) if a.error is not None), None)
+                if error is not None:
+                    yield error
+                return
+            for attempt in attempts:
+                if attempt is not winner:
+                    await attempt.close()
+            for item in winner.buffered:
+                yield item
+            async for item in winner.stream:
+                yield item
+        finally:
+            # 调用方中途停止时关闭所有请求
+            for attempt in attempts:
+                await attempt.close()
+
+    def _record_error(self, attempt):
+        with self._lock:
+            self.stats[attempt.name]["errors"] += 1
+        error = attempt.task.exception() if not attempt.task.cancelled() else None
+        logger.bind(tag=TAG).warning(f"{attempt.name} 请求失败: {error or '没有返回有效响应'}")
+
+    def _record_result(self, attempts, winner, hedged):
+        now = time.monotonic()
+        for attempt in attempts:
+            if attempt.ttft is not None:
+                self.histograms[attempt.name].record(attempt.ttft)
+            elif winner is not None and not attempt.task.done():
+                # 被取消的请求的首token延迟至少是已经等待的时间，按这个下限记录，避免直方图只剩下快的样本
+                self.histograms[attempt.name].record(now - attempt.start_time)
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged_requests += 1
+            for attempt in attempts:
+                self.stats[attempt.name]["requests"] += 1
+            if winner is not None:
+                self.stats[winner.name]["wins"] += 1
+        if self.log_interval and self.requests % self.log_interval == 0:
+            logger.bind(tag=TAG).info(f"对冲LLM统计: {self.get_metrics()}")
+
+    async def response(self, session_id, dialogue):
+        async for item in self._hedge(lambda provider: provider.response(session_id, dialogue)):
+            yield item
+
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        async for item in self._hedge(
+            lambda provider: provider.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
+
+    def get_metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedged_requests": self.hedged_requests,
+            "hedge_delay": {name: round(self.get_hedge_delay(name), 3) for name in self.names},
+            "providers": {
+                name: dict(self.stats[name], ttft=self.histograms[name].get_metrics()) for name in self.names
+            },
+        }
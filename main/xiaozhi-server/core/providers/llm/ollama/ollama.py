@@ -1,7 +1,6 @@
 from config.logger import setup_logging
-from openai import OpenAI
-import json
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_openai_client
+from core.providers.llm.base import LLMProviderBase, LLMError
 
 TAG = __name__
 logger = setup_logging()
@@ -16,20 +15,21 @@ class LLMProvider(LLMProviderBase):
         if not self.base_url.endswith("/v1"):
             self.base_url = f"{self.base_url}/v1"
 
-        self.client = OpenAI(
-            base_url=self.base_url,
-            api_key="ollama"  # Ollama doesn't need an API key but OpenAI client requires one
-        )
+    @property
+    def client(self):
+        # Ollama doesn't need an API key but OpenAI client requires one
+        return get_openai_client(self.base_url, "ollama")
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
+        responses = None
         try:
-            responses = self.client.chat.completions.create(
+            responses = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True
             )
             is_active=True
-            for chunk in responses:
+            async for chunk in responses:
                 try:
                     delta = chunk.choices[0].delta if getattr(chunk, 'choices', None) else None
                     content = delta.content if hasattr(delta, 'content') else ''
@@ -47,20 +47,29 @@ class LLMProvider(LLMProviderBase):
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
-            yield "【Ollama服务响应异常】"
+            yield LLMError("【Ollama服务响应异常】")
+        finally:
+            if responses is not None:
+                await responses.close()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        stream = None
         try:
-            stream = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
                 tools=functions,
             )
 
-            for chunk in stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
                 yield chunk.choices[0].delta.content, chunk.choices[0].delta.tool_calls
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
-            yield {"type": "content", "content": f"【Ollama服务响应异常: {str(e)}】"}
+            yield LLMError(f"【Ollama服务响应异常: {str(e)}】"), None
+        finally:
+            if stream is not None:
+                await stream.close()
@@ -1,8 +1,9 @@
 from datetime import datetime
-import openai
 from config.logger import setup_logging
 from core.utils.util import check_model_key
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_openai_client
+from core.utils.prompt_cache import prompt_cache_stats
+from core.providers.llm.base import LLMProviderBase, LLMError
 
 TAG = __name__
 logger = setup_logging()
@@ -17,21 +18,39 @@ class LLMProvider(LLMProviderBase):
         else:
             self.base_url = config.get("url")
         self.max_tokens = config.get("max_tokens", 500)
+        # 流式响应末尾返回usage，用于统计服务端提示词缓存命中的token数；部分兼容服务不支持stream_options，默认关闭
+        self.stream_usage = config.get("stream_usage", False)
 
         check_model_key("LLM", self.api_key)
-        self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    @property
+    def client(self):
+        # 同一服务地址的所有连接共用一个连接池
+        return get_openai_client(self.base_url, self.api_key)
+
+    def _stream_options(self):
+        return {"stream_options": {"include_usage": True}} if self.stream_usage else {}
+
+    @staticmethod
+    def _record_usage(session_id, chunk):
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            prompt_cache_stats.record_usage(session_id, usage)
 
     async def response(self, session_id, dialogue):
+        responses = None
         try:
-            responses = self.client.chat.completions.create(
+            responses = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
                 max_tokens=self.max_tokens,
+                **self._stream_options(),
             )
 
             is_active = True
-            for chunk in responses:
+            async for chunk in responses:
+                self._record_usage(session_id, chunk)
                 try:
                     # 检查是否存在有效的choice且content不为空
                     delta = chunk.choices[0].delta if getattr(chunk, 'choices', None) else None
@@ -51,20 +70,32 @@ class LLMProvider(LLMProviderBase):
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+        finally:
+            # 调用方中途停止（打断、取消）时关闭上游的流式请求
+            if responses is not None:
+                await responses.close()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        stream = None
         try:
             logger.bind(tag=TAG).info(f"OpenAI response_with_functions: sending {dialogue} , {datetime.now()}")
-            stream = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
-                tools=functions
+                tools=functions,
+                **self._stream_options(),
             )
 
-            for chunk in stream:
+            async for chunk in stream:
+                self._record_usage(session_id, chunk)
+                if not chunk.choices:
+                    continue
                 yield chunk.choices[0].delta.content, chunk.choices[0].delta.tool_calls
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
-            yield {"type": "content", "content": f"【OpenAI服务响应异常: {e}】"}
+            yield LLMError(f"【OpenAI服务响应异常: {e}】"), None
+        finally:
+            if stream is not None:
+                await stream.close()
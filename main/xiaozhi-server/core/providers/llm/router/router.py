@@ -0,0 +1,300 @@
+import time
+import asyncio
+import threading
+from collections import deque, OrderedDict
+from config.logger import setup_logging
+from config.settings import load_config
+from core.utils.llm import create_instance
+from core.providers.llm.base import LLMProviderBase, LLMError, StreamAttempt
+
+TAG = __name__
+logger = setup_logging()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+PROBE_DIALOGUE = [{"role": "user", "content": "你好"}]
+
+
+class ProviderHealth:
+    """
+    一个服务的健康状态：最近window_seconds内每次请求的成败和首token延迟，以及熔断器。
+    连续失败failure_threshold次，或最近的错误率达到error_rate_threshold时熔断，
+    熔断open_seconds后允许探测，探测成功恢复并重新统计，失败则熔断时间加倍（不超过max_open_seconds）。
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.window_seconds = config.get("window_seconds", 60)
+        self.failure_threshold = config.get("failure_threshold", 3)
+        self.error_rate_threshold = config.get("error_rate_threshold", 0.5)
+        self.min_requests = config.get("min_requests", 10)
+        self.base_open_seconds = config.get("open_seconds", 10)
+        self.max_open_seconds = config.get("max_open_seconds", 120)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = self.base_open_seconds
+        self.open_until = 0.0
+        self.opened = 0
+        self.probing = False
+        self.outcomes = deque()  # (时间, 是否成功, 首token延迟)
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        while self.outcomes and now - self.outcomes[0][0] > self.window_seconds:
+            self.outcomes.popleft()
+
+    def record_success(self, ttft):
+        now = time.monotonic()
+        with self._lock:
+            self.outcomes.append((now, True, ttft))
+            self._prune(now)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                # 探测成功，熔断前的失败不再计入错误率，重新统计
+                self.outcomes.clear()
+                self.outcomes.append((now, True, ttft))
+                logger.bind(tag=TAG).info(f"{self.name} 恢复正常，关闭熔断")
+            self.state = CLOSED
+            self.open_seconds = self.base_open_seconds
+
+    def record_failure(self, reason):
+        now = time.monotonic()
+        with self._lock:
+            self.outcomes.append((now, False, None))
+            self._prune(now)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # 探测失败，熔断时间加倍
+                self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+                self._open(now, reason)
+            elif self.state == CLOSED and (
+                self.consecutive_failures >= self.failure_threshold
+                or (len(self.outcomes) >= self.min_requests and self.error_rate() >= self.error_rate_threshold)
+            ):
+                self._open(now, reason)
+
+    def _open(self, now, reason):
+        self.state = OPEN
+        self.open_until = now + self.open_seconds
+        self.opened += 1
+        logger.bind(tag=TAG).warning(
+            f"{self.name} 熔断{self.open_seconds}秒，连续失败{self.consecutive_failures}次，"
+            f"错误率{self.error_rate():.0%}，最近一次: {reason}"
+        )
+
+    def available(self) -> bool:
+        return self.state == CLOSED
+
+    def probe_due(self) -> bool:
+        """熔断时间已到且没有在探测中时，进入半开状态，由调用方发起一次探测"""
+        with self._lock:
+            if self.state != OPEN or self.probing or time.monotonic() < self.open_until:
+                return False
+            self.state = HALF_OPEN
+            self.probing = True
+            return True
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def ttft_p50(self):
+        ttfts = sorted(ttft for _, ok, ttft in self.outcomes if ok)
+        return ttfts[len(ttfts) // 2] if ttfts else None
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            ttft = self.ttft_p50()
+            return {
+                "state": self.state,
+                "requests": len(self.outcomes),
+                "error_rate": round(self.error_rate(), 3),
+                "ttft_p50": round(ttft, 3) if ttft is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "opened": self.opened,
+            }
+
+
+class LLMProvider(LLMProviderBase):
+    """
+    LLM路由：为每个会话选择当前最健康的服务，会话之后的请求沿用同一个服务，该服务熔断时改选其他服务。
+    请求在first_token_timeout_ms内没有首token、出错或返回空响应时记为失败，并在同一次请求中切换到下一个可用的服务。
+    服务熔断后在后台按熔断时间探测，没有新请求时也会探测，探测成功才重新接收会话。
+    """
+
+    def __init__(self, config, providers=None):
+        """providers: 已经创建好的服务实例（名称 -> 实例），不传时按配置中的providers从LLM配置创建"""
+        self.config = config
+        self.first_token_timeout = config.get("first_token_timeout_ms", 8000) / 1000
+        self.probe_timeout = config.get("probe_timeout_ms", 5000) / 1000
+        self.error_penalty = config.get("error_penalty", 4)
+        self.latency_tolerance = config.get("latency_tolerance", 1.2)
+        self.max_sessions = config.get("max_sessions", 10000)
+
+        self.names = list(providers or config.get("providers", []))
+        self.providers = dict(providers or {})
+        llm_config = load_config()["LLM"] if providers is None else {}
+        for name in self.names:
+            if name in self.providers:
+                continue
+            if name not in llm_config:
+                raise ValueError(f"LLM路由的服务{name}未在LLM中配置")
+            provider_type = llm_config[name].get("type", name)
+            if provider_type == "router":
+                raise ValueError(f"LLM路由的服务{name}不能是路由类型")
+            self.providers[name] = create_instance(provider_type, llm_config[name])
+        if not self.names:
+            raise ValueError("LLM路由至少需要配置一个服务")
+
+        self.health = {name: ProviderHealth(name, config) for name in self.names}
+        self.sessions = OrderedDict()  # session_id -> 服务名称
+        self.failovers = 0
+        self._probe_tasks = {}  # 服务名称 -> 后台探测任务
+
+    def _score(self, name, default_ttft):
+        health = self.health[name]
+        ttft = health.ttft_p50()
+        if ttft is None:
+            ttft = default_ttft
+        return ttft * (1 + self.error_penalty * health.error_rate())
+
+    def pick(self, exclude=()):
+        """按健康状况选择服务：只考虑没有熔断的服务，得分（首token延迟按错误率加权）在最好的latency_tolerance倍以内时按配置顺序优先"""
+        candidates = [n for n in self.names if n not in exclude and self.health[n].available()]
+        if not candidates:
+            # 都已熔断时按配置顺序尝试，熔断最早结束的优先
+            candidates = sorted(
+                (n for n in self.names if n not in exclude), key=lambda n: self.health[n].open_until
+            )
+            return candidates[0] if candidates else None
+        known = [t for t in (self.health[n].ttft_p50() for n in candidates) if t is not None]
+        default_ttft = min(known) if known else 1.0
+        scores = {n: self._score(n, default_ttft) for n in candidates}
+        best = min(scores.values())
+        return next(n for n in candidates if scores[n] <= best * self.latency_tolerance)
+
+    def _session_provider(self, session_id):
+        if not session_id:
+            return self.pick()
+        name = self.sessions.get(session_id)
+        if name is None or not self.health[name].available():
+            new_name = self.pick()
+            if name is not None and new_name != name:
+                logger.bind(tag=TAG).info(f"{session_id} 的LLM服务 {name} 不可用，切换到 {new_name}")
+            name = new_name
+            self.sessions[session_id] = name
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return name
+
+    def _watch(self, name):
+        """服务熔断后启动后台探测，每个服务只有一个探测任务"""
+        if name in self._probe_tasks or self.health[name].state == CLOSED:
+            return
+        task = asyncio.get_running_loop().create_task(self._probe_loop(name))
+        self._probe_tasks[name] = task
+        task.add_done_callback(lambda _: self._probe_tasks.pop(name, None))
+
+    async def _probe_loop(self, name):
+        """熔断时间到达后探测，失败时熔断时间加倍后继续，直到服务恢复（包括被其他请求成功调用）"""
+        health = self.health[name]
+        while health.state != CLOSED:
+            await asyncio.sleep(max(health.open_until - time.monotonic(), 0.1))
+            if health.probe_due():
+                await self._probe(name)
+
+    async def _probe(self, name):
+        health = self.health[name]
+        attempt = StreamAttempt(name, self.providers[name].response("", PROBE_DIALOGUE))
+        try:
+            await asyncio.wait([attempt.task], timeout=self.probe_timeout)
+            if attempt.succeeded():
+                health.record_success(attempt.ttft)
+            else:
+                health.record_failure(self._failure_reason(attempt))
+        finally:
+            health.probing = False
+            await attempt.close()
+
+    def _failure_reason(self, attempt):
+        if not attempt.task.done():
+            return "首token超时"
+        if attempt.task.cancelled():
+            return "已取消"
+        if attempt.task.exception() is not None:
+            return str(attempt.task.exception())
+        return attempt.error or "空响应"
+
+    async def _route(self, session_id, open_stream, error_item):
+        tried = []
+        name = self._session_provider(session_id)
+        last_error = None
+        while name is not None:
+            tried.append(name)
+            health = self.health[name]
+            attempt = StreamAttempt(name, open_stream(self.providers[name]))
+            try:
+                await asyncio.wait([attempt.task], timeout=self.first_token_timeout)
+                if attempt.succeeded():
+                    health.record_success(attempt.ttft)
+                    if session_id and self.sessions.get(session_id) != name:
+                        self.sessions[session_id] = name
+                    for item in attempt.buffered:
+                        yield item
+                    try:
+                        async for item in attempt.stream:
+                            yield item
+                    except Exception as e:
+                        # 首token之后出错，已经输出的内容无法撤回，只记录失败
+                        health.record_failure(str(e))
+                        self._watch(name)
+                        logger.bind(tag=TAG).error(f"{name} 流式响应中途出错: {e}")
+                    return
+                reason = self._failure_reason(attempt)
+                last_error = attempt.error or last_error
+                health.record_failure(reason)
+                self._watch(name)
+                logger.bind(tag=TAG).warning(f"{name} 请求失败: {reason}")
+            finally:
+                await attempt.close()
+            name = self.pick(exclude=tried)
+            if name is not None:
+                self.failovers += 1
+                logger.bind(tag=TAG).info(f"切换到 {name} 重试")
+        logger.bind(tag=TAG).error(f"LLM路由的所有服务都请求失败: {tried}")
+        yield last_error if last_error is not None else error_item
+
+    async def response(self, session_id, dialogue):
+        stream = self._route(
+            session_id, lambda provider: provider.response(session_id, dialogue), LLMError("【LLM服务响应异常】")
+        )
+        async for item in stream:
+            yield item
+
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        stream = self._route(
+            session_id,
+            lambda provider: provider.response_with_functions(session_id, dialogue, functions=functions),
+            (LLMError("【LLM服务响应异常】"), None),
+        )
+        async for item in stream:
+            yield item
+
+    async def close(self):
+        """停止后台探测"""
+        tasks = list(self._probe_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_metrics(self) -> dict:
+        return {
+            "failovers": self.failovers,
+            "sessions": len(self.sessions),
+            "providers": {name: self.health[name].get_metrics() for name in self.names},
+        }
@@ -1,7 +1,6 @@
 from config.logger import setup_logging
-from openai import OpenAI
-import json
-from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_openai_client
+from core.providers.llm.base import LLMProviderBase, LLMError
 
 TAG = __name__
 logger = setup_logging()
@@ -15,29 +14,25 @@ class LLMProvider(LLMProviderBase):
         # 如果没有v1，增加v1
         if not self.base_url.endswith("/v1"):
             self.base_url = f"{self.base_url}/v1"
-            
+
         logger.bind(tag=TAG).info(f"Initializing Xinference LLM provider with model: {self.model_name}, base_url: {self.base_url}")
 
-        try:
-            self.client = OpenAI(
-                base_url=self.base_url,
-                api_key="xinference"  # Xinference has a similar setup to Ollama where it doesn't need an actual key
-            )
-            logger.bind(tag=TAG).info("Xinference client initialized successfully")
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"Error initializing Xinference client: {e}")
-            raise
+    @property
+    def client(self):
+        # Xinference has a similar setup to Ollama where it doesn't need an actual key
+        return get_openai_client(self.base_url, "xinference")
 
-    def response(self, session_id, dialogue):
+    async def response(self, session_id, dialogue):
+        responses = None
         try:
             logger.bind(tag=TAG).debug(f"Sending request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}")
-            responses = self.client.chat.completions.create(
+            responses = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True
             )
             is_active=True
-            for chunk in responses:
+            async for chunk in responses:
                 try:
                     delta = chunk.choices[0].delta if getattr(chunk, 'choices', None) else None
                     content = delta.content if hasattr(delta, 'content') else ''
@@ -55,26 +50,32 @@ class LLMProvider(LLMProviderBase):
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Xinference response generation: {e}")
-            yield "【Xinference服务响应异常】"
+            yield LLMError("【Xinference服务响应异常】")
+        finally:
+            if responses is not None:
+                await responses.close()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    async def response_with_functions(self, session_id, dialogue, functions=None):
+        stream = None
         try:
             logger.bind(tag=TAG).debug(f"Sending function call request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}")
             if functions:
                 logger.bind(tag=TAG).debug(f"Function calls enabled with: {[f.get('function', {}).get('name') for f in functions]}")
-                
-            stream = self.client.chat.completions.create(
+
+            stream = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
                 tools=functions,
             )
 
-            for chunk in stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
                 delta = chunk.choices[0].delta
                 content = delta.content
                 tool_calls = delta.tool_calls
-                
+
                 if content:
                     yield content, tool_calls
                 elif tool_calls:
@@ -82,4 +83,7 @@ class LLMProvider(LLMProviderBase):
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Xinference function call: {e}")
-            yield {"type": "content", "content": f"【Xinference服务响应异常: {str(e)}】"} 
+            yield LLMError(f"【Xinference服务响应异常: {str(e)}】"), None
+        finally:
+            if stream is not None:
+                await stream.close()
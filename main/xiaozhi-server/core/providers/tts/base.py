@@ -7,6 +7,7 @@ import opuslib_next
 from pydub import AudioSegment
 from abc import ABC, abstractmethod
 from core.utils.tts import MarkdownCleaner
+from core.utils.audio_decode import decode_to_pcm16k
 
 TAG = __name__
 logger = setup_logging()
@@ -53,7 +54,16 @@ class TTSProviderBase(ABC):
 
     def audio_to_opus_data(self, audio_file_path):
         """音频文件转换为Opus编码"""
-        # 获取文件后缀名
+        # WAV在进程内解析、mp3使用可选的解码库，再用多相滤波重采样为16kHz单声道，不用为每个文件启动ffmpeg
+        try:
+            pcm = decode_to_pcm16k(audio_file_path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"进程内解码失败，使用ffmpeg: {audio_file_path}: {e}")
+            pcm = None
+        if pcm is not None:
+            return self.pcm_to_opus_data(pcm)
+
+        # 其他格式交给ffmpeg
         # 获取文件后缀名
         file_type = os.path.splitext(audio_file_path)[1]
         if file_type:
@@ -68,10 +78,12 @@ class TTSProviderBase(ABC):
 
     def audio_to_opus_data_directly(self, audio):
         """音频文件转换为Opus编码"""
-        
-        raw_data = audio.raw_data
+        return self.pcm_to_opus_data(audio.raw_data)
+
+    def pcm_to_opus_data(self, raw_data):
+        """16kHz单声道16位PCM转换为Opus编码"""
         # 音频时长(秒)
-        duration = len(audio) / 1000.0
+        duration = len(raw_data) / 2 / 16000
 
         # 初始化Opus编码器
         encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
@@ -2,14 +2,18 @@ import asyncio
 from datetime import datetime
 import json
 import os
+import time
 import uuid
 import websockets
 from websockets.asyncio.client import ClientConnection
 from config.logger import setup_logging
 from core.providers.tts.base import TTSProviderBase
+from core.utils.opus_encoder import OpusStreamEncoder
+from core.utils.audio_decode import decode_to_pcm16k
 import threading
-from concurrent.futures import Future
+import weakref
 import io
+from collections import deque
 from pydub import AudioSegment
 
 TAG = __name__
@@ -143,7 +147,7 @@ async def send_event(ws, header: bytes, optional: bytes | None = None,
 def read_res_content(res: bytes, offset: int):
     content_size = int.from_bytes(res[offset: offset + 4], 'big')
     offset += 4
-    content = str(res[offset: offset + content_size])
+    content = res[offset: offset + content_size].decode('utf-8', errors='replace')
     offset += content_size
     return content, offset
 
@@ -176,7 +180,7 @@ def parser_response(res) -> Response:
     #
     offset = 4
     optional = response.optional
-    if header.message_type == FULL_SERVER_RESPONSE or AUDIO_ONLY_RESPONSE:
+    if header.message_type in (FULL_SERVER_RESPONSE, AUDIO_ONLY_RESPONSE):
         # read event
         if header.message_type_specific_flags == MsgTypeFlagWithEvent:
             optional.event = int.from_bytes(res[offset:8], 'big')
@@ -230,22 +234,25 @@ async def start_connection(websocket):
     return await send_event(websocket, header, optional, payload)
 
 
-async def start_session(websocket, speaker, session_id):
+async def start_session(websocket, speaker, session_id, audio_format='mp3', audio_sample_rate=24000):
     header = Header(message_type=FULL_CLIENT_REQUEST,
                     message_type_specific_flags=MsgTypeFlagWithEvent,
                     serial_method=JSON
                     ).as_bytes()
     optional = Optional(event=EVENT_StartSession, sessionId=session_id).as_bytes()
-    payload = get_payload_bytes(event=EVENT_StartSession, speaker=speaker)
+    payload = get_payload_bytes(event=EVENT_StartSession, speaker=speaker, audio_format=audio_format,
+                                audio_sample_rate=audio_sample_rate)
     return await send_event(websocket, header, optional, payload)
 
 
-async def send_text(ws: ClientConnection, speaker: str, text: str, session_id):
+async def send_text(ws: ClientConnection, speaker: str, text: str, session_id, audio_format='mp3',
+                    audio_sample_rate=24000):
     header = Header(message_type=FULL_CLIENT_REQUEST,
                     message_type_specific_flags=MsgTypeFlagWithEvent,
                     serial_method=JSON).as_bytes()
     optional = Optional(event=EVENT_TaskRequest, sessionId=session_id).as_bytes()
-    payload = get_payload_bytes(event=EVENT_TaskRequest, text=text, speaker=speaker)
+    payload = get_payload_bytes(event=EVENT_TaskRequest, text=text, speaker=speaker, audio_format=audio_format,
+                                audio_sample_rate=audio_sample_rate)
     return await send_event(ws, header, optional, payload)
 
 
@@ -269,7 +276,311 @@ async def finish_connection(ws):
     return await send_event(ws, header, optional, payload)
 
 
+class UpstreamConnection:
+    """
+    一条到字节跳动双向流式TTS的websocket连接，连接上可以同时进行多个上游会话。
+    由一个reader读取所有响应，按响应中的上游会话ID放入对应会话的队列，会话之间互不等待。
+    """
+
+    def __init__(self, provider, index):
+        self.provider = provider
+        self.index = index
+        self.ws = None
+        self.in_flight = 0  # 正在使用这条连接的会话数，由TTSProvider分配
+        self.sessions = {}  # 上游会话ID -> 收到的响应队列
+        self.reader_task = None
+        self._connect_lock = asyncio.Lock()
+
+    def connected(self):
+        return self.ws is not None and self.ws.state == websockets.State.OPEN
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self.connected():
+                return
+            logger.bind(tag=TAG).info(f"Initializing WebSocket connection {self.index}...")
+            self.ws = await self.provider._init_websocket()
+            self.reader_task = asyncio.create_task(self._reader(self.ws))
+
+    async def _reader(self, ws):
+        try:
+            async for message in ws:
+                try:
+                    res = parser_response(message)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"Unexpected message from ByteDance TTS: {e}")
+                    continue
+                if res.header.message_type == ERROR_INFORMATION:
+                    # 错误帧不带会话ID，服务端随后会关闭连接，按连接断开通知这条连接上的所有会话
+                    logger.bind(tag=TAG).error(f"ByteDance TTS error {res.optional.errorCode}: {res.payload}")
+                    break
+                queue = self.sessions.get(res.optional.sessionId)
+                if queue is None:
+                    logger.bind(tag=TAG).debug(f"Drop response of finished session: {res.optional.__dict__}")
+                    continue
+                queue.put_nowait(res)
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.bind(tag=TAG).warning(f"WebSocket connection {self.index} closed: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in WebSocket reader {self.index}: {e}")
+        finally:
+            if self.ws is ws:
+                self.ws = None
+            await ws.close()
+            for queue in self.sessions.values():
+                queue.put_nowait(None)
+
+    def _get_ws(self):
+        if not self.connected():
+            raise ConnectionError(f"WebSocket connection {self.index} is closed")
+        return self.ws
+
+    async def start_session(self, speaker):
+        """开启一个上游会话，返回上游会话ID"""
+        await self.connect()
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = asyncio.Queue()
+        try:
+            await start_session(self._get_ws(), speaker, session_id, self.provider.audio_format,
+                                self.provider.audio_sample_rate)
+            res = await self.recv(session_id)
+            if res.optional.event != EVENT_SessionStarted:
+                raise RuntimeError(f"Start session failed: {res.optional.__dict__}")
+        except BaseException:
+            self.sessions.pop(session_id, None)
+            raise
+        return session_id
+
+    async def send_text(self, speaker, text, session_id):
+        await send_text(self._get_ws(), speaker, text, session_id, self.provider.audio_format,
+                        self.provider.audio_sample_rate)
+
+    async def finish_session(self, session_id):
+        await finish_session(self._get_ws(), session_id)
+
+    async def recv(self, session_id):
+        """读取该上游会话的下一个响应，超过session_timeout没有响应时抛出TimeoutError"""
+        res = await asyncio.wait_for(self.sessions[session_id].get(), self.provider.session_timeout)
+        if res is None:
+            raise ConnectionError(f"WebSocket connection {self.index} is closed")
+        return res
+
+    def end_session(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    async def close(self):
+        if self.ws:
+            await self.ws.close()
+        if self.reader_task:
+            await asyncio.gather(self.reader_task, return_exceptions=True)
+
+
+# 放入pending_texts，表示一轮回复的文本都已经送来
+FINISH_REPLY = object()
+
+
+def normalize_text(text):
+    """去掉标点、空白和表情，用于把服务端返回的句子对应到发送的文本"""
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def sentence_text(payload):
+    """TTSSentenceStart中服务端切分出的句子文本，没有时返回None"""
+    try:
+        return json.loads(payload).get("res_params", {}).get("text")
+    except Exception:
+        return None
+
+
+class ReorderBuffer:
+    """
+    同时合成的几句音频按提交顺序（text_index）放入播放队列：最前面一句的音频直接放入，
+    后面几句的音频先缓存，前面的句子结束后再依次放入。
+    按text_id区分各句，新一轮回复的text_index重新开始时不会和上一轮还没有结束的句子混在一起。
+    """
+
+    def __init__(self):
+        self.order = deque()  # 已经提交、还没有放完的句子的text_id
+        self.items = {}  # text_id -> 缓存的播放条目
+        self.finished = set()  # 已经结束、等待前面句子的text_id
+
+    def add(self, text_id):
+        self.order.append(text_id)
+        self.items[text_id] = []
+
+    def put(self, text_id, item):
+        """返回现在可以放入播放队列的条目"""
+        if text_id not in self.items or self.order[0] == text_id:
+            return [item]
+        self.items[text_id].append(item)
+        return []
+
+    def finish(self, text_id):
+        """一句结束，返回因此可以放入播放队列的后面几句的条目"""
+        if text_id not in self.items:
+            return []
+        self.finished.add(text_id)
+        ready = []
+        while self.order:
+            head = self.order[0]
+            ready.extend(self.items[head])
+            self.items[head] = []
+            if head not in self.finished:
+                break
+            self.order.popleft()
+            self.finished.discard(head)
+            del self.items[head]
+        return ready
+
+
+class TTSSession:
+    """一个设备连接（session_id）的TTS状态：自己的播放队列、音色和待合成的文本"""
+
+    def __init__(self, session_id, audio_play_queue, voice, max_queue_size, max_concurrent_sentences):
+        self.session_id = session_id
+        self.audio_play_queue = audio_play_queue
+        self.voice = voice
+        self.pending_texts = asyncio.Queue(maxsize=max_queue_size)
+        self.reorder = ReorderBuffer()
+        self.slots = asyncio.Semaphore(max_concurrent_sentences)  # 同时合成的句数
+        self.tasks = set()
+        self.released = False
+        self.closing = False  # worker已经退出，不再处理新的文本
+        self.worker = None
+        self.reply = None  # 当前这一轮回复的上游会话
+        self.next_reply = None  # 提前开启、还没有使用的上游会话
+
+
+class SentenceAudio:
+    """
+    一句文本的音频：pcm边收边编码，逐帧放入播放队列；其他格式每25段解码一次。
+    结束时没有收到任何音频也放入一个空的条目，播放线程照常发送句子开始/结束。
+    """
+
+    def __init__(self, provider, session, text_info):
+        self.provider = provider
+        self.session = session
+        self.text_info = text_info
+        self.remaining = normalize_text(text_info['text'])  # 还没有对应到服务端句子的部分
+        pcm = provider.audio_format == "pcm"
+        self.encoder = provider.stream_encoder(provider.audio_sample_rate) if pcm else None
+        self.payloads = []
+        self.started = False
+        self.finished = False
+
+    async def add(self, payload):
+        if self.encoder is not None:
+            for frame in self.encoder.encode(payload):
+                self.provider.put_frames(self.session, [frame], self.text_info, "continue" if self.started else "start")
+                self.started = True
+            return
+        self.payloads.append(payload)
+        if len(self.payloads) == 25:
+            await self.provider.send_payload(self.session, self.payloads, self.text_info)
+            self.payloads = []
+            self.started = True
+
+    async def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        try:
+            await self._flush()
+        finally:
+            # 这一句结束，缓存的后面几句的音频可以放入播放队列了
+            self.provider.end_sentence(self.session, self.text_info)
+
+    async def _flush(self):
+        if self.encoder is not None:
+            frames = self.encoder.flush()
+            if self.started:
+                self.provider.put_frames(self.session, frames, self.text_info, "end")
+                return
+        else:
+            if self.payloads:
+                await self.provider.send_payload(self.session, self.payloads, self.text_info)
+                return
+            if self.started:
+                return
+            frames = []
+        if not frames:
+            logger.bind(tag=TAG).warning(f"No audio data collected: {self.text_info['text']}")
+        self.provider.put_frames(self.session, frames, self.text_info)
+
+
+class TTSReply:
+    """
+    一轮回复共用的上游会话：每句文本作为一个TaskRequest发送，不等待上一句的音频。
+    服务端可能把一句拆成几句、或把几句合成一句，按句子开始时返回的文本把音频对应回各句的text_index。
+    """
+
+    def __init__(self, voice):
+        self.voice = voice
+        self.upstream = None
+        self.upstream_session_id = None
+        self.opened = None  # 开启上游会话的任务
+        self.opened_at = time.monotonic()
+        self.receiver = None
+        self.sentences = deque()  # 已经发送、音频还没有收完的句子
+        self.last_text_index = -1
+        self.finishing = False  # 已经发送（或不再需要发送）FinishSession，不再接收新的文本
+        self.current_text = None  # 服务端当前这一句去掉标点后的文本
+
+    def _pop_empty(self):
+        # 只有标点或表情的文本服务端不会合成
+        done = []
+        while self.sentences and not self.sentences[0].remaining and not self.sentences[0].started:
+            done.append(self.sentences.popleft())
+        return done
+
+    def sentence_start(self, text):
+        """服务端开始一句，返回不会有音频、可以直接结束的句子"""
+        self.current_text = normalize_text(text) if text is not None else None
+        return self._pop_empty()
+
+    def current(self):
+        return self.sentences[0] if self.sentences else None
+
+    def sentence_end(self):
+        """服务端一句结束，返回音频已经收完的句子"""
+        consumed = self.current_text
+        self.current_text = None
+        if consumed is None:
+            # 服务端没有返回句子文本时，按一个TaskRequest对应一句
+            return [self.sentences.popleft()] if self.sentences else []
+        done = []
+        while self.sentences and consumed:
+            head = self.sentences[0]
+            if head.remaining.startswith(consumed):
+                # 服务端把这一句拆成了几句
+                head.remaining = head.remaining[len(consumed):]
+                consumed = ""
+            elif consumed.startswith(head.remaining):
+                # 服务端把几句合成了一句，音频都算在第一句
+                consumed = consumed[len(head.remaining):]
+                head.remaining = ""
+            else:
+                # 文本对不上（服务端改写了文本）时认为这一句已经结束
+                head.remaining = ""
+                consumed = ""
+            if head.remaining:
+                break
+            done.append(self.sentences.popleft())
+        return done
+
+
 class TTSProvider(TTSProviderBase):
+    """
+    字节跳动双向流式TTS，一个实例由所有设备连接共用。每个设备连接通过acquire注册自己的播放队列，
+    各自按顺序合成，不同设备的句子在上游连接上同时进行（每条连接最多max_sessions_per_connection个会话，
+    都占满时新建连接，最多max_connections条），音频按会话放回对应设备的播放队列。
+    默认请求16kHz PCM，每收到一段音频就编码出完整的60ms Opus帧，逐帧放入播放队列。
+    session_per_reply时一轮回复的所有句子在同一个上游会话中合成，省去每句开启会话的往返；
+    否则每个设备最多同时合成max_concurrent_sentences句。各句的音频都经过ReorderBuffer按提交顺序放入播放队列。
+    """
+
+    stream_encoder = OpusStreamEncoder
+
     def __init__(self, config, delete_audio_file=False):
         super().__init__(config, delete_audio_file)
         self.config = config
@@ -277,34 +588,48 @@ class TTSProvider(TTSProviderBase):
         self.token = config.get("access_token")
         self.speaker = config.get("voice", "zh_female_shuangkuaisisi_moon_bigtts")
         self.voice = self.speaker
-        self.audio_format = config.get("audio_format", "mp3")
-        self.audio_sample_rate = config.get("audio_sample_rate", 24000)
+        # pcm：直接请求16kHz PCM，收到即编码为Opus；其他格式（如mp3）需要先解码
+        self.audio_format = config.get("audio_format", "pcm")
+        self.audio_sample_rate = config.get("audio_sample_rate", 16000)
+        if self.audio_format == "pcm" and self.audio_sample_rate != 16000:
+            logger.bind(tag=TAG).warning(f"pcm格式需要与Opus编码一致的16kHz采样率，忽略audio_sample_rate: {self.audio_sample_rate}")
+            self.audio_sample_rate = 16000
         self.url = config.get("url", "wss://openspeech.bytedance.com/api/v3/tts/bidirection")
-        self.session_manager = None
+        self.max_queue_size = config.get("max_queue_size", 100)  # 每个会话待合成文本的队列大小
+        self.max_sessions_per_connection = config.get("max_sessions_per_connection", 10)
+        self.max_connections = config.get("max_connections", 4)
+        self.session_timeout = config.get("session_timeout", 30)  # 上游会话多久没有响应视为失败（秒）
+        # 一轮回复的所有句子共用一个上游会话，否则每句开启一个会话
+        self.session_per_reply = config.get("session_per_reply", False)
+        # 设备说完话（acquire）时提前开启下一轮回复的上游会话，超过preopen_ttl秒没有使用则关闭
+        self.preopen_session = config.get("preopen_session", False)
+        self.preopen_ttl = config.get("preopen_ttl", 10)
+        # 超过reply_idle_timeout秒没有新的文本，结束这一轮回复的上游会话
+        self.reply_idle_timeout = config.get("reply_idle_timeout", 3)
+        # 每句一个上游会话时，每个设备最多同时合成的句数，音频仍按句子顺序播放
+        self.max_concurrent_sentences = max(1, int(config.get("max_concurrent_sentences", 3)))
         self.stop_event = threading.Event()
-        self.session_lock = threading.Lock()
-        self.text_audio_map = {}  # 存储文本和音频的对应关系
-        self.current_text_id = None  # 当前正在处理的文本ID
-        self.ws = None  # WebSocket 连接
-        self.session_id = None  # 会话ID
-        self.tts_queue = None  # 将由 connection.py 设置
-        self.audio_play_queue = None  # 将由 connection.py 设置
-        self.max_queue_size = config.get("max_queue_size", 100)  # 添加队列大小限制
-        self.pending_texts = asyncio.Queue(maxsize=self.max_queue_size)  # 设置队列最大大小
-        self.connection_ready = asyncio.Event()  # 用于标记连接是否就绪
-        # 初始化 WebSocket 连接, 这里我们在创建的时候就开始了链接， 后面可以优化一下， 只有在连接的时候才真的去建立连接。 
-        asyncio.create_task(self._init_connection())
-        asyncio.create_task(self._session_manager())
-
-    def set_tts_queue(self, tts_queue):
-        """设置从 connection.py 传递过来的 tts_queue"""
-        self.tts_queue = tts_queue
-        logger.bind(tag=TAG).info("TTS queue has been set from connection.py")
+        self.audio_play_queue = None  # 没有通过acquire注册的调用使用这个队列，由set_audio_play_queue设置
+        self.sessions = {}  # session_id -> TTSSession
+        # session_id -> 设备连接的播放队列，会话释放后仍能把迟到的句子放回对应的设备，连接销毁后自动移除
+        self.play_queues = weakref.WeakValueDictionary()
+        self.upstreams = [UpstreamConnection(self, 0)]
+        self._slots = asyncio.Condition()
+        self._connection_task = None
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # 在没有事件循环的线程中创建（如私有配置），第一次使用时再建立连接
+            pass
+        else:
+            # 创建时就建立第一条连接，首句不用等待建连
+            self._keep_connection()
 
     def set_audio_play_queue(self, audio_play_queue):
-        """设置从 connection.py 传递过来的 audio_play_queue"""
-        logger.bind(tag=TAG).info(f"Setting audio_play_queue: {audio_play_queue}")
+        """设置从 connection.py 传递过来的 audio_play_queue，用于没有通过acquire注册的调用"""
         self.audio_play_queue = audio_play_queue
+        if None in self.sessions:
+            self.sessions[None].audio_play_queue = audio_play_queue
         logger.bind(tag=TAG).info(f"Audio play queue has been set from connection.py, current value: {self.audio_play_queue}")
 
     def generate_filename(self):
@@ -312,21 +637,22 @@ class TTSProvider(TTSProviderBase):
         filename = f"bytedance_tts_{uuid.uuid4()}.{self.audio_format}"
         return os.path.join(self.output_file, filename)
 
+    def _keep_connection(self):
+        if self._connection_task is None:
+            self._connection_task = asyncio.create_task(self._init_connection())
+
     async def _init_connection(self):
-        """初始化 WebSocket 连接"""
+        """保持第一条 WebSocket 连接可用"""
         while not self.stop_event.is_set():
             try:
-                if not self.ws or self.ws.state == websockets.State.CLOSED:
-                    logger.bind(tag=TAG).info("Initializing WebSocket connection...")
-                    await self._init_websocket()
-                    self.connection_ready.set()
-                await asyncio.sleep(1)  # 定期检查连接状态
+                await self.upstreams[0].connect()
             except Exception as e:
                 logger.bind(tag=TAG).error(f"Error in connection initialization: {e}")
-                await asyncio.sleep(1)
+            await asyncio.sleep(1)  # 定期检查连接状态
 
     async def _init_websocket(self):
-        """初始化 WebSocket 连接"""
+        """建立一条 WebSocket 连接"""
+        ws = None
         try:
             ws_header = {
                 "X-Api-App-Key": self.app_id,
@@ -334,198 +660,411 @@ class TTSProvider(TTSProviderBase):
                 "X-Api-Resource-Id": 'volc.service_type.10029',
                 "X-Api-Connect-Id": str(uuid.uuid4()),
             }
-            logger.bind(tag=TAG).info(f"Connecting to {self.url} with headers: {ws_header}")
-            
+            logger.bind(tag=TAG).info(f"Connecting to {self.url}")
+
             # Connect without using async with
-            self.ws = await websockets.connect(
-                self.url, 
-                additional_headers=ws_header, 
+            ws = await websockets.connect(
+                self.url,
+                additional_headers=ws_header,
                 max_size=1000000000,
                 ping_interval=20,  # Add ping interval to keep connection alive
                 ping_timeout=20    # Add ping timeout
             )
-            
+
             # Start connection
-            await start_connection(self.ws)
-            res = parser_response(await self.ws.recv())
+            await start_connection(ws)
+            res = parser_response(await ws.recv())
             logger.bind(tag=TAG).info(f"Start connection response: {res.optional.__dict__}")
-            
+
             if res.optional.event != EVENT_ConnectionStarted:
                 raise RuntimeError(f"Start connection failed: {res.optional.__dict__}")
 
-                
-            return True
-            
+            return ws
+
         except Exception as e:
             logger.bind(tag=TAG).error(f"WebSocket initialization error: {e}")
-            if self.ws:
-                await self.ws.close()
-                self.ws = None
+            if ws:
+                await ws.close()
             raise e
 
-    async def _process_text(self, text_info):
-        """处理单个文本"""
+    async def _acquire_upstream(self):
+        """选择一条还能再开会话的连接，都占满时新建连接，连接数也到上限时等待其他会话结束"""
+        async with self._slots:
+            while True:
+                upstream = next(
+                    (u for u in self.upstreams if u.in_flight < self.max_sessions_per_connection), None
+                )
+                if upstream is None and len(self.upstreams) < self.max_connections:
+                    upstream = UpstreamConnection(self, len(self.upstreams))
+                    self.upstreams.append(upstream)
+                    logger.bind(tag=TAG).info(f"All connections are busy, open connection {upstream.index}")
+                if upstream is not None:
+                    upstream.in_flight += 1
+                    return upstream
+                await self._slots.wait()
+
+    async def _release_upstream(self, upstream):
+        async with self._slots:
+            upstream.in_flight -= 1
+            self._slots.notify()
+
+    async def _process_text(self, session, text_info):
+        """在一个上游会话中合成一句文本，音频放入该会话的播放队列"""
+        upstream = await self._acquire_upstream()
+        upstream_session_id = None
+        finished = False
         try:
-            start_time = datetime.now()
-            logger.bind(tag=TAG).debug(f"Starting _process_text at {start_time} for text_id: {text_info['text_id']}")
-            
-            # 确保连接有效
-            if not self.ws or self.ws.state == websockets.State.CLOSED:
-                self.connection_ready.clear()
-                await self._init_websocket()
-                self.connection_ready.set()
-            
-            # Start session
-            session_start_time = datetime.now()
-            self.session_id = uuid.uuid4().__str__().replace('-', '')
-            await start_session(self.ws, self.voice, self.session_id)
-            res = parser_response(await self.ws.recv())
-            logger.bind(tag=TAG).info(f"Session started in {(datetime.now() - session_start_time).total_seconds():.2f}s")
-            
-            if res.optional.event != EVENT_SessionStarted:
-                await finish_session(self.ws, self.session_id)
-                raise RuntimeError(f"Start session failed: {res.optional.__dict__}")
-            
-            # 发送文本
-            text_send_time = datetime.now()
-            await send_text(self.ws, self.voice, text_info['text'], self.session_id)
-            logger.bind(tag=TAG).debug(f"Text sent in {(datetime.now() - text_send_time).total_seconds():.2f}s")
-            
+            start_time = time.monotonic()
+            upstream_session_id = await upstream.start_session(session.voice)
+            logger.bind(tag=TAG).debug(f"Session started in {time.monotonic() - start_time:.2f}s")
+
+            await upstream.send_text(session.voice, text_info['text'], upstream_session_id)
             # 结束当前会话
-            await finish_session(self.ws, self.session_id)
+            await upstream.finish_session(upstream_session_id)
 
             # 处理音频数据
-            audio_process_start = datetime.now()
-            all_payloads = []
-            while True:
-                try:
-                    res = parser_response(await self.ws.recv())
-                    
+            sentence = SentenceAudio(self, session, text_info)
+            try:
+                while True:
+                    res = await upstream.recv(upstream_session_id)
                     if res.optional.event == EVENT_TTSResponse and res.header.message_type == AUDIO_ONLY_RESPONSE:
-                        all_payloads.append(res.payload)
-                        if len(all_payloads) == 25:
-                            self.send_payload(all_payloads, text_info)
-                            all_payloads = []
-                            continue
+                        await sentence.add(res.payload)
                     elif res.optional.event in [EVENT_TTSSentenceStart, EVENT_TTSSentenceEnd]:
                         continue
                     else:
                         break
-                except websockets.exceptions.ConnectionClosed:
-                    logger.bind(tag=TAG).error("WebSocket connection closed, attempting to reconnect...")
-                    self.connection_ready.clear()
-                    await self._init_websocket()
-                    self.connection_ready.set()
-                    continue
-
-            logger.bind(tag=TAG).debug(f"Audio processing took {(datetime.now() - audio_process_start).total_seconds():.2f}s")
+                finished = True
+            finally:
+                # 出错时也要结束这一句，播放线程才会发送句子结束
+                await sentence.finish()
 
-            if len(all_payloads) > 0:
-                self.send_payload(all_payloads, text_info)
-            
             if res.optional.event != EVENT_SessionFinished:
                 raise RuntimeError(f"Finish session failed: {res.optional.__dict__}")
-            
-            total_time = (datetime.now() - start_time).total_seconds()
-            logger.bind(tag=TAG).debug(f"Total processing time: {total_time:.2f}s for text_id: {text_info['text_id']}")
-                
+
+            logger.bind(tag=TAG).debug(
+                f"Total processing time: {time.monotonic() - start_time:.2f}s for text_id: {text_info['text_id']}"
+            )
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error processing text: {e}")
-            if isinstance(e, websockets.exceptions.ConnectionClosed):
-                self.connection_ready.clear()
+            if upstream_session_id and not finished and upstream.connected():
+                # 超时等情况下通知服务端结束会话，不再占用服务端资源
+                try:
+                    await upstream.finish_session(upstream_session_id)
+                except Exception:
+                    pass
+        finally:
+            if upstream_session_id:
+                upstream.end_session(upstream_session_id)
+            await self._release_upstream(upstream)
 
-    def send_payload(self, all_payloads, text_info):
-        """发送payload"""
+    def put_frames(self, session, opus_frames, text_info, stream=None):
+        """把一句话的部分音频放入该会话的播放队列，stream标记是这一句的start、continue还是end"""
+        item = (opus_frames, text_info['text'], text_info['text_index'])
+        self._put_items(session, session.reorder.put(text_info['text_id'], item if stream is None else item + (stream,)))
+
+    def end_sentence(self, session, text_info):
+        """一句的音频都已经放入（或合成失败），按顺序放入排在它后面的句子的音频"""
+        self._put_items(session, session.reorder.finish(text_info['text_id']))
+
+    def _put_items(self, session, items):
+        if not items:
+            return
+        if session.audio_play_queue is None:
+            logger.bind(tag=TAG).error(f"audio_play_queue of session {session.session_id} is None, cannot send audio packet")
+            return
+        for item in items:
+            session.audio_play_queue.put(item)
 
-        # 所有音频数据收集完成后，一次性转换为opus格式
-        opus_convert_start = datetime.now()
+    def decode_payloads(self, all_payloads):
+        """把收到的音频数据转换为opus帧"""
+        # 合并所有payload
+        combined_payload = b''.join(all_payloads)
+        pcm = decode_to_pcm16k(combined_payload, self.audio_format)
+        if pcm is not None:
+            opus_data, _ = self.pcm_to_opus_data(pcm)
+            return opus_data
+        # 没有可用的解码库时使用ffmpeg，将 MP3 数据转换为 PCM 数据
+        audio = AudioSegment.from_mp3(io.BytesIO(combined_payload))
+        # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
+        # 将音频数据转换为 opus 格式
+        opus_data, _ = self.audio_to_opus_data_directly(audio)
+        return opus_data
+
+    async def send_payload(self, session, all_payloads, text_info):
+        """发送payload"""
         all_opus_data = []
         if all_payloads:
             try:
-                # 合并所有payload
-                combined_payload = b''.join(all_payloads)
-                # 将 MP3 数据转换为 PCM 数据
-                audio = AudioSegment.from_mp3(io.BytesIO(combined_payload))
-                # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-                audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-                # 将音频数据转换为 opus 格式
-                opus_data, _ = self.audio_to_opus_data_directly(audio)
-                all_opus_data.extend(opus_data)
+                # 解码在线程中进行，不阻塞其他会话
+                all_opus_data = await asyncio.to_thread(self.decode_payloads, all_payloads)
             except Exception as e:
                 logger.bind(tag=TAG).error(f"Error processing combined audio data: {e}")
-        
-        logger.bind(tag=TAG).debug(f"Opus conversion took {(datetime.now() - opus_convert_start).total_seconds():.2f}s")
-        
-        # 发送到 audio_play_queue
-        queue_send_start = datetime.now()
-        if self.audio_play_queue is not None and all_opus_data:
-            self.audio_play_queue.put((all_opus_data, text_info['text'], text_info['text_index']))
-            logger.bind(tag=TAG).debug(f"Audio sent to play queue in {(datetime.now() - queue_send_start).total_seconds():.2f}s")
-        elif not all_opus_data:
-            logger.bind(tag=TAG).error("No audio data collected")
+
+        # 发送到该会话的 audio_play_queue
+        if all_opus_data:
+            self.put_frames(session, all_opus_data, text_info)
         else:
-            logger.bind(tag=TAG).error("audio_play_queue is None, cannot send audio packet")
+            logger.bind(tag=TAG).error("No audio data collected")
 
-    async def _session_manager(self):
-        """管理会话的进程"""
-        while not self.stop_event.is_set():
+    def _open_reply(self, session):
+        reply = TTSReply(session.voice)
+        reply.opened = asyncio.create_task(self._open_reply_session(reply))
+        return reply
+
+    async def _open_reply_session(self, reply):
+        upstream = await self._acquire_upstream()
+        try:
+            start_time = time.monotonic()
+            reply.upstream_session_id = await upstream.start_session(reply.voice)
+            reply.upstream = upstream
+            logger.bind(tag=TAG).debug(f"Reply session started in {time.monotonic() - start_time:.2f}s")
+        except BaseException:
+            await self._release_upstream(upstream)
+            raise
+
+    async def _close_reply(self, reply):
+        if reply.upstream_session_id is None:
+            return
+        reply.upstream.end_session(reply.upstream_session_id)
+        reply.upstream_session_id = None
+        await self._release_upstream(reply.upstream)
+
+    async def _discard_reply(self, reply):
+        """关闭一个提前开启但没有使用的上游会话"""
+        reply.finishing = True
+        try:
+            await reply.opened
+            await reply.upstream.finish_session(reply.upstream_session_id)
+        except Exception:
+            pass
+        finally:
+            await self._close_reply(reply)
+
+    def _preopen_reply(self, session):
+        reply = self._open_reply(session)
+        session.next_reply = reply
+
+        def expire():
+            if session.next_reply is reply:
+                session.next_reply = None
+                asyncio.create_task(self._discard_reply(reply))
+
+        asyncio.get_running_loop().call_later(self.preopen_ttl, expire)
+
+    def _start_reply(self, session):
+        """开始新的一轮回复，优先使用提前开启的上游会话"""
+        reply = session.next_reply
+        session.next_reply = None
+        if reply is None or reply.voice != session.voice:
+            if reply is not None:
+                asyncio.create_task(self._discard_reply(reply))
+            reply = self._open_reply(session)
+        previous = session.reply.receiver if session.reply else None
+        reply.receiver = asyncio.create_task(self._receive_reply(reply, previous))
+        session.reply = reply
+        return reply
+
+    async def _finish_reply(self, session):
+        """这一轮回复不会再有新的文本，发送FinishSession，服务端合成完剩余的句子后结束会话"""
+        reply = session.reply
+        if reply is None or reply.finishing:
+            return
+        reply.finishing = True
+        try:
+            await reply.opened
+            await reply.upstream.finish_session(reply.upstream_session_id)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"Finish reply session failed: {e}")
+
+    async def _speak_in_reply(self, session, text_info):
+        """把一句文本作为TaskRequest发送到这一轮回复的上游会话，音频由_receive_reply接收"""
+        for _ in range(2):
+            reply = session.reply
+            if reply is None or reply.finishing or text_info['text_index'] <= reply.last_text_index:
+                # text_index重新开始，是新的一轮回复
+                await self._finish_reply(session)
+                reply = self._start_reply(session)
+            try:
+                await reply.opened
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"Start reply session failed: {e}")
+                reply.finishing = True
+                continue
+            if reply.finishing:
+                # 等待期间上游会话已经出错结束
+                continue
+            reply.sentences.append(SentenceAudio(self, session, text_info))
+            reply.last_text_index = text_info['text_index']
             try:
-                # 等待连接就绪
-                await self.connection_ready.wait()             
-                # 获取待处理文本
-                text_info = await self.pending_texts.get()
-                # 处理文本
-                await self._process_text(text_info)
-                self.pending_texts.task_done()
-                
+                await reply.upstream.send_text(reply.voice, text_info['text'], reply.upstream_session_id)
             except Exception as e:
-                logger.bind(tag=TAG).error(f"Error in session manager: {e}")
-                if isinstance(e, websockets.exceptions.ConnectionClosed):
-                    self.connection_ready.clear()
+                # 连接断开，_receive_reply会结束已经发送的句子
+                logger.bind(tag=TAG).error(f"Send text to reply session failed: {e}")
+            return
+        # 无法开启上游会话时退回到单句合成
+        await self._process_text(session, text_info)
+
+    async def _receive_reply(self, reply, previous):
+        """接收一轮回复的音频，按服务端的句子开始/结束标记放入各句对应的播放条目"""
+        if previous is not None:
+            # 上一轮回复的音频都放入播放队列之后再放这一轮的，避免两轮的音频交错
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await reply.opened
+            while True:
+                res = await reply.upstream.recv(reply.upstream_session_id)
+                event = res.optional.event
+                if event == EVENT_TTSResponse and res.header.message_type == AUDIO_ONLY_RESPONSE:
+                    sentence = reply.current()
+                    if sentence is not None:
+                        await sentence.add(res.payload)
+                elif event == EVENT_TTSSentenceStart:
+                    for sentence in reply.sentence_start(sentence_text(res.payload)):
+                        await sentence.finish()
+                elif event == EVENT_TTSSentenceEnd:
+                    for sentence in reply.sentence_end():
+                        await sentence.finish()
+                elif event == EVENT_SessionFinished:
+                    break
+                else:
+                    raise RuntimeError(f"Unexpected response in reply session: {res.optional.__dict__}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error receiving reply audio: {e}")
+        finally:
+            finishing = reply.finishing
+            reply.finishing = True
+            if not finishing and reply.upstream_session_id is not None and reply.upstream.connected():
+                try:
+                    await reply.upstream.finish_session(reply.upstream_session_id)
+                except Exception:
+                    pass
+            # 结束还没有收完的句子，播放线程才会发送句子结束
+            while reply.sentences:
+                await reply.sentences.popleft().finish()
+            await self._close_reply(reply)
+
+    async def _synthesize(self, session, text_info):
+        try:
+            await self._process_text(session, text_info)
+        finally:
+            session.slots.release()
+            # 开启会话失败等情况下这一句没有结束标记，也不能挡住后面的句子
+            self.end_sentence(session, text_info)
+
+    async def _session_worker(self, session):
+        """按顺序处理一个会话的文本，会话释放且文本都处理完后退出"""
+        while not (session.released and session.pending_texts.empty()):
+            idle_timeout = None
+            if session.reply is not None and not session.reply.finishing:
+                idle_timeout = self.reply_idle_timeout
+            try:
+                text_info = await asyncio.wait_for(session.pending_texts.get(), idle_timeout)
+            except asyncio.TimeoutError:
+                # 一段时间没有新的文本
+                await self._finish_reply(session)
+                continue
+            if text_info is None:
                 continue
+            if text_info is FINISH_REPLY:
+                await self._finish_reply(session)
+                continue
+            session.reorder.add(text_info['text_id'])
+            try:
+                if self.session_per_reply:
+                    await self._speak_in_reply(session, text_info)
+                else:
+                    # 最多同时合成max_concurrent_sentences句，先合成完的句子在reorder中等待前面的句子
+                    await session.slots.acquire()
+                    task = asyncio.create_task(self._synthesize(session, text_info))
+                    session.tasks.add(task)
+                    task.add_done_callback(session.tasks.discard)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"Error in session worker: {e}")
+                self.end_sentence(session, text_info)
+        session.closing = True
+        await asyncio.gather(*session.tasks, return_exceptions=True)
+        await self._finish_reply(session)
+        if session.next_reply is not None:
+            await self._discard_reply(session.next_reply)
+            session.next_reply = None
+        if session.reply is not None:
+            # 等最后一轮回复的音频都放入播放队列
+            await asyncio.gather(session.reply.receiver, return_exceptions=True)
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
 
-    async def text_to_speak(self, text, text_index = 0, output_file=None):
+    def _new_session(self, session_id, audio_play_queue, voice):
+        self._keep_connection()
+        session = TTSSession(
+            session_id, audio_play_queue, voice or self.voice, self.max_queue_size, self.max_concurrent_sentences
+        )
+        session.worker = asyncio.create_task(self._session_worker(session))
+        self.sessions[session_id] = session
+        return session
+
+    def acquire(self, session_id, audio_play_queue, voice=None):
+        """注册一个设备连接，之后该session_id的音频都放入它自己的audio_play_queue"""
+        if session_id is not None and audio_play_queue is not None:
+            self.play_queues[session_id] = audio_play_queue
+        session = self.sessions.get(session_id)
+        if session is None or session.closing:
+            session = self._new_session(session_id, audio_play_queue, voice)
+        else:
+            session.audio_play_queue = audio_play_queue
+            if voice:
+                session.voice = voice
+        session.released = False
+        if self.session_per_reply and self.preopen_session and session_id is not None and session.next_reply is None:
+            # 设备说完话后识别和LLM首token还需要一段时间，提前开启上游会话，首句不用再等待
+            self._preopen_reply(session)
+        return session
+
+    async def release(self, session_id):
+        """释放会话，已经提交的文本合成完后再回收"""
+        session = self.sessions.get(session_id)
+        if session is None or session.released:
+            return
+        session.released = True
+        await session.pending_texts.put(None)
+
+    async def finish_reply(self, session_id):
+        """一轮回复的文本都已经送来，这些文本之后结束这一轮的上游会话"""
+        session = self.sessions.get(session_id)
+        if session is not None and self.session_per_reply:
+            await session.pending_texts.put(FINISH_REPLY)
+
+    def _get_session(self, session_id):
+        """返回(会话, 是否为这一句临时创建的会话)"""
+        session = self.sessions.get(session_id)
+        if session is not None and not session.closing:
+            return session, False
+        if session_id is None:
+            # 没有注册的调用（如私有配置单独创建的实例）使用set_audio_play_queue设置的队列
+            return self.acquire(None, self.audio_play_queue, self.voice), False
+        # 已经释放的设备连接（如对话结束后的函数调用回复）仍然放入它自己的播放队列，合成完这一句后回收
+        audio_play_queue = self.play_queues.get(session_id)
+        if audio_play_queue is None:
+            logger.bind(tag=TAG).warning(f"Session {session_id} is not acquired, use the default audio_play_queue")
+            audio_play_queue = self.audio_play_queue
+        return self._new_session(session_id, audio_play_queue, None), True
+
+    async def text_to_speak(self, text, text_index=0, output_file=None, session_id=None):
         """Convert text to speech using ByteDance TTS API"""
         try:
-            # 生成文本ID并记录对应关系
-            text_id = str(uuid.uuid4())
-            self.current_text_id = text_id
-            self.text_audio_map[text_id] = {
-                'text': text,
-                'text_index': text_index,
-                'status': 'processing'
-            }
-            
-            # 创建文本信息
+            session, temporary = self._get_session(session_id)
             text_info = {
-                'text_id': text_id,
+                'text_id': str(uuid.uuid4()),
                 'text': text,
                 'text_index': text_index,
                 'put_time': datetime.now()  # 记录放入队列的时间
             }
-            
-            logger.bind(tag=TAG).debug(f"Before put: {text} {datetime.now()}")
-            
-            # 如果text_index为1，直接处理
-            if text_index == 1:
-                # 确保在同一个event loop中执行
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    await self._process_text(text_info)
-                else:
-                    loop.run_until_complete(self._process_text(text_info))
-                return True
-            
-            # 检查队列是否已满
-            if self.pending_texts.full():
-                logger.bind(tag=TAG).warning("TTS queue is full, waiting for space...")
-                # 等待队列有空间
-                await asyncio.wait_for(self.pending_texts.put(text_info), timeout=30.0)
-            else:
-                # 直接放入队列
-                await self.pending_texts.put(text_info)
 
-            logger.bind(tag=TAG).debug(f"After put text at: {datetime.now()} - Text: {text}")
+            if session.pending_texts.full():
+                logger.bind(tag=TAG).warning("TTS queue is full, waiting for space...")
+            await asyncio.wait_for(session.pending_texts.put(text_info), timeout=30.0)
+            if temporary:
+                await self.release(session_id)
             return True
         except asyncio.TimeoutError:
             logger.bind(tag=TAG).error("Timeout while waiting to add text to queue")
@@ -534,14 +1073,30 @@ class TTSProvider(TTSProviderBase):
             logger.bind(tag=TAG).error(f"ByteDance TTS error: {e}")
             return False
 
-    def get_text_audio_map(self):
-        """获取文本和音频的对应关系"""
-        return self.text_audio_map
+    def set_voice(self, voice, session_id=None):
+        """Set the voice for TTS"""
+        session = self.sessions.get(session_id) if session_id is not None else None
+        if session is not None:
+            session.voice = voice or self.voice
+            # 提前开启的上游会话是旧的音色，使用时会重新开启
+        else:
+            self.voice = voice or self.speaker
 
-    def get_current_text_id(self):
-        """获取当前正在处理的文本ID"""
-        return self.current_text_id
+    def get_metrics(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "connections": [
+                {"connected": u.connected(), "in_flight": u.in_flight} for u in self.upstreams
+            ],
+        }
 
-    def set_voice(self, voice):
-        """Set the voice for TTS"""
-        self.voice = voice 
\ No newline at end of file
+    async def close(self):
+        """关闭所有连接"""
+        self.stop_event.set()
+        for session in self.sessions.values():
+            if session.worker:
+                session.worker.cancel()
+            for task in session.tasks:
+                task.cancel()
+        for upstream in self.upstreams:
+            await upstream.close()
@@ -1,16 +1,13 @@
 # 重构后的 VoiceprintProvider（核心部分）
 # 使用 SpeechBrain 的 ECAPA-TDNN 模型进行本地部署的说话人识别
 
-import io
-import wave
 import torch
 import numpy as np
 import torchaudio
-import opuslib_next
-from typing import List
 from speechbrain.inference.speaker import SpeakerRecognition
 from .base import VoiceprintProviderBase, logger
 from .storage import VoiceprintStorage
+from core.utils.utterance import Utterance
 import time
 import tempfile
 import os
@@ -90,20 +87,8 @@ class VoiceprintProvider(VoiceprintProviderBase):
     def _save_audio_to_temp(self, audio_data):
         """将音频数据保存为临时文件"""
         try:
-            # 合并所有opus数据包
-            pcm_data = self.decode_opus(audio_data, 0)
-            combined_pcm_data = b''.join(pcm_data)
-
-            wav_buffer = io.BytesIO()
-
-            with wave.open(wav_buffer, "wb") as wav_file:
-                wav_file.setnchannels(1)  # 设置声道数
-                wav_file.setsampwidth(2)  # 设置采样宽度
-                wav_file.setframerate(self.sample_rate)  # 设置采样率
-                wav_file.writeframes(combined_pcm_data)  # 写入 PCM 数据
-
-            # 获取封装后的 WAV 数据
-            wav_data = wav_buffer.getvalue()
+            # 复用整句已解码的PCM，不再重新解码Opus
+            wav_data = Utterance.ensure(audio_data).to_wav_bytes()
 
             # 创建临时文件
             temp_file = os.path.join(self.temp_dir, f"temp_{time.time()}.wav")
@@ -115,20 +100,6 @@ class VoiceprintProvider(VoiceprintProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"保存临时音频文件失败: {e}")
             return None
-        
-    def decode_opus(self, opus_data: List[bytes], session_id: str) -> List[bytes]:
-
-        decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
-        pcm_data = []
-
-        for opus_packet in opus_data:
-            try:
-                pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
-                pcm_data.append(pcm_frame)
-            except opuslib_next.OpusError as e:
-                logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
-
-        return pcm_data
 
     def _compare_audio_files(self, file1, file2):
         """比较两个音频文件的声纹相似度"""
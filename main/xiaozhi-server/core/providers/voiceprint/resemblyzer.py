@@ -7,6 +7,7 @@ from pathlib import Path
 import torch
 from .base import VoiceprintProviderBase, logger
 from .storage import VoiceprintStorage
+from core.utils.utterance import Utterance
 import time
 import io
 
@@ -26,8 +27,10 @@ class ResemblyzerVoiceprintProvider(VoiceprintProviderBase):
     def _preprocess_audio(self, audio_data):
         """预处理音频数据"""
         try:
-            if isinstance(audio_data, list):
-                audio_data = b''.join(audio_data)
+            # Opus数据包列表或Utterance：直接取整句已解码的PCM
+            if isinstance(audio_data, (list, Utterance)):
+                return Utterance.ensure(audio_data).pcm_float32
+
             
             # 确保数据长度是2的倍数
             if len(audio_data) % 2 != 0:
@@ -0,0 +1,21 @@
+from core.utils.micro_batch import MicroBatchQueue
+
+
+class ASRBatchScheduler(MicroBatchQueue):
+    """
+    跨连接的离线ASR批量调度器：
+    所有连接说完一句话后提交整句音频，调度器在很短的等待预算内（或凑满一批时）
+    把同时到达的语句合并成一次批量识别，完成后分别返回每句的识别结果。
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=30, max_concurrency=1):
+        # batch_fn(samples_list) -> 与输入一一对应的识别文本列表；
+        # max_concurrency交给工作池时与工作单元数一致
+        super().__init__(
+            batch_fn,
+            "ASR批量调度器",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_concurrency=max_concurrency,
+            thread_name_prefix="asr-batch",
+        )
@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 每个工作线程/进程各自持有的识别模型
+_worker = threading.local()
+
+
+def _init_worker(module_name, config):
+    """工作线程/进程启动时加载一次模型"""
+    module = importlib.import_module(module_name)
+    start_time = time.time()
+    _worker.module = module
+    _worker.model = module.load_model(config)
+    logger.bind(tag=TAG).info(
+        f"ASR工作单元模型加载完成, pid={os.getpid()}, thread={threading.current_thread().name}, "
+        f"耗时: {time.time() - start_time:.2f}s"
+    )
+
+
+def _run_batch(samples_list):
+    return _worker.module.recognize_batch(_worker.model, samples_list)
+
+
+def _ping(hold):
+    # 预热时每个任务占住工作单元一小段时间，保证每个工作单元都被创建出来
+    time.sleep(hold)
+    return os.getpid(), threading.get_ident()
+
+
+class ASRWorkerPool:
+    """
+    本地ASR工作池：
+    识别在独立的工作线程（onnxruntime、torch推理时会释放GIL）或工作进程中执行，每个工作单元启动时加载一次模型，
+    事件循环里只做await，长时间的CPU解码不会卡住其他连接的音频收发。
+    模块需要提供 load_model(config) 和 recognize_batch(model, samples_list) 两个模块级函数。
+    """
+
+    def __init__(self, module_name, config, workers=1, mode="thread", max_queue=0):
+        self.module_name = module_name
+        self.workers = max(1, int(workers))
+        self.mode = mode
+        # 排队的识别请求超过max_queue时认为识别服务已饱和
+        self.max_queue = max_queue if max_queue > 0 else self.workers * 4
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.total_infer_time = 0.0
+        self.ready = False
+
+        if mode == "process":
+            # 使用spawn启动子进程，避免fork时复制事件循环和推理线程的状态
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(module_name, config),
+            )
+        elif mode == "thread":
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="asr-worker",
+                initializer=_init_worker,
+                initargs=(module_name, config),
+            )
+        else:
+            raise ValueError(f"不支持的ASR工作池模式: {mode}")
+
+        self._preload()
+
+    def _preload(self):
+        """启动时把所有工作单元创建出来并加载好模型，避免第一句话承担加载耗时"""
+        start_time = time.time()
+        futures = [self.executor.submit(_ping, 0.05) for _ in range(self.workers)]
+        units = {future.result() for future in futures}
+        self.ready = True
+        logger.bind(tag=TAG).info(
+            f"ASR工作池已就绪, mode={self.mode}, workers={len(units)}/{self.workers}, "
+            f"耗时: {time.time() - start_time:.2f}s"
+        )
+
+    async def run_batch(self, samples_list):
+        """在工作池中识别一批音频，返回与输入顺序一致的文本列表"""
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.total_requests += 1
+        start_time = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, _run_batch, samples_list)
+        except Exception:
+            self.total_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_infer_time += time.perf_counter() - start_time
+
+    def get_health(self):
+        """工作池健康状态，供准入控制判断识别服务是否饱和"""
+        queue_depth = max(0, self.in_flight - self.workers)
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": queue_depth,
+            "saturated": queue_depth >= self.max_queue,
+        }
+
+    def get_metrics(self):
+        """获取工作池统计信息"""
+        return {
+            **self.get_health(),
+            "max_in_flight": self.max_in_flight,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "avg_latency": self.total_infer_time / self.total_requests if self.total_requests else 0,
+        }
+
+    def close(self):
+        self.ready = False
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,199 @@
+import io
+import os
+import struct
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 可选的进程内解码库：miniaudio（mp3/flac）、soundfile（libsndfile 1.1及以上支持mp3，另有flac/ogg），都没有时交给ffmpeg
+try:
+    import miniaudio
+except Exception:
+    miniaudio = None
+
+try:
+    import soundfile
+except Exception:
+    soundfile = None
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 重采样低通滤波器参数：每侧的过零点数、截止频率相对目标奈奎斯特频率的比例、Kaiser窗的beta（阻带约-80dB）
+ZERO_CROSSINGS = 16
+ROLLOFF = 0.945
+KAISER_BETA = 8.6
+
+
+def _read_source(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def _source_type(source, file_type):
+    if file_type:
+        return file_type.lower().lstrip(".")
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.splitext(source)[1].lower().lstrip(".")
+    return ""
+
+
+def decode_wav(data: bytes):
+    """
+    解析WAV（PCM 8/16/24/32位整数、32/64位浮点，以及WAVE_FORMAT_EXTENSIBLE），返回(float32样本[帧, 声道], 采样率)。
+    流式TTS返回的WAV经常把长度写成0或0xFFFFFFFF，data块长度不对时取到文件末尾。不支持的编码返回None。
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt_tag, channels, sample_rate = struct.unpack_from("<HHI", data, body)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            if fmt_tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                # 子格式GUID的前两个字节就是实际的编码
+                fmt_tag = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = (fmt_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            end = len(data) if size in (0, 0xFFFFFFFF) or body + size > len(data) else body + size
+            samples = _wav_samples(data[body:end], *fmt)
+            return None if samples is None else (samples, fmt[2])
+        offset = body + size + (size & 1)  # 块按偶数字节对齐
+    return None
+
+
+def _wav_samples(raw, fmt_tag, channels, sample_rate, bits):
+    if channels < 1 or sample_rate < 1:
+        return None
+    width = bits // 8
+    raw = raw[:len(raw) // (width * channels) * width * channels] if width else b""
+    if fmt_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif fmt_tag == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif fmt_tag == WAVE_FORMAT_PCM and bits == 24:
+        # 三个字节补到int32的高位再右移，保留符号
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((b[:, 0] << 8 | b[:, 1] << 16 | b[:, 2] << 24) >> 8).astype(np.float32) / 8388608
+    elif fmt_tag == WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    elif fmt_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(raw, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    else:
+        return None
+    return samples.reshape(-1, channels)
+
+
+def _decode_with_library(data, file_type):
+    """用可选的解码库解码mp3等压缩格式，返回(float32样本[帧, 声道], 采样率)，没有可用的库时返回None"""
+    if miniaudio is not None and file_type in ("mp3", "flac"):
+        try:
+            read = miniaudio.mp3_read_s16 if file_type == "mp3" else miniaudio.flac_read_s16
+            decoded = read(data)
+            samples = np.frombuffer(decoded.samples, dtype=np.int16).astype(np.float32) / 32768
+            return samples.reshape(-1, decoded.nchannels), decoded.sample_rate
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"miniaudio解码失败: {e}")
+    if soundfile is not None:
+        try:
+            samples, sample_rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            return samples, sample_rate
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"soundfile解码失败: {e}")
+    return None
+
+
+def decode_audio(source, file_type=None):
+    """
+    在进程内解码音频（文件路径或bytes），返回(float32样本[帧, 声道], 采样率)。
+    WAV直接解析，mp3等格式使用可选的解码库；无法在进程内解码时返回None，由调用方交给ffmpeg。
+    """
+    file_type = _source_type(source, file_type)
+    data = _read_source(source)
+    if data[:4] == b"RIFF":
+        decoded = decode_wav(data)
+        if decoded is not None:
+            return decoded
+    if file_type in ("wav", "wave", ""):
+        file_type = "mp3" if data[:3] == b"ID3" or data[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2") else file_type
+    return _decode_with_library(data, file_type)
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up, down):
+    """
+    按up倍上采样后的低通滤波器，拆成up个相位，返回(权重[相位, 抽头], 滤波器半长)。
+    截止频率取源和目标采样率中较低的奈奎斯特频率，乘以up补偿插零后的增益。
+    """
+    ratio = max(up, down)
+    half = ZERO_CROSSINGS * ratio
+    n = np.arange(-half, half + 1)
+    cutoff = ROLLOFF / ratio
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), KAISER_BETA) * up
+    taps = 2 * half // up + 1
+    # 相位r、第t个抽头对应滤波器下标 2*half - r - t*up，超出范围的为0
+    index = 2 * half - np.arange(up)[:, None] - np.arange(taps)[None, :] * up
+    weights = np.where(index >= 0, h[np.clip(index, 0, None)], 0.0)
+    return weights.astype(np.float32), half
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int = 16000) -> np.ndarray:
+    """
+    多相FIR重采样（单声道float32）：只计算需要输出的样本，每个输出样本只和对应相位的抽头相乘。
+    第m个和第m+up个输出样本使用同一个相位、输入窗口相差down个样本，因此每个相位的输出
+    是输入的一个跨步视图（不拷贝）与这一相位抽头的矩阵向量乘，不逐样本循环。
+    """
+    g = gcd(int(src_rate), int(dst_rate))
+    up, down = dst_rate // g, src_rate // g
+    if up == down:
+        return samples.astype(np.float32, copy=False)
+    weights, half = _polyphase_filter(up, down)
+    taps = weights.shape[1]
+    pad = half // up + 2
+    out_len = (len(samples) * up + down - 1) // down
+    padded = np.zeros(pad + len(samples) + taps + pad + down, dtype=np.float32)
+    padded[pad:pad + len(samples)] = samples
+    out = np.empty(out_len, dtype=np.float32)
+    stride = padded.strides[0]
+    for j in range(min(up, out_len)):
+        k = j * down  # 上采样后的位置
+        first = -((half - k) // up)  # 第一个落在滤波器范围内的输入样本
+        count = (out_len - j + up - 1) // up
+        window = np.lib.stride_tricks.as_strided(
+            padded[first + pad:], shape=(count, taps), strides=(down * stride, stride), writeable=False
+        )
+        out[j::up] = window @ weights[half - (k - first * up)]
+    return out
+
+
+def to_pcm16(samples: np.ndarray, sample_rate: int, target_rate: int = 16000) -> bytes:
+    """多声道样本混为单声道并重采样，返回16位小端PCM"""
+    if samples.ndim == 2 and samples.shape[1] > 1:
+        # 与等权向量相乘求平均，比mean(axis=1)在交错存放的多声道数据上快得多
+        mono = samples @ np.full(samples.shape[1], 1 / samples.shape[1], dtype=np.float32)
+    else:
+        mono = samples.reshape(-1)
+    mono = resample(mono, sample_rate, target_rate)
+    return np.clip(np.rint(mono * 32768), -32768, 32767).astype("<i2").tobytes()
+
+
+def decode_to_pcm16k(source, file_type=None):
+    """解码为16kHz单声道16位PCM，无法在进程内解码时返回None"""
+    decoded = decode_audio(source, file_type)
+    if decoded is None:
+        return None
+    return to_pcm16(*decoded)
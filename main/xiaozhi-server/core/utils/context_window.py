@@ -0,0 +1,182 @@
+import asyncio
+from functools import lru_cache
+from config.logger import setup_logging
+from core.providers.llm.base import LLMError
+
+TAG = __name__
+logger = setup_logging()
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+summary_prompt = """
+你是一个对话摘要助手。请把【之前的摘要】和【新的对话】合并成一段新的摘要，供后续对话参考：
+1. 保留用户提到的事实、偏好、待办事项和未解决的问题，以及助手已经给出的关键结论
+2. 去掉寒暄、重复和与后续对话无关的内容
+3. 使用第三人称、简洁的中文，不超过{max_chars}个字
+4. 只输出摘要本身，不要任何解释
+"""
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    估算文本的token数，结果按文本缓存，同一条消息每轮只在第一次出现时计算。
+    安装了tiktoken时使用cl100k_base编码；否则按中文每字一个token、其他字符约4个一个token估算。
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """从开头截掉超出预算的部分，保留最新的内容"""
+    if max_tokens <= 0 or count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high) // 2
+        if count_tokens(text[mid:]) <= max_tokens:
+            high = mid
+        else:
+            low = mid + 1
+    return text[low:]
+
+
+def dialogue_tokens(dialogue: list) -> int:
+    """发送给LLM的消息列表的token数"""
+    return sum(count_tokens(m.get("content") or "") + count_tokens(str(m.get("tool_calls") or "")) + 4 for m in dialogue)
+
+
+def message_tokens(message) -> int:
+    # 每条消息额外计入角色等格式开销
+    return count_tokens(message.content or "") + count_tokens(str(message.tool_calls or "")) + 4
+
+
+class ContextWindow:
+    """
+    按token预算截取对话历史：
+    从最新的一轮往前保留完整的对话轮次（一条用户消息及其后的回复、工具调用），直到用完预算；
+    放不下的旧轮次交给记忆使用的LLM在后台合并进一段滚动摘要，摘要随记忆一起放在请求末尾。
+    超出预算时一次截到预算的trim_ratio以下，之后几轮只在末尾追加，保证请求开头的字节不变，服务端的提示词缓存可以命中。
+    每轮请求的prompt token数记录在metrics中，长对话下应该保持平稳而不是持续增长。
+    """
+
+    def __init__(self, config: dict, get_llm=None):
+        """get_llm: 返回生成摘要所用LLM的函数，每次摘要时调用，切换私有配置后的LLM也能用上"""
+        self.max_tokens = config.get("max_tokens", 2000)
+        self.memory_max_tokens = config.get("memory_max_tokens", 500)
+        self.summary_max_tokens = config.get("summary_max_tokens", 300)
+        self.min_turns = config.get("min_turns", 1)
+        self.trim_ratio = config.get("trim_ratio", 0.7)
+        self.get_llm = get_llm
+        self.summary = ""
+        self.metrics = {
+            "last_prompt_tokens": 0,
+            "max_prompt_tokens": 0,
+            "last_history_turns": 0,
+            "dropped_turns": 0,
+            "summaries": 0,
+            "summary_tokens": 0,
+        }
+        self._summarized = set()  # 已经合并进摘要的消息
+        self._summarizing = set()  # 正在合并的消息
+        self._summary_task = None
+        self._start_id = None  # 当前保留的第一条消息
+
+    def trim_memory(self, memory_str: str) -> str:
+        return trim_to_tokens(memory_str, self.memory_max_tokens)
+
+    def select(self, prompt_text: str, messages: list) -> list:
+        """
+        返回预算内需要发送的历史消息，超出预算的旧轮次安排后台摘要。
+        prompt_text: 历史之外的提示词（系统提示词、记忆、摘要等），先从预算中扣除
+        """
+        turns = []
+        for m in messages:
+            if m.uniq_id in self._summarized:
+                continue
+            if m.role == "user" or not turns:
+                turns.append([])
+            turns[-1].append(m)
+
+        # 从上次保留的第一轮开始，预算内不移动起点
+        start = next((i for i, turn in enumerate(turns) if turn[0].uniq_id == self._start_id), 0)
+        turn_tokens = [sum(message_tokens(m) for m in turn) for turn in turns]
+        system_tokens = count_tokens(prompt_text) + 4
+        budget = self.max_tokens - system_tokens
+        used = sum(turn_tokens[start:])
+        keep = len(turns) - start
+        if used > budget:
+            # 超出预算，截到预算的trim_ratio以下，留出后面几轮追加的空间
+            budget = int(budget * self.trim_ratio)
+            used = 0
+            keep = 0
+            for tokens in reversed(turn_tokens):
+                if keep >= self.min_turns and used + tokens > budget:
+                    break
+                used += tokens
+                keep += 1
+        if keep:
+            self._start_id = turns[len(turns) - keep][0].uniq_id
+
+        dropped = turns[:len(turns) - keep]
+        if dropped:
+            self._schedule_summary([m for turn in dropped for m in turn])
+
+        prompt_tokens = system_tokens + used
+        self.metrics["last_prompt_tokens"] = prompt_tokens
+        self.metrics["max_prompt_tokens"] = max(self.metrics["max_prompt_tokens"], prompt_tokens)
+        self.metrics["last_history_turns"] = keep
+        return [m for turn in turns[len(turns) - keep:] for m in turn]
+
+    def _schedule_summary(self, messages):
+        pending = [m for m in messages if m.uniq_id not in self._summarizing]
+        if not pending or self.get_llm is None or (self._summary_task and not self._summary_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._summarizing.update(m.uniq_id for m in pending)
+        self._summary_task = loop.create_task(self._summarize(pending))
+
+    async def _summarize(self, messages):
+        lines = []
+        for m in messages:
+            if m.role == "user":
+                lines.append(f"用户：{m.content}")
+            elif m.role == "assistant" and m.content:
+                lines.append(f"助手：{m.content}")
+            elif m.role == "tool":
+                lines.append(f"工具结果：{m.content}")
+        user_prompt = f"【之前的摘要】\n{self.summary or '无'}\n\n【新的对话】\n" + "\n".join(lines)
+        try:
+            llm = self.get_llm()
+            if llm is None:
+                raise RuntimeError("没有可用的LLM")
+            summary = await llm.response_no_stream(
+                summary_prompt.format(max_chars=self.summary_max_tokens), user_prompt
+            )
+            if not summary or isinstance(summary, LLMError):
+                raise RuntimeError(summary)
+            self.summary = trim_to_tokens(summary.strip(), self.summary_max_tokens)
+            self._summarized.update(m.uniq_id for m in messages)
+            self.metrics["dropped_turns"] += sum(1 for m in messages if m.role == "user")
+            self.metrics["summaries"] += 1
+            self.metrics["summary_tokens"] = count_tokens(self.summary)
+            logger.bind(tag=TAG).info(f"对话摘要已更新，合并{len(messages)}条消息，摘要token数: {self.metrics['summary_tokens']}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"生成对话摘要失败: {e}")
+        finally:
+            self._summarizing.difference_update(m.uniq_id for m in messages)
+
+    def get_metrics(self) -> dict:
+        return dict(self.metrics)
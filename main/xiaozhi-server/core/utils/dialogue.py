@@ -2,6 +2,10 @@ import uuid
 from typing import List, Dict
 from datetime import datetime
 
+# 易变上下文放在请求末尾的用户消息前面，标明不是用户说的话
+CONTEXT_HEADER = "【背景信息，不是用户说的话】\n"
+USER_HEADER = "\n\n【用户】\n"
+
 
 class Message:
     def __init__(self, role: str, content: str = None, uniq_id: str = None, tool_calls = None, tool_call_id=None, metadata=None):
@@ -17,6 +21,10 @@ class Dialogue:
     def __init__(self):
         self.dialogue: List[Message] = []
         self.metadata = {}  # 添加元数据存储
+        # 按token预算截取历史的上下文窗口，未设置时发送全部历史
+        self.window = None
+        # 易变的会话上下文，名称 -> 内容
+        self.context = {}
         # 获取当前时间
         self.current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -54,33 +62,94 @@ class Dialogue:
         else:
             self.put(Message(role="system", content=new_content))
 
-    def get_llm_dialogue_with_memory(self, memory_str: str = None) -> List[Dict[str, str]]:
-        if memory_str is None or len(memory_str) == 0:
-            return self.get_llm_dialogue()
-        
-        # 构建带记忆的对话
-        dialogue = []
-        
-        # 添加系统提示和记忆
+    def set_context(self, name: str, content: str):
+        """设置会话的易变上下文（位置、智能设备等），放在请求末尾，不影响固定前缀"""
+        if content:
+            self.context[name] = content
+        else:
+            self.context.pop(name, None)
+
+    def get_stable_system_prompt(self):
+        """固定前缀中的系统提示词：只包含角色提示词和固定的回答要求，每轮字节完全相同"""
         system_message = next(
             (msg for msg in self.dialogue if msg.role == "system"), None
         )
+        if system_message is None:
+            return None
+        return (
+            f"{system_message.content}\n\n"
+            f"回答问题时候，一定注意！注意！注意！注意！注意！第一个标点符号不要超过第四个字符！也就是说用1到4个字来开始回答问题！\n"
+        )
 
+    def get_volatile_context(self, memory_str: str = None) -> str:
+        """每轮都可能变化的上下文：记忆、历史摘要、位置等会话信息和当前时间；没有记忆、摘要和会话信息时返回空字符串"""
+        sections = []
+        if memory_str:
+            if self.window is not None:
+                memory_str = self.window.trim_memory(memory_str)
+            sections.append(f"相关记忆：\n{memory_str}".replace("'", "\""))
+        if self.window is not None and self.window.summary:
+            sections.append(f"之前对话的摘要：\n{self.window.summary}")
+        sections.extend(self.context.values())
+        if not sections:
+            return ""
+        sections.append(f"当前时间：{datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        return "\n\n".join(sections)
+
+    def get_llm_dialogue_with_memory(self, memory_str: str = None, pending_query: str = None) -> List[Dict[str, str]]:
+        """
+        按服务端提示词缓存友好的顺序组装请求：
+        固定前缀（系统提示词，加上请求里的函数定义）→ 对话历史（只在末尾追加）→ 易变内容，
+        记忆、位置、时间等易变内容只加在请求的最后一条消息上，前面的消息不被改写，每轮保持不变，可以命中缓存。
+        没有易变内容时与不带记忆的get_llm_dialogue相同。
+        pending_query: 还没有放入历史的用户消息（提前发起的请求）
+        """
+        volatile = self.get_volatile_context(memory_str)
+        if not volatile:
+            return self._get_plain_dialogue(pending_query)
+
+        # 带记忆时不发送工具调用的中间消息
+        if memory_str:
+            history = [m for m in self.dialogue if self._is_history_message(m)]
+        else:
+            history = [m for m in self.dialogue if m.role != "system"]
 
-        if system_message:
-            enhanced_system_prompt = (
-                f"{system_message.content}\n\n"
-                f"回答问题时候，一定注意！注意！注意！注意！注意！第一个标点符号不要超过第四个字符！也就是说用1到4个字来开始回答问题！\n\n"
-                f"相关记忆：\n{memory_str}\n\n"               
-            )
+        dialogue = []
+        system_prompt = self.get_stable_system_prompt()
+        if system_prompt is not None:
+            dialogue.append({"role": "system", "content": system_prompt})
+
+        context = CONTEXT_HEADER + volatile
+        if self.window is not None:
+            # 系统提示词和用户消息前面的上下文一起从预算中扣除
+            history = self.window.select((system_prompt or "") + context + USER_HEADER, history)
+        for m in history:
+            self.getMessages(m, dialogue)
+        if pending_query is not None:
+            dialogue.append({"role": "user", "content": pending_query})
 
-            enhanced_system_prompt = enhanced_system_prompt.replace("'", "\"")
-            dialogue.append({"role": "system", "content": enhanced_system_prompt})
+        if dialogue and dialogue[-1]["role"] == "user":
+            dialogue[-1]["content"] = context + USER_HEADER + dialogue[-1]["content"]
+        else:
+            # 以工具结果等结尾时不改写更早的用户消息，单独放在末尾
+            dialogue.append({"role": "user", "content": context})
+        return dialogue
 
-        # 添加用户和助手的对话
-        for m in self.dialogue:
-            if m.role != "system" and m.role != "tool" and not (m.role == "assistant" and m.tool_calls is not None):  # 跳过原始的系统消息
+    def _get_plain_dialogue(self, pending_query=None):
+        """原样发送系统消息和全部历史（包括工具调用），开启上下文窗口时按预算截取历史"""
+        if self.window is None:
+            dialogue = self.get_llm_dialogue()
+        else:
+            system_message = next((m for m in self.dialogue if m.role == "system"), None)
+            history = [m for m in self.dialogue if m.role != "system"]
+            history = self.window.select(system_message.content if system_message else "", history)
+            dialogue = []
+            for m in ([system_message] if system_message else []) + history:
                 self.getMessages(m, dialogue)
-
+        if pending_query is not None:
+            dialogue.append({"role": "user", "content": pending_query})
         return dialogue
 
+    @staticmethod
+    def _is_history_message(m):
+        return m.role != "system" and m.role != "tool" and not (m.role == "assistant" and m.tool_calls is not None)
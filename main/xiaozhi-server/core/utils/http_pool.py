@@ -0,0 +1,122 @@
+import asyncio
+import weakref
+import urllib.request
+from urllib.parse import urlsplit
+
+import httpx
+import openai
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 连接池参数：同一个服务地址的所有请求共用长连接
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+CONNECT_TIMEOUT = 5
+# 流式响应两个分片之间的最长等待时间
+READ_TIMEOUT = 60
+# 关闭响应时读完剩余内容的时间上限
+DRAIN_TIMEOUT = 0.05
+DRAIN_MAX_BYTES = 64 * 1024
+
+# 事件循环 -> {key: client}；连接池绑定在创建它的事件循环上，不能跨事件循环使用
+_clients = weakref.WeakKeyDictionary()
+
+
+def _origin(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class _DrainOnCloseStream(httpx.AsyncByteStream):
+    """
+    SDK收到流式响应的结束标记[DONE]后直接关闭响应，此时还没读到响应体的结尾（分块编码的结束块），
+    httpx会断开这条连接而不是放回连接池，每次请求都要重新建连。
+    关闭时先在很短的时间内把剩余内容读完，读完的连接回到连接池复用；
+    中途打断时上游还在持续输出，超过时间或长度上限就直接断开，不继续消耗token。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def _drain(self):
+        size = 0
+        async for chunk in self._stream:
+            size += len(chunk)
+            if size > DRAIN_MAX_BYTES:
+                break
+
+    async def aclose(self):
+        try:
+            await asyncio.wait_for(self._drain(), DRAIN_TIMEOUT)
+        except Exception:
+            pass
+        await self._stream.aclose()
+
+
+class _KeepAliveTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        response = await super().handle_async_request(request)
+        response.stream = _DrainOnCloseStream(response.stream)
+        return response
+
+
+def _env_proxy(base_url: str):
+    """没有显式配置代理时沿用环境变量中的代理设置"""
+    parts = urlsplit(base_url)
+    if urllib.request.proxy_bypass(parts.hostname or ""):
+        return None
+    return urllib.request.getproxies().get(parts.scheme)
+
+
+def _loop_clients() -> dict:
+    return _clients.setdefault(asyncio.get_running_loop(), {})
+
+
+def get_http_client(base_url: str, proxy: str = None) -> httpx.AsyncClient:
+    """获取服务地址共享的异步HTTP客户端（同一个scheme://host:port共用一个连接池），需在事件循环中调用"""
+    clients = _loop_clients()
+    key = ("http", _origin(base_url), proxy or None)
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        transport = _KeepAliveTransport(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            proxy=proxy or _env_proxy(base_url),
+        )
+        client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        clients[key] = client
+        logger.bind(tag=TAG).info(f"创建共享HTTP连接池: {key[1]}")
+    return client
+
+
+def get_openai_client(base_url: str, api_key: str) -> openai.AsyncOpenAI:
+    """OpenAI兼容接口的异步客户端，底层使用服务地址共享的连接池，不同模型、不同密钥共用连接"""
+    clients = _loop_clients()
+    http_client = get_http_client(base_url)
+    key = ("openai", base_url, api_key)
+    client = clients.get(key)
+    if client is None or client._client is not http_client:
+        client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        clients[key] = client
+    return client
+
+
+async def close_all():
+    """关闭当前事件循环上的所有共享连接池"""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for key, client in clients.items():
+        if key[0] == "http":
+            await client.aclose()
@@ -0,0 +1,60 @@
+import bisect
+import threading
+
+
+def _bucket_bounds(low: float = 0.01, high: float = 60.0, ratio: float = 1.2):
+    bounds = []
+    bound = low
+    while bound < high:
+        bounds.append(round(bound, 4))
+        bound *= ratio
+    bounds.append(high)
+    return bounds
+
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """
+    延迟直方图（秒），按对数间隔分桶，记录和查询分位数都是常数时间。
+    每记录decay_every个样本，所有计数减半，让分位数跟随服务最近的表现变化。
+    """
+
+    def __init__(self, decay_every: int = 500):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self.samples = 0
+        self.decay_every = decay_every
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        index = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.samples += 1
+            if self.decay_every and self.samples % self.decay_every == 0:
+                self.counts = [c // 2 for c in self.counts]
+                self.total = sum(self.counts)
+
+    def percentile(self, p: float):
+        """返回第p百分位所在桶的上界，没有样本时返回None"""
+        with self._lock:
+            if self.total == 0:
+                return None
+            target = self.total * p / 100
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= target:
+                    return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+    def get_metrics(self) -> dict:
+        return {
+            "samples": self.samples,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MicroBatchQueue:
+    """
+    跨连接的微批队列：
+    收集所有连接提交的请求，从第一个请求到达开始计时，在很短的等待预算内（或凑满一批时）
+    合并成一次批量计算，完成后把结果分别返回给每个提交者。VAD批量推理和ASR批量识别共用。
+    """
+
+    def __init__(self, batch_fn, name, max_batch_size=8, max_wait_ms=10, max_concurrency=1, thread_name_prefix="micro-batch"):
+        # batch_fn(items) -> 与输入一一对应的结果列表；
+        # 普通函数在队列自己的工作线程中执行，协程函数（如ASR工作池）直接await
+        self._batch_fn = batch_fn
+        self._batch_is_async = asyncio.iscoroutinefunction(batch_fn)
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        # 同时在计算中的批次数，为1时上一批完成后才取下一批
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._pending = []
+        self._has_work = None
+        self._batch_full = None
+        self._slots = None
+        self._task = None
+        self._loop = None
+        # 单线程执行计算，避免多个批次争抢GIL和计算核心
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name_prefix)
+
+        # 统计信息
+        self.total_batches = 0
+        self.total_items = 0
+        self.max_seen_batch = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_infer_time = 0.0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._has_work = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._task = loop.create_task(self._run())
+        logger.bind(tag=TAG).info(
+            f"{self.name}已启动, max_batch_size={self.max_batch_size}, max_wait={self.max_wait * 1000:.1f}ms"
+        )
+
+    async def submit(self, item):
+        """提交一个请求，等待批量计算返回它的结果"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        self._has_work.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._has_work.wait()
+            # 从第一个请求到达开始计时，等待预算用完或凑满一批就开始计算
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            # 等到有空闲的计算单元再取批次，等待期间到达的请求可以并入这一批
+            await self._slots.acquire()
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            self._batch_full.clear()
+            if not self._pending:
+                self._has_work.clear()
+            elif len(self._pending) >= self.max_batch_size:
+                self._batch_full.set()
+
+            # 调用方可能已经取消等待
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        start_time = time.perf_counter()
+        for _, _, submit_time in batch:
+            wait_time = start_time - submit_time
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+        try:
+            items = [entry[0] for entry in batch]
+            if self._batch_is_async:
+                results = await self._batch_fn(items)
+            else:
+                results = await self._loop.run_in_executor(self._executor, self._batch_fn, items)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"{self.name}执行失败: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self.total_infer_time += time.perf_counter() - start_time
+        self.total_batches += 1
+        self.total_items += len(batch)
+        self.max_seen_batch = max(self.max_seen_batch, len(batch))
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_metrics(self):
+        """获取批量计算统计信息"""
+        return {
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_queue_depth,
+            "total_batches": self.total_batches,
+            "total_items": self.total_items,
+            "avg_batch_size": self.total_items / self.total_batches if self.total_batches else 0,
+            "max_batch_size": self.max_seen_batch,
+            "avg_wait_time": self.total_wait_time / self.total_items if self.total_items else 0,
+            "max_wait_time": self.max_wait_time,
+            "avg_infer_time": self.total_infer_time / self.total_batches if self.total_batches else 0,
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, future, _ in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,40 @@
+import opuslib_next
+
+
+class OpusStreamEncoder:
+    """
+    16位单声道PCM的增量Opus编码：每次送入任意长度的PCM（可以在样本中间断开），立即编码出其中完整的帧，
+    不足一帧的部分留到下一次，flush时补零编码最后一帧。与audio_to_opus_data_directly的分帧方式一致。
+    """
+
+    def __init__(self, sample_rate=16000, frame_duration=60):
+        self.frame_size = sample_rate * frame_duration // 1000  # 每帧的样本数
+        self.frame_bytes = self.frame_size * 2
+        self.encoder = opuslib_next.Encoder(sample_rate, 1, opuslib_next.APPLICATION_AUDIO)
+        self.pending = bytearray()
+
+    def encode_frame(self, frame: bytes) -> bytes:
+        return self.encoder.encode(frame, self.frame_size)
+
+    def encode(self, pcm: bytes) -> list:
+        """送入一段PCM，返回已经凑满的Opus帧"""
+        self.pending.extend(pcm)
+        count = len(self.pending) // self.frame_bytes
+        if not count:
+            return []
+        view = memoryview(self.pending)
+        frames = [
+            self.encode_frame(bytes(view[i * self.frame_bytes:(i + 1) * self.frame_bytes])) for i in range(count)
+        ]
+        view.release()
+        del self.pending[:count * self.frame_bytes]
+        return frames
+
+    def flush(self) -> list:
+        """编码剩余不足一帧的PCM（补零），没有剩余时返回空列表"""
+        if len(self.pending) < 2:
+            self.pending.clear()
+            return []
+        frame = bytes(self.pending[:len(self.pending) // 2 * 2])
+        self.pending.clear()
+        return [self.encode_frame(frame + b'\x00' * (self.frame_bytes - len(frame)))]
@@ -0,0 +1,104 @@
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+from config.logger import setup_logging
+from core.utils.context_window import count_tokens
+
+TAG = __name__
+logger = setup_logging()
+
+
+@dataclass
+class ParallelIntentMetrics:
+    turns: int = 0  # 意图识别与对话同时开始的轮数
+    chat_turns: int = 0  # 意图为继续聊天，对话响应被采用
+    function_turns: int = 0  # 识别到函数意图，对话被取消
+    saved_time: float = 0.0  # 与先识别意图再开始对话相比，首句语音提前的累计时间(秒)
+    wasted_prompt_tokens: int = 0  # 被取消的对话请求的prompt token数
+    wasted_completion_tokens: int = 0  # 被取消的对话请求已经生成的token数
+
+
+class ParallelIntentStats:
+    """全局的意图识别并行统计，所有连接共用"""
+
+    def __init__(self):
+        self.metrics = ParallelIntentMetrics()
+        self._lock = threading.Lock()
+
+    def record_chat(self, saved_time: float):
+        with self._lock:
+            self.metrics.turns += 1
+            self.metrics.chat_turns += 1
+            self.metrics.saved_time += saved_time
+
+    def record_function(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.metrics.turns += 1
+            self.metrics.function_turns += 1
+            self.metrics.wasted_prompt_tokens += prompt_tokens
+            self.metrics.wasted_completion_tokens += completion_tokens
+
+    def get_metrics(self) -> dict:
+        """获取意图识别并行统计信息"""
+        m = self.metrics
+        return {
+            "turns": m.turns,
+            "chat_turns": m.chat_turns,
+            "function_turns": m.function_turns,
+            "avg_saved_time": m.saved_time / m.chat_turns if m.chat_turns else 0,
+            "wasted_prompt_tokens": m.wasted_prompt_tokens,
+            "wasted_completion_tokens": m.wasted_completion_tokens,
+        }
+
+
+parallel_intent_stats = ParallelIntentStats()
+
+
+class IntentGate:
+    """
+    意图识别与对话同时进行时的闸门：对话的LLM请求和意图识别同时发起，
+    对话在送出第一句TTS之前等待意图识别的结果，继续聊天则放行，识别到函数意图则取消对话，不会有任何语音输出。
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.resolved_time = None
+        self.first_segment_time = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._future = asyncio.get_running_loop().create_future()
+
+    def add_output(self, content: str):
+        """记录对话已经生成的内容，被取消时计入浪费的token"""
+        self.completion_tokens += count_tokens(content)
+
+    @property
+    def continue_chat(self):
+        """意图识别的结果：True继续聊天，False识别到函数意图，还没有结果时为None"""
+        return self._future.result() if self._future.done() else None
+
+    async def wait(self) -> bool:
+        """对话的第一句准备送TTS时调用，返回是否继续对话"""
+        if self.first_segment_time is None:
+            self.first_segment_time = time.time()
+        return await asyncio.shield(self._future)
+
+    def resolve(self, continue_chat: bool):
+        if self._future.done():
+            return
+        self.resolved_time = time.time()
+        self._future.set_result(continue_chat)
+        intent_time = self.resolved_time - self.start_time
+        if continue_chat:
+            # 先识别意图时首句时间 = 意图耗时 + 对话首句耗时，并行时为两者中较大的一个，差值即两者中较小的一个
+            chat_time = (self.first_segment_time or self.resolved_time) - self.start_time
+            saved_time = min(intent_time, chat_time)
+            parallel_intent_stats.record_chat(saved_time)
+            logger.bind(tag=TAG).debug(f"意图为继续聊天，意图识别耗时: {intent_time:.3f}s, 首句提前: {saved_time:.3f}s")
+        else:
+            parallel_intent_stats.record_function(self.prompt_tokens, self.completion_tokens)
+            logger.bind(tag=TAG).debug(
+                f"识别到函数意图，取消对话，意图识别耗时: {intent_time:.3f}s, "
+                f"浪费token: prompt={self.prompt_tokens}, completion={self.completion_tokens}"
+            )
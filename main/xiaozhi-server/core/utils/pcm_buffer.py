@@ -0,0 +1,89 @@
+import numpy as np
+import opuslib_next
+
+
+class PCMRingBuffer:
+    """
+    固定容量的float32 PCM环形缓冲区：
+    Opus解码器直接把样本写进缓冲区，读取时返回缓冲区上的视图，整个过程不产生中间拷贝。
+    写到末尾放不下时，把未读数据和保留的历史音频挪回开头继续写（每隔十几个包才发生一次，且数据量很小），
+    这样读出的每个音频块在内存里总是连续的，可以直接交给模型。
+    读出的视图在下一次写入前有效。
+    """
+
+    def __init__(self, capacity=16384, history=2880):
+        # history: 已读之后仍保留的样本数，供tail取回最近写入的音频
+        if capacity < history * 2:
+            raise ValueError(f"缓冲区容量过小: capacity={capacity}, history={history}")
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.history = history
+        self.read_pos = 0
+        self.write_pos = 0
+
+    def __len__(self):
+        """尚未读取的样本数"""
+        return self.write_pos - self.read_pos
+
+    def _ensure_space(self, n):
+        if self.write_pos + n <= self.capacity:
+            return
+        start = min(self.read_pos, max(0, self.write_pos - self.history))
+        keep = self.write_pos - start
+        if keep + n > self.capacity:
+            # 未读数据过多（消费方长时间未读取），丢弃最旧的数据
+            start = self.write_pos - (self.capacity - n)
+            keep = self.capacity - n
+        self.buffer[:keep] = self.buffer[start:self.write_pos]
+        self.read_pos = max(0, self.read_pos - start)
+        self.write_pos = keep
+
+    def writable(self, n):
+        """返回可写入n个样本的连续视图，写入后需调用commit"""
+        self._ensure_space(n)
+        return self.buffer[self.write_pos:self.write_pos + n]
+
+    def commit(self, n):
+        self.write_pos += n
+
+    def write(self, samples):
+        """写入一段float32样本"""
+        n = len(samples)
+        self.writable(n)[:] = samples
+        self.commit(n)
+
+    def decode_into(self, decoder, opus_packet, frame_size=960):
+        """用Opus解码器把一个数据包直接解码进缓冲区，返回解码出的样本数"""
+        target = self.writable(frame_size)
+        result = opuslib_next.api.decoder.libopus_decode_float(
+            decoder.decoder_state,
+            opus_packet,
+            len(opus_packet),
+            target.ctypes.data_as(opuslib_next.api.c_float_pointer),
+            frame_size,
+            0,
+        )
+        if result < 0:
+            raise opuslib_next.OpusError(result)
+        self.commit(result)
+        return result
+
+    def read(self, n):
+        """读取n个样本，返回缓冲区上的视图；不足n个时返回None"""
+        if self.write_pos - self.read_pos < n:
+            return None
+        view = self.buffer[self.read_pos:self.read_pos + n]
+        self.read_pos += n
+        return view
+
+    def tail(self, n):
+        """最近写入的n个样本（不足时返回全部已保留的样本），不影响读取位置"""
+        return self.buffer[max(0, self.write_pos - n):self.write_pos]
+
+    def skip(self):
+        """丢弃所有未读数据，保留历史音频"""
+        self.read_pos = self.write_pos
+
+    def clear(self):
+        self.read_pos = 0
+        self.write_pos = 0
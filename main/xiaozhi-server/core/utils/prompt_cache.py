@@ -0,0 +1,90 @@
+import json
+import hashlib
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PromptPrefix:
+    """
+    会话的固定前缀：系统提示词和函数定义，每轮请求都按相同的字节发送，服务端的提示词缓存才能命中。
+    只在内容变化（首次请求、切换角色、MCP工具加载完成等）时重新计算哈希并打印，便于在日志中核对前缀是否稳定。
+    """
+
+    def __init__(self):
+        self.hash = None
+        self.changes = 0
+        self._key = None
+
+    def update(self, session_id, system_prompt, functions=None) -> str:
+        key = (system_prompt, id(functions), len(functions or []))
+        if key == self._key:
+            return self.hash
+        self._key = key
+        payload = json.dumps({"system": system_prompt, "tools": functions or []}, ensure_ascii=False, sort_keys=True)
+        prefix_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        if prefix_hash != self.hash:
+            if self.hash is not None:
+                self.changes += 1
+                logger.bind(tag=TAG).warning(f"{session_id} 提示词前缀发生变化: {self.hash} -> {prefix_hash}")
+            else:
+                logger.bind(tag=TAG).info(f"{session_id} 提示词前缀: {prefix_hash}, 长度: {len(payload)}")
+            self.hash = prefix_hash
+        return self.hash
+
+
+def _usage_value(obj, name):
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class PromptCacheStats:
+    """服务端返回的提示词缓存命中情况，按会话和全局统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def record_usage(self, session_id, usage):
+        """记录一次请求的usage，兼容OpenAI/百炼（prompt_tokens_details.cached_tokens）和DeepSeek（prompt_cache_hit_tokens）"""
+        prompt_tokens = _usage_value(usage, "prompt_tokens") or 0
+        cached_tokens = _usage_value(_usage_value(usage, "prompt_tokens_details"), "cached_tokens")
+        if cached_tokens is None:
+            cached_tokens = _usage_value(usage, "prompt_cache_hit_tokens") or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            session = self.sessions.setdefault(session_id, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            session["requests"] += 1
+            session["prompt_tokens"] += prompt_tokens
+            session["cached_tokens"] += cached_tokens
+            session["last_prompt_tokens"] = prompt_tokens
+            session["last_cached_tokens"] = cached_tokens
+        logger.bind(tag=TAG).debug(f"{session_id} prompt token数: {prompt_tokens}, 缓存命中: {cached_tokens}")
+
+    def get_session(self, session_id) -> dict:
+        return dict(self.sessions.get(session_id, {}))
+
+    def remove_session(self, session_id):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def get_metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0,
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
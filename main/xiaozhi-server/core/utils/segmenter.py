@@ -0,0 +1,113 @@
+from core.utils.util import get_string_no_punctuation_or_emoji
+
+# 句末/句中可以断开送TTS的标点
+SENTENCE_PUNCTUATIONS = "。？！；：.?!;:"
+DEFAULT_PUNCTUATIONS = SENTENCE_PUNCTUATIONS + "，,"
+# 首句还没有标点时，在这些字之前断开
+DEFAULT_FIRST_PAUSE_WORDS = "我你他的是她它有"
+
+
+class StreamingSegmenter:
+    """
+    LLM流式输出的增量分句：逐个送入token，返回可以直接送去TTS的分段。
+    只扫描新送入的token、只保存还没有输出的文本，每个token的处理开销与回复总长度无关。
+
+    - 在未输出文本中最后一个标点处断开，同一个token里的多句话一起输出
+    - min_length: 去掉首尾标点后短于该长度的分段先不输出，和后面的文本合并
+    - max_length: 一直没有标点时，未输出文本达到该长度就强制断开（英文优先在空格处断开），0表示不限制
+    - first_segment_length: 首句加速，第一个分段在还没有标点时达到该长度就先断开送TTS，0表示关闭
+    """
+
+    def __init__(
+        self,
+        punctuations=DEFAULT_PUNCTUATIONS,
+        min_length=0,
+        max_length=0,
+        first_segment_length=0,
+        first_pause_words=DEFAULT_FIRST_PAUSE_WORDS,
+    ):
+        self.punctuations = frozenset(punctuations)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.first_segment_length = first_segment_length
+        self.first_pause_words = frozenset(first_pause_words)
+        self.segments = 0  # 已输出的分段数
+        self._pending = ""  # 还没有输出的文本
+        self._cut = 0  # _pending中最后一个标点之后的位置，0表示没有标点
+
+    @classmethod
+    def from_config(cls, config, **overrides):
+        """根据配置文件中的segmenter配置创建，overrides覆盖对应的配置项"""
+        params = {
+            "punctuations": config.get("punctuations", DEFAULT_PUNCTUATIONS),
+            "min_length": config.get("min_length", 0),
+            "max_length": config.get("max_length", 0),
+            "first_segment_length": config.get("first_segment_length", 0),
+            "first_pause_words": config.get("first_pause_words", DEFAULT_FIRST_PAUSE_WORDS),
+        }
+        params.update(overrides)
+        return cls(**params)
+
+    def feed(self, token):
+        """送入一段LLM输出，返回这次可以输出的分段列表"""
+        if not token:
+            return []
+        start = len(self._pending)
+        self._pending += token
+        for i in range(len(token) - 1, -1, -1):
+            if token[i] in self.punctuations:
+                self._cut = start + i + 1
+                break
+        return self._drain(final=False)
+
+    def flush(self):
+        """LLM输出结束，返回剩余的全部文本"""
+        return self._drain(final=True)
+
+    def _drain(self, final):
+        segments = []
+        while self._pending:
+            cut = self._next_cut(final)
+            if not cut:
+                break
+            raw = self._pending[:cut]
+            self._pending = self._pending[cut:]
+            self._cut = max(0, self._cut - cut)
+            text = get_string_no_punctuation_or_emoji(raw)
+            if text:
+                self.segments += 1
+                segments.append(text)
+        return segments
+
+    def _next_cut(self, final):
+        pending = self._pending
+        first = self.first_segment_length and self.segments == 0
+        over_length = self.max_length and len(pending) >= self.max_length
+        if self._cut:
+            if (
+                first
+                or final
+                or over_length
+                or not self.min_length
+                or len(get_string_no_punctuation_or_emoji(pending[:self._cut])) >= self.min_length
+            ):
+                return self._cut
+        if final:
+            return len(pending)
+        if first and len(pending) >= self.first_segment_length:
+            return self._first_cut(pending)
+        if over_length:
+            return self._force_cut(pending)
+        return 0
+
+    def _first_cut(self, pending):
+        """首句在最后一个停顿字之前断开，找不到时按长度断开"""
+        for i in range(self.first_segment_length - 1, 1, -1):
+            if pending[i] in self.first_pause_words:
+                return i
+        return self.first_segment_length
+
+    def _force_cut(self, pending):
+        """英文在单词边界断开，避免把单词切成两半"""
+        space = pending.rfind(" ", self.max_length // 2, self.max_length)
+        return space + 1 if space != -1 else self.max_length
@@ -0,0 +1,172 @@
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+from config.logger import setup_logging
+from core.utils.util import remove_punctuation_and_length
+
+TAG = __name__
+logger = setup_logging()
+
+
+@dataclass
+class SpeculationMetrics:
+    started: int = 0  # 发起的提前识别次数
+    hits: int = 0  # 最终文本与提前识别一致，提前发起的LLM请求被采用
+    reused: int = 0  # 没有流式识别时直接沿用提前识别的文本作为最终文本，没有经过比对
+    resumed: int = 0  # 用户停顿后继续说话，提前识别作废
+    mismatched: int = 0  # 最终文本与提前识别不一致
+    discarded: int = 0  # 文本一致但没有进入对话（如退出指令、唤醒词）
+    llm_prefetches: int = 0  # 提前发起的LLM请求数
+    wasted_llm_tokens: int = 0  # 作废的LLM请求已经生成的token数（按流式返回的分片计）
+    saved_time: float = 0.0  # 命中和沿用时提前量的累计(秒)
+
+
+class SpeculationStats:
+    """全局的提前识别统计，所有连接共用，用来观察命中率和浪费的LLM用量"""
+
+    def __init__(self):
+        self.metrics = SpeculationMetrics()
+        self._lock = threading.Lock()
+
+    def record_start(self):
+        with self._lock:
+            self.metrics.started += 1
+
+    def record_prefetch(self):
+        with self._lock:
+            self.metrics.llm_prefetches += 1
+
+    def record_hit(self, saved_time: float, reused: bool = False):
+        with self._lock:
+            if reused:
+                self.metrics.reused += 1
+            else:
+                self.metrics.hits += 1
+            self.metrics.saved_time += saved_time
+
+    def record_miss(self, reason: str, wasted_tokens: int = 0):
+        with self._lock:
+            setattr(self.metrics, reason, getattr(self.metrics, reason) + 1)
+            self.metrics.wasted_llm_tokens += wasted_tokens
+
+    def get_metrics(self) -> dict:
+        """获取提前识别统计信息"""
+        m = self.metrics
+        # 沿用的文本没有和最终识别结果比对过，不计入命中率
+        finished = m.hits + m.resumed + m.mismatched + m.discarded
+        adopted = m.hits + m.reused
+        return {
+            "started": m.started,
+            "hits": m.hits,
+            "reused": m.reused,
+            "resumed": m.resumed,
+            "mismatched": m.mismatched,
+            "discarded": m.discarded,
+            "hit_rate": m.hits / finished if finished else 0,
+            "llm_prefetches": m.llm_prefetches,
+            "wasted_llm_tokens": m.wasted_llm_tokens,
+            "avg_saved_time": m.saved_time / adopted if adopted else 0,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class LLMPrefetch:
+    """
+    提前发起的LLM请求：在后台任务中消费流式响应并缓存，
+    确认命中后由对话流程通过replay()取出，先回放已缓存的部分，再继续接收后续响应。
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.chunks = []
+        self.done = False
+        self.failed = False
+        self.claimed = False
+        self.task = None
+        self._updated = asyncio.Event()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def run(self):
+        try:
+            async for chunk in self.responses:
+                self.chunks.append(chunk)
+                self._updated.set()
+        except Exception as e:
+            self.failed = True
+            logger.bind(tag=TAG).error(f"提前发起的LLM请求失败: {e}")
+        finally:
+            # 被取消时关闭生成器，断开仍在进行的流式请求
+            await self.responses.aclose()
+            self.done = True
+            self._updated.set()
+
+    async def replay(self):
+        """按顺序返回全部响应，与直接调用LLM得到的异步生成器等价"""
+        self.claimed = True
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                    index += 1
+                    yield chunk
+                elif self.done:
+                    return
+                else:
+                    self._updated.clear()
+                    await self._updated.wait()
+        finally:
+            # 对话被打断时不再需要后续响应
+            self.cancel()
+
+    def cancel(self) -> int:
+        """取消请求，返回已经生成的token数"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        return len(self.chunks)
+
+
+class SpeculativeTurn:
+    """
+    一次提前识别：用户停顿超过较短的阈值时立即开始识别（并提前发起LLM请求），
+    用户继续说话则作废；到达正式的说话结束判定时，如果最终文本与提前识别的文本一致，就直接沿用已经在进行的LLM响应。
+    """
+
+    def __init__(self, frames: int):
+        self.frames = frames  # 开始时已收到的音频帧数
+        self.start_time = time.time()
+        self.text = None
+        self.prefetch = None
+        self.task = None
+        # 最终文本直接取自提前识别的结果（没有重新识别），采用时记为沿用而不是命中
+        self.reused = False
+
+    def matches(self, text: str) -> bool:
+        if self.text is None or text is None:
+            return False
+        return remove_punctuation_and_length(self.text)[1] == remove_punctuation_and_length(text)[1]
+
+    def cancel(self, reason: str):
+        """作废本次提前识别并记录原因"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        wasted = self.prefetch.cancel() if self.prefetch and not self.prefetch.claimed else 0
+        speculation_stats.record_miss(reason, wasted)
+        logger.bind(tag=TAG).debug(f"提前识别作废({reason}): {self.text}, 浪费token: {wasted}")
+
+    def hit(self):
+        saved_time = time.time() - self.start_time
+        speculation_stats.record_hit(saved_time, self.reused)
+        logger.bind(tag=TAG).debug(f"提前识别{'沿用' if self.reused else '命中'}: {self.text}, 提前量: {saved_time:.3f}s")
+
+    async def wait_text(self):
+        """等待提前识别的文本，识别失败或已取消时返回None"""
+        if self.task is not None and not self.task.done():
+            await asyncio.wait([self.task])
+        return self.text
@@ -0,0 +1,137 @@
+import io
+import wave
+import numpy as np
+import opuslib_next
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class Utterance:
+    """
+    一句话的音频：
+    说话期间随数据包到达逐帧累积，VAD已经解码过的帧直接复用其PCM，没有解码过的帧在第一次使用时统一解码。
+    ASR、声纹识别和情感识别都从这里取PCM，同一个数据包只解码一次。
+    原始Opus数据包同样保留，供需要按包上传的云端服务使用。
+    """
+
+    def __init__(self, sample_rate=16000, frame_size=960):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.packets = []
+        self._frames = []
+        self._decoder = None
+        self._decoded = 0  # 已解码（或由VAD提供PCM）的连续帧数
+        self._float32 = None
+        self._int16 = None
+
+    @classmethod
+    def ensure(cls, audio):
+        """把Opus数据包列表（或单个数据包）包装成Utterance，已经是Utterance时原样返回"""
+        if isinstance(audio, cls):
+            return audio
+        utterance = cls()
+        if isinstance(audio, (bytes, bytearray)):
+            audio = [audio]
+        for packet in audio:
+            utterance.append(packet)
+        return utterance
+
+    def append(self, opus_packet, pcm=None):
+        """追加一个数据包；pcm为该包已解码的float32样本（例如VAD解码的结果）"""
+        if pcm is not None and self._decoded == len(self._frames):
+            self._decoded += 1
+        self.packets.append(opus_packet)
+        self._frames.append(pcm)
+        self._float32 = None
+        self._int16 = None
+
+    def keep_last(self, count):
+        """只保留最后count帧，用于未说话时保留说话开始前的预录音频"""
+        if len(self.packets) <= count:
+            return
+        drop = len(self.packets) - count
+        self.packets = self.packets[drop:]
+        self._frames = self._frames[drop:]
+        self._decoded = max(0, self._decoded - drop)
+        self._float32 = None
+        self._int16 = None
+
+    def snapshot(self):
+        """当前已收到音频的副本，之后继续追加的数据包不影响副本"""
+        utterance = Utterance(self.sample_rate, self.frame_size)
+        utterance.packets = list(self.packets)
+        utterance._frames = list(self._frames)
+        utterance._decoded = self._decoded
+        return utterance
+
+    def clear(self):
+        self.packets = []
+        self._frames = []
+        self._decoded = 0
+        self._float32 = None
+        self._int16 = None
+
+    def __len__(self):
+        return len(self.packets)
+
+    def __iter__(self):
+        return iter(self.packets)
+
+    def _ensure_decoded(self):
+        """解码还没有PCM的帧；解码器按顺序跟随码流，所以从第一个缺PCM的帧开始顺序解码"""
+        if self._decoded == len(self._frames):
+            return
+        if self._decoder is None:
+            self._decoder = opuslib_next.Decoder(self.sample_rate, 1)
+        for i in range(self._decoded, len(self._frames)):
+            if self._frames[i] is not None:
+                continue
+            try:
+                pcm = self._decoder.decode(self.packets[i], self.frame_size)
+                self._frames[i] = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+            except opuslib_next.OpusError as e:
+                logger.bind(tag=TAG).error(f"Opus解码错误: {e}")
+                self._frames[i] = np.zeros(0, dtype=np.float32)
+        self._decoded = len(self._frames)
+
+    def last_frame(self):
+        """最后一帧的float32 PCM"""
+        if not self._frames:
+            return np.zeros(0, dtype=np.float32)
+        self._ensure_decoded()
+        return self._frames[-1]
+
+    @property
+    def pcm_float32(self):
+        """整句的float32 PCM，范围[-1, 1]"""
+        if self._float32 is None:
+            self._ensure_decoded()
+            if self._frames:
+                self._float32 = np.concatenate(self._frames)
+            else:
+                self._float32 = np.zeros(0, dtype=np.float32)
+        return self._float32
+
+    @property
+    def pcm_int16(self):
+        """整句的int16 PCM"""
+        if self._int16 is None:
+            self._int16 = (np.clip(self.pcm_float32, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+        return self._int16
+
+    @property
+    def duration(self):
+        """音频时长(秒)"""
+        return len(self.pcm_float32) / self.sample_rate
+
+    def to_wav_bytes(self):
+        """整句音频封装为WAV格式"""
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)  # 2 bytes = 16-bit
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.pcm_int16.tobytes())
+        return wav_buffer.getvalue()
@@ -1,9 +1,14 @@
+import os
+import asyncio
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from config.logger import setup_logging
+from core.utils.vad_batch import VADBatchEngine
+from core.utils.pcm_buffer import PCMRingBuffer
+from core.utils.vad_gate import EnergyGate
 import opuslib_next
 import time
 import numpy as np
-import torch
 
 TAG = __name__
 logger = setup_logging()
@@ -14,66 +19,192 @@ class VAD(ABC):
         """检测音频数据中的语音活动"""
         pass
 
+    async def is_vad_async(self, conn, data):
+        """异步检测语音活动，默认直接调用同步实现"""
+        return self.is_vad(conn, data)
+
+    def create_session(self):
+        """为一个连接创建独立的VAD会话，无状态的实现可以不创建"""
+        return None
+
+    def get_metrics(self):
+        """获取VAD运行统计信息"""
+        return {}
+
+
+class VADSession:
+    """
+    单个连接的VAD会话：
+    模型本身在所有连接间共享且只读，会话里保存该连接独有的Opus解码器、
+    Silero循环状态（RNN状态 + 上一块尾部上下文）和预分配的缓冲区，
+    避免不同设备交错到达的数据包互相污染解码结果和语音概率。
+    """
+
+    def __init__(self, samples_per_chunk=512, context_size=64, frame_size=960):
+        self.samples_per_chunk = samples_per_chunk
+        self.context_size = context_size
+        self.frame_size = frame_size
+        self.decoder = opuslib_next.Decoder(16000, 1)
+        # 解码后的PCM直接写入环形缓冲区，至少保留最近一帧供last_frame取用
+        self.pcm = PCMRingBuffer(history=frame_size)
+        self.last_decoded = 0
+        # 能量预判使用的自适应噪声底和噪声过零率，跨语句保留
+        self.noise_floor = None
+        self.noise_zcr = 0.0
+        self.reset()
+
+    def reset(self):
+        """重置模型状态并丢弃未检测的音频；解码器跟随设备连续的Opus码流，不需要重置"""
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+        self.context = np.zeros((1, self.context_size), dtype=np.float32)
+        self.pcm.skip()
+
+    def decode(self, opus_packet):
+        """把一个Opus数据包直接解码进缓冲区"""
+        self.last_decoded = 0
+        self.last_decoded = self.pcm.decode_into(self.decoder, opus_packet, self.frame_size)
+        return self.last_decoded
+
+    def last_frame(self):
+        """最近一次解码出的PCM"""
+        return self.pcm.tail(self.last_decoded).copy()
+
+    def next_chunk(self):
+        """取出下一个完整音频块（缓冲区上的float32视图）；不足一块时返回None"""
+        return self.pcm.read(self.samples_per_chunk)
+
+    def close(self):
+        """释放解码器和缓冲区"""
+        self.decoder = None
+        self.pcm = None
+        self.state = None
+        self.context = None
+
 
 class SileroVAD(VAD):
     def __init__(self, config):
-        logger.bind(tag=TAG).info("SileroVAD", config)
+        logger.bind(tag=TAG).info(f"{self.__class__.__name__}", config)
+        self._load_model(config)
+
+        self.vad_threshold = config.get("threshold")
+        self.silence_threshold_ms = config.get("min_silence_duration_ms")
+
+        # 使用模型要求的固定样本数
+        self.samples_per_chunk = 512  # SileroVAD要求16kHz采样率下使用512个样本
+        self.context_size = 64  # 16kHz下模型需要拼接上一块末尾的64个样本
+
+        # 跨连接批量推理
+        self.batch_enabled = config.get("batch_enabled", False)
+        self.batch_engine = None
+        if self.batch_enabled:
+            self.batch_engine = VADBatchEngine(
+                self.forward_batch,
+                max_batch_size=config.get("batch_max_size", 64),
+                max_wait_ms=config.get("batch_max_wait_ms", 8),
+            )
+
+        # 模型推理前的能量/过零率预判，明显的静音直接跳过模型
+        self.gate = EnergyGate(config)
+        # 模型判定为非语音时才用来更新噪声底，与Silero推荐的neg_threshold一致
+        self.noise_threshold = self.vad_threshold - 0.15
+
+    def _load_model(self, config):
+        # torch导入耗时且占用内存较多，只在使用TorchScript模型时才加载
+        import torch
+
         self.model, self.utils = torch.hub.load(repo_or_dir=config["model_dir"],
                                               source='local',
                                               model='silero_vad',
                                               force_reload=False)
         (get_speech_timestamps, _, _, _, _) = self.utils
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-        self.vad_threshold = config.get("threshold")
-        self.silence_threshold_ms = config.get("min_silence_duration_ms")
-        
-        # 使用模型要求的固定样本数
-        self.samples_per_chunk = 512  # SileroVAD要求16kHz采样率下使用512个样本
-        self.audio_buffer = np.zeros(self.samples_per_chunk, dtype=np.float32)
-        self.buffer_index = 0
+    def create_session(self):
+        return VADSession(self.samples_per_chunk, self.context_size)
+
+    def forward_batch(self, chunks, sessions):
+        """
+        对多个连接的音频块做一次前向计算
+        chunks: 每个元素为512个float32样本
+        sessions: 与chunks一一对应的VADSession，计算后原地更新其循环状态
+        """
+        import torch
+
+        audio = np.stack(chunks)
+        x = np.concatenate([np.concatenate([s.context for s in sessions], axis=0), audio], axis=1)
+        state = np.concatenate([s.state for s in sessions], axis=1)
+        with torch.no_grad():
+            # 直接调用内部无状态的16k子模型，循环状态由调用方显式传入
+            out, new_state = self.model._model(torch.from_numpy(x), torch.from_numpy(state))
+        self._write_back(sessions, x, new_state.numpy())
+        return out[:, 0].numpy()
+
+    def _write_back(self, sessions, x, new_state):
+        """把前向计算后的循环状态和上下文写回各个会话"""
+        for i, session in enumerate(sessions):
+            session.state = new_state[:, i:i + 1].copy()
+            session.context = x[i:i + 1, -self.context_size:].copy()
+
+    def _get_session(self, conn):
+        if conn.vad_session is None:
+            conn.vad_session = self.create_session()
+        return conn.vad_session
+
+    def _gate_silence(self, session, chunk):
+        """能量预判，返回(是否跳过模型, 音频特征)；跳过时把上下文推进到当前块末尾，保证下次推理的输入连续"""
+        if not self.gate.enabled:
+            return False, None
+        silent, features = self.gate.is_silence(session, chunk)
+        if silent:
+            session.context[0, :] = chunk[-self.context_size:]
+        return silent, features
+
+    def _after_model(self, session, features, speech_prob):
+        if features is not None and speech_prob < self.noise_threshold:
+            self.gate.update_floor(session, *features)
+
+    def get_metrics(self):
+        metrics = {"gate": self.gate.get_metrics()}
+        if self.batch_engine is not None:
+            metrics["batch"] = self.batch_engine.get_metrics()
+        return metrics
+
+    def _update_voice_state(self, conn, speech_prob):
+        """根据语音概率更新连接的说话状态，返回(当前块是否有声音, 是否检测到语音停止)"""
+        client_have_voice = speech_prob >= self.vad_threshold
+
+        # 优化语音停止检测逻辑
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.client_have_voice_last_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+                return client_have_voice, True
+
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.client_have_voice_last_time = time.time() * 1000
+        return client_have_voice, False
 
     def is_vad(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer += pcm_frame
+            session = self._get_session(conn)
+            session.decode(opus_packet)
 
             # 使用模型要求的固定样本数进行处理
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= self.samples_per_chunk * 2:
-                # 提取处理块，确保样本数为512
-                chunk = conn.client_audio_buffer[:self.samples_per_chunk * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[self.samples_per_chunk * 2:]
-
-                # 批量转换为张量
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                
-                # 确保音频数据形状正确
-                if len(audio_float32) != self.samples_per_chunk:
-                    logger.bind(tag=TAG).warning(f"音频数据长度不正确: {len(audio_float32)} != {self.samples_per_chunk}")
-                    continue
-                
-                # 使用torch.no_grad()减少内存使用
-                with torch.no_grad():
-                    audio_tensor = torch.from_numpy(audio_float32).unsqueeze(0)  # 添加批次维度
-                    speech_prob = self.model(audio_tensor, 16000).item()
-                
-                client_have_voice = speech_prob >= self.vad_threshold
-
-                # 优化语音停止检测逻辑
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.client_have_voice_last_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                        break  # 检测到语音停止，立即退出循环
-                
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.client_have_voice_last_time = time.time() * 1000
+            while (chunk := session.next_chunk()) is not None:
+                silent, features = self._gate_silence(session, chunk)
+                if silent:
+                    speech_prob = 0.0
+                else:
+                    speech_prob = float(self.forward_batch([chunk], [session])[0])
+                    self._after_model(session, features, speech_prob)
+
+                client_have_voice, voice_stop = self._update_voice_state(conn, speech_prob)
+                if voice_stop:
+                    break  # 检测到语音停止，立即退出循环
 
             return client_have_voice
-            
+
         except opuslib_next.OpusError as e:
             logger.bind(tag=TAG).info(f"解码错误: {e}")
         except Exception as e:
@@ -81,14 +212,84 @@ class SileroVAD(VAD):
             logger.bind(tag=TAG).error(f"Error details: {str(e)}")
         return False
 
+    async def is_vad_async(self, conn, opus_packet):
+        if self.batch_engine is None:
+            return self.is_vad(conn, opus_packet)
+
+        try:
+            session = self._get_session(conn)
+            session.decode(opus_packet)
+
+            client_have_voice = False
+            while (chunk := session.next_chunk()) is not None:
+                silent, features = self._gate_silence(session, chunk)
+                if silent:
+                    speech_prob = 0.0
+                else:
+                    # 交给批量推理引擎，与其他连接的音频块合并计算
+                    speech_prob = await self.batch_engine.submit(session, chunk)
+                    self._after_model(session, features, speech_prob)
+
+                client_have_voice, voice_stop = self._update_voice_state(conn, speech_prob)
+                if voice_stop:
+                    break
+
+            return client_have_voice
+
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+        return False
+
+
+class SileroVADOnnx(SileroVAD):
+    """
+    基于ONNX Runtime的SileroVAD：
+    不依赖torch，启动更快、占用内存更少，单块推理的CPU开销也更低。
+    未开启批量推理时，解码和推理放在专用线程池中执行，不阻塞事件循环。
+    """
+
+    def _load_model(self, config):
+        import onnxruntime
+
+        model_file = config.get("model_file", "src/silero_vad/data/silero_vad.onnx")
+        model_path = os.path.join(config["model_dir"], model_file)
+
+        opts = onnxruntime.SessionOptions()
+        opts.intra_op_num_threads = int(config.get("intra_op_threads", 1))
+        opts.inter_op_num_threads = int(config.get("inter_op_threads", 1))
+        self.session = onnxruntime.InferenceSession(
+            model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self.sr = np.array(16000, dtype=np.int64)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(config.get("executor_workers", 1)), thread_name_prefix="vad-onnx"
+        )
+
+    def forward_batch(self, chunks, sessions):
+        audio = np.stack(chunks)
+        x = np.concatenate([np.concatenate([s.context for s in sessions], axis=0), audio], axis=1)
+        state = np.concatenate([s.state for s in sessions], axis=1)
+        out, new_state = self.session.run(None, {"input": x, "state": state, "sr": self.sr})
+        self._write_back(sessions, x, new_state)
+        return out[:, 0]
+
+    async def is_vad_async(self, conn, opus_packet):
+        if self.batch_engine is not None:
+            return await super().is_vad_async(conn, opus_packet)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.is_vad, conn, opus_packet)
+
 
 def create_instance(class_name, *args, **kwargs) -> VAD:
     # 获取类对象
     cls_map = {
         "SileroVAD": SileroVAD,
+        "SileroVADOnnx": SileroVADOnnx,
         # 可扩展其他SileroVAD实现
     }
 
     if cls := cls_map.get(class_name):
         return cls(*args, **kwargs)
-    raise ValueError(f"不支持的SileroVAD类型: {class_name}")
\ No newline at end of file
+    raise ValueError(f"不支持的SileroVAD类型: {class_name}")
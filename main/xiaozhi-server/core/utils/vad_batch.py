@@ -0,0 +1,33 @@
+from core.utils.micro_batch import MicroBatchQueue
+
+
+class VADBatchEngine(MicroBatchQueue):
+    """
+    跨连接的VAD批量推理引擎：
+    收集所有连接提交的待检测音频块，在很短的截止时间内（或凑满一批时）
+    合并成一次前向计算，再把每个连接的语音概率分别返回。
+    每个连接的循环状态保存在调用方持有的VADSession中，引擎本身不保存任何流状态。
+    """
+
+    def __init__(self, forward_fn, max_batch_size=64, max_wait_ms=8):
+        # forward_fn(chunks, sessions) -> 每个音频块的语音概率序列，在推理线程中执行
+        self._forward = forward_fn
+        super().__init__(
+            self._forward_items,
+            "VAD批量推理引擎",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            thread_name_prefix="vad-batch",
+        )
+
+    def _forward_items(self, items):
+        sessions = [item[0] for item in items]
+        chunks = [item[1] for item in items]
+        return [float(prob) for prob in self._forward(chunks, sessions)]
+
+    async def submit(self, session, chunk):
+        """
+        提交一个音频块，等待批量推理返回语音概率
+        同一个会话在上一次submit返回之前不能再次提交，否则循环状态会错乱
+        """
+        return await super().submit((session, chunk))
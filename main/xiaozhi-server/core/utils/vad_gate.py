@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class EnergyGate:
+    """
+    神经网络VAD之前的能量/过零率预判：
+    明显低于本连接自适应噪声底的音频块直接判定为静音，跳过模型推理；
+    拿不准的音频块（能量接近噪声底、过零率偏高、噪声底尚未建立）一律交给模型判断。
+    噪声底保存在每个连接的VADSession上，统计计数在所有连接间共享。
+    """
+
+    def __init__(self, config):
+        self.enabled = config.get("gate_enabled", False)
+        # 低于噪声底多少分贝以内仍视为静音
+        self.margin = 10 ** (config.get("gate_margin_db", 6) / 20)
+        # 低于该电平一定是静音，高于该电平一定交给模型
+        self.min_rms = 10 ** (config.get("gate_min_dbfs", -60) / 20)
+        self.max_rms = 10 ** (config.get("gate_max_dbfs", -35) / 20)
+        # 过零率明显偏离噪声本身的过零率时可能是清辅音（s、sh等），交给模型判断
+        self.max_zcr_delta = config.get("gate_max_zcr_delta", 0.15)
+        # 噪声底上升速度，下降时跟随更快
+        self.floor_rise = config.get("gate_floor_rise", 0.05)
+        self.floor_fall = 0.5
+
+        self.gated_frames = 0
+        self.evaluated_frames = 0
+
+    @staticmethod
+    def measure(chunk):
+        """计算音频块的均方根电平和过零率"""
+        rms = float(np.sqrt(np.dot(chunk, chunk) / len(chunk)))
+        signs = np.signbit(chunk)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / (len(chunk) - 1)
+        return rms, zcr
+
+    def is_silence(self, session, chunk):
+        """判断音频块是否可以跳过模型，跳过时同时更新噪声底；返回(是否静音, (电平, 过零率))"""
+        rms, zcr = self.measure(chunk)
+        floor = session.noise_floor
+        silent = rms < self.min_rms or (
+            floor is not None
+            and rms < floor * self.margin
+            and rms < self.max_rms
+            and abs(zcr - session.noise_zcr) < self.max_zcr_delta
+        )
+        if silent:
+            self.gated_frames += 1
+            self.update_floor(session, rms, zcr)
+        else:
+            self.evaluated_frames += 1
+        return silent, (rms, zcr)
+
+    def update_floor(self, session, rms, zcr):
+        """用确认是非语音的音频块更新噪声底和噪声过零率"""
+        floor = session.noise_floor
+        if floor is None:
+            session.noise_floor = max(rms, self.min_rms)
+            session.noise_zcr = zcr
+            return
+        rate = self.floor_fall if rms < floor else self.floor_rise
+        session.noise_floor = max(floor + rate * (rms - floor), self.min_rms)
+        session.noise_zcr += self.floor_rise * (zcr - session.noise_zcr)
+
+    def get_metrics(self):
+        total = self.gated_frames + self.evaluated_frames
+        return {
+            "gated_frames": self.gated_frames,
+            "evaluated_frames": self.evaluated_frames,
+            "gated_ratio": self.gated_frames / total if total else 0,
+        }
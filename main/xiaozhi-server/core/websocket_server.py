@@ -84,6 +84,24 @@ class WebSocketServer:
             ),
         )
 
+    def get_health(self) -> dict:
+        """服务健康状态，asr.saturated为True时识别服务已经积压，新连接会被拒绝"""
+        get_asr_health = getattr(self._asr, "get_health", None)
+        return {
+            "connections": len(self.active_connections),
+            "asr": get_asr_health() if get_asr_health else {"ready": True, "queue_depth": 0, "saturated": False},
+        }
+
+    async def close(self):
+        """服务退出时释放共享组件占用的资源"""
+        for name, component in (("ASR", self._asr), ("LLM", self._llm)):
+            close = getattr(component, "close", None)
+            if close:
+                try:
+                    await close()
+                except Exception as e:
+                    self.logger.bind(tag=TAG).error(f"关闭{name}失败: {e}")
+
     async def start(self):
         server_config = self.config["server"]
         host = server_config["ip"]
@@ -106,6 +124,15 @@ class WebSocketServer:
 
     async def _handle_connection(self, websocket):
         """处理新连接，每次创建独立的ConnectionHandler"""
+        if self.config["server"].get("reject_when_saturated", True):
+            health = self.get_health()
+            if health["asr"]["saturated"]:
+                # 识别请求已经积压，再接入只会让所有设备的识别都变慢，让设备稍后重连
+                self.logger.bind(tag=TAG).warning(
+                    f"识别服务已饱和，拒绝新连接: connections={health['connections']}, asr={health['asr']}"
+                )
+                await websocket.close(code=1013, reason="server busy")
+                return
         # 创建ConnectionHandler时传入当前server实例
         handler = ConnectionHandler(
             self.config,
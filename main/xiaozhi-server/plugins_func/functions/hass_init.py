@@ -17,9 +17,8 @@ def append_devices_to_prompt(conn):
                 return
             for device in devices:
                 prompt += device + "\n"
-            conn.prompt += prompt
-            # 更新提示词
-            conn.dialogue.update_system_message(conn.prompt)
+            # 设备列表放在请求末尾的易变上下文中，保持系统提示词前缀不变
+            conn.dialogue.set_context("devices", prompt)
 
 
 def initialize_hass_handler(conn):
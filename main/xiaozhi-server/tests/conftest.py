@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 与benchmark脚本一样，从项目根目录导入core等模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 配置加载会解析命令行参数，这里清掉pytest自己的参数
+sys.argv = sys.argv[:1]
@@ -0,0 +1,63 @@
+from core.utils.dialogue import CONTEXT_HEADER, USER_HEADER, Dialogue, Message
+
+
+def make_dialogue():
+    dialogue = Dialogue()
+    dialogue.put(Message(role="system", content="你是小智"))
+    dialogue.put(Message(role="user", content="你好"))
+    dialogue.put(Message(role="assistant", content="你好呀"))
+    dialogue.put(Message(role="user", content="今天天气怎么样"))
+    return dialogue
+
+
+def add_tool_round(dialogue):
+    tool_calls = [{"id": "call_1", "type": "function", "function": {"name": "get_weather", "arguments": "{}"}}]
+    dialogue.put(Message(role="assistant", tool_calls=tool_calls))
+    dialogue.put(Message(role="tool", content="晴", tool_call_id="call_1"))
+
+
+def test_without_volatile_content_matches_plain_dialogue():
+    dialogue = make_dialogue()
+    add_tool_round(dialogue)
+    assert dialogue.get_llm_dialogue_with_memory("") == dialogue.get_llm_dialogue()
+    assert dialogue.get_llm_dialogue_with_memory(None) == dialogue.get_llm_dialogue()
+
+
+def test_pending_query_without_volatile_content():
+    dialogue = make_dialogue()
+    messages = dialogue.get_llm_dialogue_with_memory("", pending_query="明天呢")
+    assert messages[:-1] == dialogue.get_llm_dialogue()
+    assert messages[-1] == {"role": "user", "content": "明天呢"}
+
+
+def test_memory_is_prepended_to_final_user_turn():
+    dialogue = make_dialogue()
+    messages = dialogue.get_llm_dialogue_with_memory("用户住在北京")
+    assert messages[0]["content"] == dialogue.get_stable_system_prompt()
+    assert messages[1] == {"role": "user", "content": "你好"}
+    last = messages[-1]
+    assert last["role"] == "user"
+    assert last["content"].startswith(CONTEXT_HEADER)
+    assert "用户住在北京" in last["content"]
+    assert last["content"].endswith(USER_HEADER + "今天天气怎么样")
+
+
+def test_context_is_appended_after_tool_result():
+    dialogue = make_dialogue()
+    add_tool_round(dialogue)
+    dialogue.set_context("location", "所在位置：北京")
+    messages = dialogue.get_llm_dialogue_with_memory("")
+    # 更早的用户消息不被改写
+    assert {"role": "user", "content": "今天天气怎么样"} in messages
+    assert messages[-2]["role"] == "tool"
+    assert messages[-1]["role"] == "user"
+    assert messages[-1]["content"].startswith(CONTEXT_HEADER + "所在位置：北京")
+
+
+def test_history_prefix_is_stable_across_turns():
+    dialogue = make_dialogue()
+    first = dialogue.get_llm_dialogue_with_memory("用户住在北京")
+    dialogue.put(Message(role="assistant", content="晴天"))
+    dialogue.put(Message(role="user", content="明天呢"))
+    second = dialogue.get_llm_dialogue_with_memory("用户住在上海")
+    assert first[:-1] == second[:len(first) - 1]
@@ -0,0 +1,201 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from benchmark.fake_openai_server import FakeOpenAIServer
+from core.providers.llm.openai.openai import LLMProvider as OpenAILLM
+from core.providers.llm.router.router import LLMProvider as RouterLLM
+
+DIALOGUE = [{"role": "user", "content": "今天天气怎么样"}]
+REPLY = "好的，今天天气很好。"
+TTFT_MS = 50
+FIRST_TOKEN_TIMEOUT_MS = 500
+OPEN_SECONDS = 0.5
+
+
+@pytest.fixture
+def servers():
+    """两个模拟的OpenAI兼容服务，运行在独立线程的事件循环中，测试中可以随时切换mode"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    primary = run(FakeOpenAIServer(0, ttft_ms=TTFT_MS, token_ms=2).start())
+    secondary = run(FakeOpenAIServer(0, ttft_ms=TTFT_MS * 1.5, token_ms=2).start())
+    try:
+        yield primary, secondary
+    finally:
+        run(primary.stop())
+        run(secondary.stop())
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def create_router(primary, secondary, **config):
+    def openai_llm(server):
+        return OpenAILLM({"model_name": "fake", "api_key": "sk-fake", "base_url": server.base_url})
+
+    config = {
+        "first_token_timeout_ms": FIRST_TOKEN_TIMEOUT_MS,
+        "probe_timeout_ms": FIRST_TOKEN_TIMEOUT_MS,
+        "open_seconds": OPEN_SECONDS,
+        **config,
+    }
+    return RouterLLM(config, providers={"primary": openai_llm(primary), "secondary": openai_llm(secondary)})
+
+
+async def trip(router, primary):
+    """让failure_threshold个已经在使用主服务的会话连续失败，使主服务熔断"""
+    sessions = [f"trip-{i}" for i in range(router.health["primary"].failure_threshold)]
+    for session_id in sessions:
+        await request(router, session_id)
+    primary.mode = "error"
+    for session_id in sessions:
+        _, text = await request(router, session_id)
+        # 出错时在同一次请求中切换到备用服务
+        assert text == REPLY
+
+
+async def request(router, session_id):
+    start = time.monotonic()
+    text = ""
+    async for content, _ in router.response_with_functions(session_id, DIALOGUE):
+        text += content or ""
+    return time.monotonic() - start, text
+
+
+def test_sessions_stick_to_the_preferred_provider(servers):
+    async def run():
+        router = create_router(*servers)
+        try:
+            for session_id in ("a", "b", "a"):
+                _, text = await request(router, session_id)
+                assert text == REPLY
+            assert router.sessions == {"a": "primary", "b": "primary"}
+            assert router.failovers == 0
+        finally:
+            await router.close()
+
+    asyncio.run(run())
+
+
+def test_failover_and_circuit_breaker(servers):
+    primary, secondary = servers
+
+    async def run():
+        router = create_router(primary, secondary)
+        try:
+            await trip(router, primary)
+            assert router.health["primary"].state == "open"
+            assert router.failovers == router.health["primary"].failure_threshold
+            assert all(router.sessions[f"trip-{i}"] == "secondary" for i in range(3))
+            # 熔断后新会话直接使用备用服务，不再请求主服务
+            requests_after_open = primary.requests
+            seconds, text = await request(router, "new")
+            assert text == REPLY
+            assert seconds < FIRST_TOKEN_TIMEOUT_MS / 1000
+            assert primary.requests == requests_after_open
+            assert router.sessions["new"] == "secondary"
+        finally:
+            await router.close()
+
+    asyncio.run(run())
+
+
+def test_first_token_timeout_fails_over(servers):
+    primary, secondary = servers
+    primary.mode = "hang"
+
+    async def run():
+        router = create_router(primary, secondary)
+        try:
+            seconds, text = await request(router, "s")
+            assert text == REPLY
+            assert FIRST_TOKEN_TIMEOUT_MS / 1000 <= seconds < FIRST_TOKEN_TIMEOUT_MS / 1000 + 1
+            assert router.sessions["s"] == "secondary"
+        finally:
+            await router.close()
+
+    asyncio.run(run())
+
+
+def test_failed_probe_doubles_open_time(servers):
+    primary, secondary = servers
+
+    async def run():
+        router = create_router(primary, secondary)
+        health = router.health["primary"]
+        try:
+            await trip(router, primary)
+            assert health.state == "open"
+            primary.mode = "hang"
+            # 后台探测超时后继续熔断，熔断时间加倍
+            await asyncio.sleep(OPEN_SECONDS + FIRST_TOKEN_TIMEOUT_MS / 1000 + 0.3)
+            assert health.state == "open"
+            assert health.open_seconds == OPEN_SECONDS * 2
+        finally:
+            await router.close()
+
+    asyncio.run(run())
+
+
+def test_idle_router_recovers_through_background_probe(servers):
+    primary, secondary = servers
+
+    async def run():
+        router = create_router(primary, secondary)
+        health = router.health["primary"]
+        try:
+            await trip(router, primary)
+            assert health.state == "open"
+            primary.mode = "ok"
+            # 没有任何新请求，后台探测也要让主服务恢复
+            requests_before = primary.requests
+            await asyncio.sleep(OPEN_SECONDS + 0.5)
+            assert primary.requests == requests_before + 1
+            assert health.state == "closed"
+            assert not router._probe_tasks
+            await request(router, "new")
+            assert router.sessions["new"] == "primary"
+        finally:
+            await router.close()
+
+    asyncio.run(run())
+
+
+def test_close_cancels_background_probes(servers):
+    primary, secondary = servers
+
+    async def run():
+        router = create_router(primary, secondary, open_seconds=60)
+        await trip(router, primary)
+        tasks = list(router._probe_tasks.values())
+        assert len(tasks) == 1
+        await router.close()
+        assert all(task.done() for task in tasks)
+        assert not router._probe_tasks
+
+    asyncio.run(run())
+
+
+def test_bracketed_reply_is_not_a_failure(servers):
+    primary, secondary = servers
+    primary.reply = "【提示】" + REPLY
+
+    async def run():
+        router = create_router(primary, secondary)
+        try:
+            _, text = await request(router, "s")
+            assert text == primary.reply
+            assert router.failovers == 0
+            assert router.health["primary"].consecutive_failures == 0
+        finally:
+            await router.close()
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+from core.utils.segmenter import StreamingSegmenter
+from core.utils.util import remove_punctuation_and_length
+
+
+def feed_all(segmenter, tokens):
+    segments = []
+    for token in tokens:
+        segments.extend(segmenter.feed(token))
+    return segments + segmenter.flush()
+
+
+def test_punctuation_flush_keeps_text_after_last_punctuation():
+    # 同一个token里的多句话一起输出，标点之后的部分留到下一次
+    segmenter = StreamingSegmenter()
+    assert segmenter.feed("你好。今天") == ["你好"]
+    assert segmenter.feed("天气不错！明天见") == ["今天天气不错"]
+    assert segmenter.flush() == ["明天见"]
+
+
+def test_punctuation_flush_without_punctuation_waits_for_flush():
+    segmenter = StreamingSegmenter()
+    assert segmenter.feed("今天天气") == []
+    assert segmenter.feed("不错") == []
+    assert segmenter.flush() == ["今天天气不错"]
+    assert segmenter.flush() == []
+
+
+def test_short_segment_merges_with_following_text():
+    segmenter = StreamingSegmenter(min_length=4)
+    assert segmenter.feed("好的，") == []
+    assert segmenter.feed("我马上去办。") == ["好的，我马上去办"]
+
+
+def test_short_segment_is_emitted_on_flush():
+    segmenter = StreamingSegmenter(min_length=4)
+    assert segmenter.feed("好的。") == []
+    assert segmenter.flush() == ["好的"]
+
+
+def test_first_segment_cuts_before_pause_word():
+    # 首句还没有标点时在停顿字之前断开，之后的分段只在标点处断开
+    segmenter = StreamingSegmenter(first_segment_length=10)
+    assert segmenter.feed("今天天气很好我们") == []
+    assert segmenter.feed("一起去") == ["今天天气很好"]
+    assert segmenter.feed("公园散步吧") == []
+    assert segmenter.feed("。") == ["我们一起去公园散步吧"]
+
+
+def test_first_segment_cuts_at_length_without_pause_word():
+    segmenter = StreamingSegmenter(first_segment_length=6)
+    assert segmenter.feed("一二三四五六七八") == ["一二三四五六"]
+    assert segmenter.flush() == ["七八"]
+
+
+def test_first_segment_ends_at_punctuation_regardless_of_length():
+    segmenter = StreamingSegmenter(first_segment_length=10, min_length=4)
+    assert segmenter.feed("好的！") == ["好的"]
+
+
+def test_max_length_cuts_english_at_word_boundary():
+    segmenter = StreamingSegmenter(max_length=20)
+    assert segmenter.feed("this is a rather long sentence without") == ["this is a rather", "long sentence"]
+    assert segmenter.flush() == ["without"]
+
+
+def test_max_length_cuts_chinese_at_length():
+    segmenter = StreamingSegmenter(max_length=5)
+    assert segmenter.feed("一二三四") == []
+    assert segmenter.feed("五六七") == ["一二三四五"]
+    assert segmenter.flush() == ["六七"]
+
+
+def test_max_length_flushes_short_segment_held_by_min_length():
+    segmenter = StreamingSegmenter(min_length=10, max_length=8)
+    assert segmenter.feed("好的，") == []
+    assert segmenter.feed("马上去办事") == ["好的"]
+    assert segmenter.flush() == ["马上去办事"]
+
+
+def test_segments_cover_whole_reply():
+    tokens = ["好的", "，", "今天", "天气", "很好", "。", "适合", "出去", "走走", "！", "要不要", "一起"]
+    for kwargs in ({}, {"min_length": 8}, {"max_length": 4}, {"first_segment_length": 3}):
+        segments = feed_all(StreamingSegmenter(**kwargs), tokens)
+        # 只去掉分段首尾的标点，文字不丢失也不重复
+        assert remove_punctuation_and_length("".join(segments))[1] == "好的今天天气很好适合出去走走要不要一起", kwargs
+
+
+def test_from_config_overrides():
+    segmenter = StreamingSegmenter.from_config({"max_length": 30, "first_segment_length": 8}, first_segment_length=0)
+    assert segmenter.max_length == 30
+    assert segmenter.first_segment_length == 0
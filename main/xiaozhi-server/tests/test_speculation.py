@@ -0,0 +1,50 @@
+import asyncio
+
+from core.handle.receiveAudioHandle import finish_speculative_asr
+from core.utils import speculation as speculation_module
+from core.utils.speculation import SpeculationStats, SpeculativeTurn
+
+
+def use_fresh_stats(monkeypatch):
+    stats = SpeculationStats()
+    monkeypatch.setattr(speculation_module, "speculation_stats", stats)
+    return stats
+
+
+def test_matched_turn_counts_as_hit(monkeypatch):
+    stats = use_fresh_stats(monkeypatch)
+    turn = SpeculativeTurn(10)
+    turn.text = "今天天气怎么样"
+    assert turn.matches("今天天气怎么样？")
+    turn.hit()
+    metrics = stats.get_metrics()
+    assert metrics["hits"] == 1
+    assert metrics["reused"] == 0
+    assert metrics["hit_rate"] == 1
+
+
+def test_reused_text_is_not_counted_as_hit(monkeypatch):
+    stats = use_fresh_stats(monkeypatch)
+
+    async def run():
+        turn = SpeculativeTurn(10)
+        turn.text = "今天天气怎么样"
+        turn.task = asyncio.create_task(asyncio.sleep(0))
+        # 没有流式识别时沿用提前识别的文本
+        text, _ = await finish_speculative_asr(None, turn)
+        return turn, text
+
+    turn, text = asyncio.run(run())
+    assert text == "今天天气怎么样"
+    assert turn.reused
+    turn.hit()
+    mismatched = SpeculativeTurn(10)
+    mismatched.text = "今天"
+    assert not mismatched.matches("今天天气怎么样")
+    mismatched.cancel("mismatched")
+
+    metrics = stats.get_metrics()
+    assert metrics["hits"] == 0
+    assert metrics["reused"] == 1
+    assert metrics["hit_rate"] == 0
+    assert metrics["avg_saved_time"] >= 0
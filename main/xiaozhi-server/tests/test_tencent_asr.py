@@ -0,0 +1,79 @@
+import time
+import asyncio
+
+import numpy as np
+from aiohttp import web
+
+from core.providers.asr.tencent import ASRProvider
+from core.utils.utterance import Utterance
+
+LATENCY = 0.2
+SESSIONS = 8
+
+
+class MockEndpoint:
+    """模拟腾讯云一句话识别接口，固定延迟返回结果，记录同时处理中的请求数"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request):
+        body = await request.json()
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(LATENCY)
+        self.active -= 1
+        return web.json_response({"Response": {"Result": f"len={body['DataLen']}", "RequestId": "mock"}})
+
+
+def make_utterance():
+    rng = np.random.default_rng(0)
+    utterance = Utterance()
+    for _ in range(10):
+        utterance.append(b"", (rng.standard_normal(960) * 0.1).astype(np.float32))
+    return utterance
+
+
+async def recognize_concurrently(tmp_path):
+    endpoint = MockEndpoint()
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_post("/", endpoint.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    provider = ASRProvider(
+        {
+            "secret_id": "mock",
+            "secret_key": "mock",
+            "output_dir": str(tmp_path),
+            "api_url": f"http://127.0.0.1:{port}/",
+        }
+    )
+    utterance = make_utterance()
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(provider.speech_to_text(utterance, f"s{i}") for i in range(SESSIONS)))
+        elapsed = time.perf_counter() - start
+        session = provider._session
+        await provider.close()
+        return endpoint, results, elapsed, session, provider
+    finally:
+        await runner.cleanup()
+
+
+def test_concurrent_sessions_are_not_serialized(tmp_path):
+    endpoint, results, elapsed, _, _ = asyncio.run(recognize_concurrently(tmp_path))
+    assert all(text and text.startswith("len=") for text, _ in results)
+    # 请求串行时总耗时约为 SESSIONS * LATENCY
+    assert endpoint.max_active == SESSIONS
+    assert elapsed < SESSIONS * LATENCY / 2
+
+
+def test_close_releases_http_session(tmp_path):
+    _, _, _, session, provider = asyncio.run(recognize_concurrently(tmp_path))
+    assert session.closed
+    assert provider._session is None